@@ -0,0 +1,222 @@
+import os
+import ast
+import argparse
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from rating_metadata import load_metadata, classify_action, AGENCIES, ACTION_SCORES
+
+# ---------------------------------------------
+# Bootstrap / permutation statistics: sentiment (and acoustic) features
+# vs. subsequent S&P / Moody's / Fitch rating actions, per agency and sector
+# ---------------------------------------------
+SENTIMENT_CSV = '../features/semantic/sentiment_scores.csv'  # From collect_sentiment_data.py
+OUTPUT_FILE = 'rating_association_stats.csv'
+
+N_RESAMPLES = 5000
+RESAMPLE_BLOCK = 1000   # Resamples evaluated per vectorised block
+MIN_GROUP_SIZE = 4      # Smaller groups get NaN statistics
+SEED = 20250520
+
+# ---------------------------------------------
+# Feature preparation
+# ---------------------------------------------
+def sentiment_polarity(label, score):
+    """Signed FinBERT score: +score for Positive, -score for Negative, 0 for Neutral"""
+    if pd.isna(label) or pd.isna(score):
+        return np.nan
+    label = str(label).lower()
+    if label.startswith('pos'):
+        return float(score)
+    if label.startswith('neg'):
+        return -float(score)
+    return 0.0
+
+def extract_sentiment_label(sent_str):
+    """The metadata column holds strings like {"label":"Negative","score":0.99}"""
+    if pd.isna(sent_str):
+        return None
+    try:
+        clean_str = str(sent_str).replace("'", '"').strip()
+        if clean_str.startswith('{'):
+            return ast.literal_eval(clean_str).get('label')
+        return clean_str
+    except Exception:
+        return None
+
+def build_features(df, sentiment_csv=SENTIMENT_CSV, acoustic_csv=None):
+    """
+    Collect numeric per-call features: FinBERT polarity from the metadata
+    and/or sentiment_scores.csv, plus every numeric column of an optional
+    per-call acoustic table (keyed by file_id).
+    """
+    features = pd.DataFrame({'file_id': df['file_id'].astype(str)})
+
+    if 'FinBERT Sentiment' in df.columns and 'FinBERT Sentiment Score' in df.columns:
+        labels = df['FinBERT Sentiment'].apply(extract_sentiment_label)
+        scores = pd.to_numeric(df['FinBERT Sentiment Score'], errors='coerce')
+        features['metadata_finbert_polarity'] = [sentiment_polarity(l, s) for l, s in zip(labels, scores)]
+
+    if sentiment_csv and os.path.exists(sentiment_csv):
+        sent = pd.read_csv(sentiment_csv, dtype={'file_id': str})
+        sent['finbert_polarity'] = [sentiment_polarity(l, s) for l, s in zip(sent['sentiment'], sent['score'])]
+        features = features.merge(sent[['file_id', 'finbert_polarity']], on='file_id', how='left')
+
+    if acoustic_csv:
+        acoustic = pd.read_csv(acoustic_csv, dtype={'file_id': str})
+        numeric = acoustic.select_dtypes('number').columns.difference(['file_id'])
+        features = features.merge(acoustic[['file_id', *numeric]], on='file_id', how='left')
+
+    return features
+
+# ---------------------------------------------
+# Vectorised statistics over many resamples at once
+# ---------------------------------------------
+def batch_ranks(values):
+    """
+    Tie-averaged ranks (1-based) of every row of a (B, n) matrix.
+    """
+    b, n = values.shape
+    order = np.argsort(values, axis=1, kind='stable')
+    ordered = np.take_along_axis(values, order, axis=1)
+    positions = np.broadcast_to(np.arange(n), (b, n))
+
+    new_group = np.ones((b, n), dtype=bool)
+    new_group[:, 1:] = ordered[:, 1:] != ordered[:, :-1]
+    ends_group = np.ones((b, n), dtype=bool)
+    ends_group[:, :-1] = new_group[:, 1:]
+
+    group_start = np.maximum.accumulate(np.where(new_group, positions, 0), axis=1)
+    group_end = np.minimum.accumulate(np.where(ends_group, positions, n - 1)[:, ::-1], axis=1)[:, ::-1]
+
+    ranks = np.empty((b, n))
+    np.put_along_axis(ranks, order, (group_start + group_end) / 2.0 + 1.0, axis=1)
+    return ranks
+
+def batch_pearson(x, y):
+    """Row-wise Pearson correlation of two (B, n) matrices; NaN without variance."""
+    xc = x - x.mean(axis=1, keepdims=True)
+    yc = y - y.mean(axis=1, keepdims=True)
+    denom = np.sqrt((xc ** 2).sum(axis=1) * (yc ** 2).sum(axis=1))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(denom > 0, (xc * yc).sum(axis=1) / denom, np.nan)
+
+def batch_spearman(x, y):
+    return batch_pearson(batch_ranks(x), batch_ranks(y))
+
+def batch_downgrade_diff(x, y):
+    """Mean feature of downgraded calls minus mean of affirmed/upgraded calls, per row."""
+    down = y < 0
+    n_down = down.sum(axis=1)
+    n_rest = (~down).sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_down = np.where(down, x, 0.0).sum(axis=1) / n_down
+        mean_rest = np.where(~down, x, 0.0).sum(axis=1) / n_rest
+    return np.where((n_down > 0) & (n_rest > 0), mean_down - mean_rest, np.nan)
+
+MEASURES = {
+    'spearman': batch_spearman,
+    'downgrade_mean_diff': batch_downgrade_diff,
+}
+
+def resample_statistics(x, y, measure, n_resamples, rng):
+    """
+    Bootstrap distribution (rows resampled with replacement) and permutation
+    distribution (action labels shuffled) of one measure.
+    """
+    stat = MEASURES[measure]
+    n = len(x)
+    boot, perm = [], []
+    for start in range(0, n_resamples, RESAMPLE_BLOCK):
+        size = min(RESAMPLE_BLOCK, n_resamples - start)
+        idx = rng.integers(0, n, size=(size, n))
+        boot.append(stat(x[idx], y[idx]))
+        shuffled = np.argsort(rng.random((size, n)), axis=1)
+        perm.append(stat(np.broadcast_to(x, (size, n)), y[shuffled]))
+    return np.concatenate(boot), np.concatenate(perm)
+
+def analyse_group(task):
+    """
+    Worker: point estimate, 95% bootstrap CI and two-sided permutation p-value
+    for every measure of one (feature, agency, sector) group.
+    """
+    feature, agency, sector, x, y, seed, n_resamples = task
+    rng = np.random.default_rng(seed)
+    rows = []
+    for measure in MEASURES:
+        row = {'feature': feature, 'agency': agency, 'sector': sector, 'n': len(x),
+               'n_downgrade': int((y < 0).sum()), 'n_upgrade': int((y > 0).sum()), 'measure': measure,
+               'estimate': np.nan, 'ci_low': np.nan, 'ci_high': np.nan, 'p_value': np.nan}
+        if len(x) >= MIN_GROUP_SIZE:
+            estimate = MEASURES[measure](x[None, :], y[None, :])[0]
+            boot, perm = resample_statistics(x, y, measure, n_resamples, rng)
+            row['estimate'] = estimate
+            if np.isfinite(boot).any():
+                row['ci_low'], row['ci_high'] = np.nanpercentile(boot, [2.5, 97.5])
+            if np.isfinite(estimate):
+                valid = perm[np.isfinite(perm)]
+                row['p_value'] = (1 + np.sum(np.abs(valid) >= abs(estimate) - 1e-12)) / (len(valid) + 1)
+        rows.append(row)
+    return rows
+
+def build_tasks(df, features, n_resamples=N_RESAMPLES, seed=SEED):
+    """One task per feature x agency x (all sectors + each sector)."""
+    data = df[['file_id', 'sector'] + [f'{a}_action' for a in AGENCIES]].copy()
+    data['file_id'] = data['file_id'].astype(str)
+    data = data.merge(features, on='file_id', how='left')
+
+    feature_cols = [c for c in features.columns if c != 'file_id']
+    groups = [('all', data)] + [(sector, g) for sector, g in data.groupby('sector')]
+
+    specs = []
+    for feature in feature_cols:
+        for agency in AGENCIES:
+            scores = data[f'{agency}_action'].apply(classify_action).map(ACTION_SCORES)
+            for sector, group in groups:
+                valid = group[feature].notna() & scores.loc[group.index].notna()
+                x = group.loc[valid, feature].to_numpy(dtype=float)
+                y = scores.loc[group.index][valid].to_numpy(dtype=float)
+                specs.append((feature, agency, sector, x, y))
+
+    seeds = np.random.SeedSequence(seed).spawn(len(specs))
+    return [spec + (s, n_resamples) for spec, s in zip(specs, seeds)]
+
+def run_analysis(df, features, n_resamples=N_RESAMPLES, workers=None, seed=SEED):
+    tasks = build_tasks(df, features, n_resamples, seed)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = [row for rows in pool.map(analyse_group, tasks, chunksize=4) for row in rows]
+    return pd.DataFrame(results)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Association of FinBERT/acoustic features with rating actions")
+    parser.add_argument('--metadata', default='./earnings21-file-metadata0520.csv')
+    parser.add_argument('--sentiment', default=SENTIMENT_CSV, help="Per-call FinBERT scores (collect_sentiment_data.py)")
+    parser.add_argument('--acoustic', default=None, help="Optional per-call acoustic feature CSV with a file_id column")
+    parser.add_argument('--resamples', type=int, default=N_RESAMPLES)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--output', default=OUTPUT_FILE)
+    args = parser.parse_args(argv)
+
+    df = load_metadata(args.metadata)
+    if df is None:
+        return
+
+    missing_columns = [c for c in ['file_id', 'sector'] + [f'{a}_action' for a in AGENCIES] if c not in df.columns]
+    if missing_columns:
+        print(f"Error: The following columns are missing from the CSV file: {missing_columns}")
+        return
+
+    features = build_features(df, args.sentiment, args.acoustic)
+    if len(features.columns) < 2:
+        print("No features available (metadata FinBERT columns, sentiment CSV or acoustic CSV)")
+        return
+
+    results = run_analysis(df, features, args.resamples, args.workers)
+    results.to_csv(args.output, index=False)
+    print(f"Statistics saved to {args.output}")
+
+    overall = results[results['sector'] == 'all']
+    print(overall[['feature', 'agency', 'measure', 'n', 'estimate', 'ci_low', 'ci_high', 'p_value']].to_string(index=False))
+
+if __name__ == "__main__":
+    main()
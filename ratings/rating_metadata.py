@@ -0,0 +1,40 @@
+import os
+import pandas as pd
+import numpy as np
+
+# Metadata exported from the earnings21 spreadsheet (see rating_time.py)
+METADATA_PATH = './earnings21-file-metadata0520.csv'
+ENCODINGS = ['utf-8', 'latin1', 'ISO-8859-1', 'cp1252']
+
+AGENCIES = ['sp', 'moodys', 'fitch']
+ACTION_TYPES = ['affirm', 'downgrade', 'upgrade']
+ACTION_SCORES = {'downgrade': -1.0, 'affirm': 0.0, 'upgrade': 1.0}
+
+def load_metadata(file_path=METADATA_PATH):
+    """Read the metadata CSV, trying several encodings. Returns None on failure."""
+    if not os.path.exists(file_path):
+        print(f"Error: File not found at path {file_path}")
+        return None
+
+    for encoding in ENCODINGS:
+        try:
+            df = pd.read_csv(file_path, encoding=encoding)
+            print(f"Successfully read file with {encoding} encoding")
+            return df
+        except UnicodeDecodeError:
+            continue
+        except Exception as e:
+            print(f"Error reading CSV file with {encoding} encoding: {e}")
+            continue
+
+    print("Failed to read file with all attempted encodings")
+    return None
+
+def classify_action(action):
+    """Classify an action into one of our types or 'other'"""
+    if pd.isna(action):
+        return np.nan
+    action = str(action).lower().strip()
+    if action in ACTION_TYPES:
+        return action
+    return 'other'
@@ -0,0 +1,133 @@
+import os
+import json
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from rating_metadata import load_metadata, AGENCIES
+
+# ---------------------------------------------
+# Render every ratings figure from one metadata load
+# ---------------------------------------------
+OUTPUT_DIR = '.'
+CACHE_FILE = '.render_cache.json'  # Input hash per figure, used to skip unchanged figures
+
+# Renderer modules, imported lazily inside the worker processes
+RENDERERS = {
+    'actions_by_sector': ('rating_action_by_sector', 'plot_actions_by_sector'),
+    'rating_timing': ('rating_time', 'plot_rating_timing'),
+    'sentiment_table': ('semantic_vs_rating', 'plot_sentiment_table'),
+}
+
+def figure_specs(df):
+    """
+    All figures of the report: the three original figures plus per-agency and
+    per-sector variants. Each spec is (output name, renderer, row filter, kwargs).
+    """
+    specs = [
+        ('rating_actions_by_sector.png', 'actions_by_sector', None, {}),
+        ('rating_action_timing_with_any_agency.png', 'rating_timing', None, {}),
+        ('rating_actions_with_sentiment.png', 'sentiment_table', None, {}),
+    ]
+    for agency in AGENCIES:
+        specs += [
+            (f'rating_actions_by_sector_{agency}.png', 'actions_by_sector', None, {'agencies': [agency]}),
+            (f'rating_action_timing_{agency}.png', 'rating_timing', None,
+             {'agencies': [agency], 'title_suffix': f'Companies with a {agency.upper()} rating date'}),
+            (f'rating_actions_with_sentiment_{agency}.png', 'sentiment_table', None, {'agencies': [agency]}),
+        ]
+    for sector in sorted(df['sector'].dropna().unique()):
+        slug = str(sector).lower().replace(' ', '_').replace('/', '_')
+        specs += [
+            (f'rating_action_timing_sector_{slug}.png', 'rating_timing', sector,
+             {'title_suffix': f'{sector} companies with at least one agency rating date'}),
+            (f'rating_actions_with_sentiment_sector_{slug}.png', 'sentiment_table', sector, {}),
+        ]
+    return specs
+
+def spec_hash(df, renderer, sector, kwargs):
+    """Hash of the rows a figure is drawn from, its arguments and its renderer source."""
+    module_name, _ = RENDERERS[renderer]
+    data = df if sector is None else df[df['sector'] == sector]
+    digest = hashlib.sha256()
+    digest.update(data.to_csv(index=False).encode('utf-8'))
+    digest.update(json.dumps([renderer, sector, kwargs], sort_keys=True, default=str).encode('utf-8'))
+    for source in (f'{module_name}.py', 'rating_metadata.py'):
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), source), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+# ---------------------------------------------
+# Worker side
+# ---------------------------------------------
+_worker_df = None
+
+def init_worker(df):
+    """Receive the metadata once per worker and select a non-interactive backend."""
+    global _worker_df
+    import matplotlib
+    matplotlib.use('Agg')
+    _worker_df = df
+
+def render_figure(output_file, renderer, sector, kwargs):
+    import importlib
+    module_name, function_name = RENDERERS[renderer]
+    render = getattr(importlib.import_module(module_name), function_name)
+    data = _worker_df if sector is None else _worker_df[_worker_df['sector'] == sector]
+    render(data, output_file=output_file, **kwargs)
+    return output_file
+
+# ---------------------------------------------
+# Main
+# ---------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render all ratings figures in parallel")
+    parser.add_argument('--metadata', default='./earnings21-file-metadata0520.csv')
+    parser.add_argument('--output-dir', default=OUTPUT_DIR)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--force', action='store_true', help="Re-render figures even if inputs are unchanged")
+    args = parser.parse_args(argv)
+
+    df = load_metadata(args.metadata)
+    if df is None:
+        return
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    cache_path = os.path.join(args.output_dir, CACHE_FILE)
+    try:
+        with open(cache_path, 'r') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+
+    pending = []
+    for name, renderer, sector, kwargs in figure_specs(df):
+        output_file = os.path.join(args.output_dir, name)
+        digest = spec_hash(df, renderer, sector, kwargs)
+        if not args.force and cache.get(name) == digest and os.path.exists(output_file):
+            continue
+        pending.append((name, output_file, renderer, sector, kwargs, digest))
+
+    total = len(figure_specs(df))
+    print(f"{total - len(pending)} figures up to date, rendering {len(pending)}")
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker, initargs=(df,)) as pool:
+            futures = {
+                pool.submit(render_figure, output_file, renderer, sector, kwargs): (name, digest)
+                for name, output_file, renderer, sector, kwargs, digest in pending
+            }
+            for future in as_completed(futures):
+                name, digest = futures[future]
+                try:
+                    future.result()
+                    cache[name] = digest
+                except Exception as e:
+                    print(f"Error rendering {name}: {e}")
+
+        with open(cache_path, 'w') as f:
+            json.dump(cache, f, indent=2, sort_keys=True)
+
+    print(f"Report written to {os.path.abspath(args.output_dir)}")
+
+if __name__ == "__main__":
+    main()
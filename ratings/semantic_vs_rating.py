@@ -1,48 +1,37 @@
 import pandas as pd
 import matplotlib.pyplot as plt
-from matplotlib.table import Table
-import numpy as np
-import os
 from matplotlib import rcParams
 import ast
+from rating_metadata import load_metadata, AGENCIES
 
 # Set larger default font sizes
 rcParams['font.size'] = 12
 rcParams['axes.titlesize'] = 14
 
-# Read the CSV file
-file_path = './earnings21-file-metadata0520.csv'
-if not os.path.exists(file_path):
-    print(f"Error: File not found at path {file_path}")
-    exit()
-
-# Read CSV with error handling
-try:
-    df = pd.read_csv(file_path, encoding='utf-8')
-except UnicodeDecodeError:
-    try:
-        df = pd.read_csv(file_path, encoding='latin1')
-    except Exception as e:
-        print(f"Failed to read CSV: {str(e)}")
-        exit()
-
 # Columns we need
 required_columns = [
     'file_id', 'sp_action', 'moodys_action', 'fitch_action',
     'FinBERT Sentiment', 'FinBERT Sentiment Score'
 ]
 
-# Verify columns exist
-missing_cols = [col for col in required_columns if col not in df.columns]
-if missing_cols:
-    print(f"Missing columns: {missing_cols}")
-    exit()
+# Table colors
+colors = {
+    'affirm': '#6495ED',
+    'upgrade': '#90EE90',
+    'downgrade': '#FF7F7F',
+    'header': '#DDDDDD',
+    'default': 'white',
+    'neutral': '#F0F0F0'  # Light gray for neutral sentiment
+}
+
+# Filter for valid actions
+valid_actions = ['affirm', 'upgrade', 'downgrade']
 
 # Extract sentiment label properly
 def extract_sentiment(sent_str):
     if pd.isna(sent_str):
         return None
-    
+
     # The column contains strings like: {"label":"Negative","score":0.99}
     try:
         # Remove any problematic characters
@@ -55,91 +44,100 @@ def extract_sentiment(sent_str):
         print(f"Error processing sentiment: {str(e)}")
         return None
 
-# Create clean columns                
-df['FinBERT_Sentiment'] = df['FinBERT Sentiment'].apply(extract_sentiment)
-df['FinBERT_Sentiment_Score'] = pd.to_numeric(df['FinBERT Sentiment Score'], errors='coerce')
-
-# Filter for valid actions
-valid_actions = ['affirm', 'upgrade', 'downgrade']
-df_filtered = df[
-    df['sp_action'].str.lower().str.strip().isin(valid_actions) |
-    df['moodys_action'].str.lower().str.strip().isin(valid_actions) |
-    df['fitch_action'].str.lower().str.strip().isin(valid_actions)
-].copy()
-
-# Create output table (first 20 records)
-output_table = df_filtered[required_columns].head(20).copy()
-output_table.columns = ['file_id', 'sp_action', 'moodys_action', 'fitch_action',
-                       'FinBERT_Sentiment', 'FinBERT_Sentiment_Score']
-
-# Fill any remaining NAs
-output_table['FinBERT_Sentiment'] = output_table['FinBERT_Sentiment'].fillna('N/A')
-
-# Verify we have sentiment data
-print("\nSample sentiment data:")
-print(output_table[['FinBERT_Sentiment', 'FinBERT_Sentiment_Score']].head())
-
-# Create visualization
-plt.figure(figsize=(16, min(12, 0.5*len(output_table)+2)))
-ax = plt.gca()
-ax.axis('off')
-
-# Table colors
-colors = {
-    'affirm': '#6495ED',
-    'upgrade': '#90EE90',
-    'downgrade': '#FF7F7F', 
-    'header': '#DDDDDD',
-    'default': 'white',
-    'neutral': '#F0F0F0'  # Light gray for neutral sentiment
-}
-
-# Create table data
-table_data = [output_table.columns.tolist()] + output_table.values.tolist()
-table = ax.table(cellText=table_data, loc='center', cellLoc='center',
-                colWidths=[0.15, 0.15, 0.15, 0.15, 0.2, 0.2])
-
-# Style the table
-for (row, col), cell in table.get_celld().items():
-    cell.set_height(0.12)
-    table.auto_set_font_size(False)
-    
-    if row == 0:  # Header
-        cell.set_facecolor(colors['header'])
-        cell.set_text_props(weight='bold', fontsize=14)
-    else:
-        val = table_data[row][col]
-        
-        # Color action columns
-        if col in [1,2,3]:
-            action = str(val).lower().strip()
-            if 'affirm' in action:
-                cell.set_facecolor(colors['affirm'])
-            elif 'upgrade' in action:
-                cell.set_facecolor(colors['upgrade']) 
-            elif 'downgrade' in action:
-                cell.set_facecolor(colors['downgrade'])
-        
-        # Highlight sentiment column
-        elif col == 4:
-            sentiment = str(val).lower()
-            if 'neutral' in sentiment:
-                cell.set_facecolor(colors['neutral'])
-        
-        # Format score column
-        elif col == 5 and pd.notna(val):
-            try:
-                cell._text.set_text(f"{float(val):.3f}")
-            except:
-                pass
-        
-        cell.set_text_props(fontsize=12)
-
-plt.tight_layout()
-output_file = 'rating_actions_with_sentiment.png'
-plt.savefig(output_file, dpi=300, bbox_inches='tight')
-print(f"\nTable saved to {output_file}")
-
-plt.close()
+def sentiment_table(df, agencies=AGENCIES, max_rows=20):
+    """Calls with a valid action from any of the agencies, with their FinBERT sentiment"""
+    df = df.copy()
+
+    # Create clean columns
+    df['FinBERT_Sentiment'] = df['FinBERT Sentiment'].apply(extract_sentiment)
+    df['FinBERT_Sentiment_Score'] = pd.to_numeric(df['FinBERT Sentiment Score'], errors='coerce')
+
+    valid = pd.Series(False, index=df.index)
+    for agency in agencies:
+        valid |= df[f'{agency}_action'].str.lower().str.strip().isin(valid_actions)
+    df_filtered = df[valid]
+
+    # Create output table (first max_rows records)
+    columns = ['file_id'] + [f'{agency}_action' for agency in agencies] + \
+        ['FinBERT_Sentiment', 'FinBERT_Sentiment_Score']
+    output_table = df_filtered[columns].head(max_rows).copy()
+
+    # Fill any remaining NAs
+    output_table['FinBERT_Sentiment'] = output_table['FinBERT_Sentiment'].fillna('N/A')
+    return output_table
+
+def plot_sentiment_table(df, output_file='rating_actions_with_sentiment.png', agencies=AGENCIES, max_rows=20):
+    """Render rating actions next to FinBERT sentiment as a colored table"""
+    output_table = sentiment_table(df, agencies, max_rows)
+
+    # Verify we have sentiment data
+    print("\nSample sentiment data:")
+    print(output_table[['FinBERT_Sentiment', 'FinBERT_Sentiment_Score']].head())
+
+    # Create visualization
+    fig = plt.figure(figsize=(16, min(12, 0.5*len(output_table)+2)))
+    ax = fig.gca()
+    ax.axis('off')
+
+    # Create table data
+    table_data = [output_table.columns.tolist()] + output_table.values.tolist()
+    action_cols = range(1, 1 + len(agencies))
+    sentiment_col = 1 + len(agencies)
+    score_col = sentiment_col + 1
+    col_widths = [0.15] * (1 + len(agencies)) + [0.2, 0.2]
+    table = ax.table(cellText=table_data, loc='center', cellLoc='center', colWidths=col_widths)
+
+    # Style the table
+    for (row, col), cell in table.get_celld().items():
+        cell.set_height(0.12)
+        table.auto_set_font_size(False)
+
+        if row == 0:  # Header
+            cell.set_facecolor(colors['header'])
+            cell.set_text_props(weight='bold', fontsize=14)
+        else:
+            val = table_data[row][col]
+
+            # Color action columns
+            if col in action_cols:
+                action = str(val).lower().strip()
+                if 'affirm' in action:
+                    cell.set_facecolor(colors['affirm'])
+                elif 'upgrade' in action:
+                    cell.set_facecolor(colors['upgrade'])
+                elif 'downgrade' in action:
+                    cell.set_facecolor(colors['downgrade'])
+
+            # Highlight sentiment column
+            elif col == sentiment_col:
+                sentiment = str(val).lower()
+                if 'neutral' in sentiment:
+                    cell.set_facecolor(colors['neutral'])
+
+            # Format score column
+            elif col == score_col and pd.notna(val):
+                try:
+                    cell._text.set_text(f"{float(val):.3f}")
+                except:
+                    pass
+
+            cell.set_text_props(fontsize=12)
+
+    fig.tight_layout()
+    fig.savefig(output_file, dpi=300, bbox_inches='tight')
+    print(f"\nTable saved to {output_file}")
+
+    plt.close(fig)
+
+if __name__ == "__main__":
+    df = load_metadata('./earnings21-file-metadata0520.csv')
+    if df is None:
+        exit()
 
+    # Verify columns exist
+    missing_cols = [col for col in required_columns if col not in df.columns]
+    if missing_cols:
+        print(f"Missing columns: {missing_cols}")
+        exit()
 
+    plot_sentiment_table(df)
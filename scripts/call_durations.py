@@ -0,0 +1,56 @@
+import os
+import wave
+
+# ----------------------------------------
+# Call durations without decoding audio
+# ----------------------------------------
+# Used as job costs for longest-first scheduling (worker_pool.imap_adaptive).
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+WAV_DIR = os.path.join(BASE_DIR, "earnings21", "earnings21", "wav")
+RTTM_DIR = os.path.join(BASE_DIR, "earnings21", "earnings21", "rttms")
+
+def wav_duration(path):
+    """Duration in seconds from the WAV header (frame count / rate); None if unreadable."""
+    try:
+        with wave.open(path, "rb") as wf:
+            return wf.getnframes() / float(wf.getframerate())
+    except (OSError, EOFError, wave.Error):
+        return None
+
+def rttm_duration(path):
+    """
+    (speech seconds, last turn end) from an RTTM file; (None, None) if unreadable.
+    """
+    total, extent = 0.0, 0.0
+    try:
+        with open(path, "r") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) < 5:
+                    continue
+                try:
+                    start, duration = float(parts[3]), float(parts[4])
+                except ValueError:
+                    continue
+                total += duration
+                extent = max(extent, start + duration)
+    except OSError:
+        return None, None
+    return total, extent
+
+def call_costs(file_ids, wav_dir=WAV_DIR, rttm_dir=RTTM_DIR):
+    """
+    Cost per call in audio seconds: the WAV header duration, else the extent
+    of its RTTM, else 0 (unknown calls are scheduled last).
+    """
+    costs = []
+    for file_id in file_ids:
+        duration = wav_duration(os.path.join(wav_dir, f"{file_id}.wav"))
+        if duration is None:
+            duration = rttm_duration(os.path.join(rttm_dir, f"{file_id}.rttm"))[1]
+        costs.append(duration or 0.0)
+    return costs
+
+def file_costs(paths):
+    """WAV header duration of each file (0 when unreadable)."""
+    return [wav_duration(path) or 0.0 for path in paths]
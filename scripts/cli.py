@@ -0,0 +1,114 @@
+import os
+import sys
+import glob
+import argparse
+import importlib
+
+# ----------------------------------------
+# Single entry point for the pipeline scripts
+# ----------------------------------------
+# python scripts/cli.py <command> [command arguments]
+#
+# Only the standard library is imported here. Each command's module is
+# imported when that command runs, so torch/transformers (sentiment, serve),
+# pandas (fuse, collect) or matplotlib (ratings-report) are loaded only by the
+# commands that need them, and status/collection/dry-runs start immediately.
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+RATINGS_DIR = os.path.join(SCRIPTS_DIR, "..", "ratings")
+DEFAULT_BASE_DIR = os.path.abspath(os.path.join(SCRIPTS_DIR, ".."))
+
+# command -> (module directory, module, help); every module exposes main(argv).
+# Scripts commands run from the base directory, ratings commands from <base>/ratings.
+COMMANDS = {
+    "segment": (SCRIPTS_DIR, "segment_audio_by_speaker", "Split call audio into per-speaker wavs and manifests"),
+    "extract-acoustic": (SCRIPTS_DIR, "extract_acoustic_features_by_speaker", "ComParE_2016 features per speaker wav"),
+    "prosody": (SCRIPTS_DIR, "prosody_features", "VAD, pause and speech-rate features from PCM"),
+    "shared-features": (SCRIPTS_DIR, "shared_audio", "Prosody and speaker features from calls read once into shared memory"),
+    "preprocess-normalizations": (SCRIPTS_DIR, "preprocess_normalizations", "Normalized transcripts from the .norm.json files"),
+    "reformat-transcript": (SCRIPTS_DIR, "nlp_reference_transcription", "Readable transcripts from an .nlp reference"),
+    "sentiment": (SCRIPTS_DIR, "run_finbert_on_normalized_transcript", "Call-level FinBERT sentiment"),
+    "segment-sentiment": (SCRIPTS_DIR, "run_finbert_on_segments", "Turn-level FinBERT sentiment"),
+    "collect-sentiment": (SCRIPTS_DIR, "collect_sentiment_data", "Gather call-level sentiment into one CSV"),
+    "fuse": (SCRIPTS_DIR, "temporal_fusion", "Fuse acoustic, sentiment and transcript features per segment"),
+    "feature-stats": (SCRIPTS_DIR, "feature_stats", "Speaker/call/corpus normalization statistics of LLDs"),
+    "downgrade": (SCRIPTS_DIR, "opensmile_downgrade", "Target features of the downgraded audio (--mode full|targeted)"),
+    "sweep": (SCRIPTS_DIR, "degradation_sweep", "Codec/bitrate/SNR degradation sweep"),
+    "check-targeted": (SCRIPTS_DIR, "targeted_features", "Check targeted pitch tracking on synthetic tones"),
+    "model": (SCRIPTS_DIR, "finbert_backend", "Export the offline FinBERT snapshot and measure cold start"),
+    "serve": (SCRIPTS_DIR, "finbert_server", "Local micro-batching FinBERT server"),
+    "ingest": (SCRIPTS_DIR, "ingest_daemon", "Watch the input folders and ingest new calls"),
+    "ratings-report": (RATINGS_DIR, "render_reports", "Render all ratings figures"),
+    "ratings-stats": (RATINGS_DIR, "rating_association_stats", "Bootstrap/permutation statistics vs rating actions"),
+}
+
+# ----------------------------------------
+# status: what exists for each pipeline stage
+# ----------------------------------------
+STATUS_STAGES = [
+    ("mp3", "earnings21/earnings21/media/*.mp3", ".mp3"),
+    ("wav", "earnings21/earnings21/wav/*.wav", ".wav"),
+    ("rttm", "earnings21/earnings21/rttms/*.rttm", ".rttm"),
+    ("nlp", "earnings21/earnings21/transcripts/nlp_references/*.nlp", ".nlp"),
+    ("manifest", "earnings21/earnings21/media_by_speaker/*/*_manifest.json", "_manifest.json"),
+    ("sentiment", "features/semantic/*_finbert_sentiment.json", "_finbert_sentiment.json"),
+    ("segment-sentiment", "features/semantic/segments/*_segment_sentiment.csv", "_segment_sentiment.csv"),
+    ("fused", "features/fused_segments/*_fused.jsonl", "_fused.jsonl"),
+]
+
+def stage_file_ids(base_dir, pattern, suffix):
+    return {os.path.basename(path)[:-len(suffix)] for path in glob.glob(os.path.join(base_dir, pattern))}
+
+def status(argv, base_dir):
+    parser = argparse.ArgumentParser(prog="cli.py status", description="Count the calls present at each stage")
+    parser.add_argument("--missing", metavar="STAGE", choices=[name for name, _, _ in STATUS_STAGES],
+                        help="List calls that have an RTTM but no output for STAGE")
+    args = parser.parse_args(argv)
+
+    found = {name: stage_file_ids(base_dir, pattern, suffix) for name, pattern, suffix in STATUS_STAGES}
+    for name, _, _ in STATUS_STAGES:
+        print(f"{name:<18} {len(found[name]):>5}")
+
+    if args.missing:
+        missing = sorted(found["rttm"] - found[args.missing])
+        print(f"\n{len(missing)} calls without {args.missing}:")
+        for file_id in missing:
+            print(file_id)
+
+# ----------------------------------------
+# Main
+# ----------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="SER credit rating pipeline",
+        epilog="Run '<command> --help' for the options of a command.",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--base-dir", default=DEFAULT_BASE_DIR,
+                        help="Repository/data root; commands run from this directory (default: this checkout)")
+    commands = parser.add_subparsers(dest="command", metavar="command")
+    commands.add_parser("status", help="Count the calls present at each stage", add_help=False)
+    for name, (_, _, help_text) in COMMANDS.items():
+        commands.add_parser(name, help=help_text, add_help=False)
+
+    args, rest = parser.parse_known_args(argv)
+    if args.command is None:
+        parser.print_help()
+        return 1
+
+    base_dir = os.path.abspath(args.base_dir)
+    if args.command == "status":
+        status(rest, base_dir)
+        return 0
+
+    module_dir, module_name, _ = COMMANDS[args.command]
+    # temporal_fusion and the ratings scripts resolve data paths from the working directory
+    os.chdir(os.path.join(base_dir, "ratings") if module_dir == RATINGS_DIR else base_dir)
+    if module_dir not in sys.path:
+        sys.path.insert(0, module_dir)
+    module = importlib.import_module(module_name)
+    sys.argv[0] = f"cli.py {args.command}"  # So the command's own --help shows a useful prog name
+    module.main(rest)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
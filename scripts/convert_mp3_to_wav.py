@@ -5,6 +5,13 @@ from pydub import AudioSegment
 MEDIA_DIR = "../earnings21/earnings21/media"
 WAV_DIR = "../earnings21/earnings21/wav"
 
+def convert_file(mp3_path, wav_path):
+    """
+    Convert a single .mp3 file to .wav.
+    """
+    audio = AudioSegment.from_mp3(mp3_path)
+    audio.export(wav_path, format="wav")
+
 def convert_mp3_to_wav():
     """
     Converts all .mp3 files in the media directory to .wav format
@@ -21,10 +28,7 @@ def convert_mp3_to_wav():
             wav_path = os.path.join(WAV_DIR, wav_filename)
 
             try:
-                # Load the MP3 file
-                audio = AudioSegment.from_mp3(mp3_path)
-                # Export as WAV
-                audio.export(wav_path, format="wav")
+                convert_file(mp3_path, wav_path)
                 print(f"Converted: {mp3_path} -> {wav_path}")
             except Exception as e:
                 print(f"Failed to convert {mp3_path}: {e}")
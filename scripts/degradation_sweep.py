@@ -0,0 +1,171 @@
+import os
+import argparse
+import itertools
+import subprocess
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+from targeted_features import read_wav, extract_targeted
+from opensmile_downgrade import TARGET_FEATURES, NUM_PROCESSES, TARGETED_TASK_MEMORY_MB
+from worker_pool import imap_adaptive
+from call_durations import file_costs
+
+# ----------------------------------------
+# Configuration
+# ----------------------------------------
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+CLEAN_AUDIO_DIR = os.path.join(BASE_DIR, "earnings21", "earnings21", "wav")
+OUTPUT_PATH = os.path.join(BASE_DIR, "features", "degradation_sweep_features.csv")
+
+# Parameter grid; every combination is generated for every clean call.
+# "pcm" is the uncompressed reference and ignores the bitrate axis.
+SWEEP_GRID = {
+    "codec": ["pcm", "mp3", "opus", "aac", "amr"],
+    "bitrate": ["8k", "16k", "32k"],
+    "snr_db": [None, 20, 10, 5],
+}
+# Codecs that only support fixed modes use their own bitrate axis instead
+# (AMR-NB: 4.75k-12.2k)
+CODEC_BITRATES = {
+    "amr": ["4.75k", "7.4k", "12.2k"],
+}
+
+# ffmpeg encoder arguments per codec (the decoded audio is resampled back to the source rate)
+CODECS = {
+    "mp3": ["-c:a", "libmp3lame", "-f", "mp3"],
+    "opus": ["-c:a", "libopus", "-f", "ogg"],
+    "aac": ["-c:a", "aac", "-f", "adts"],
+    "amr": ["-c:a", "libopencore_amrnb", "-ar", "8000", "-f", "amr"],
+}
+NOISE_SEED = 1234
+
+# ----------------------------------------
+# Variant generation (in memory)
+# ----------------------------------------
+def sweep_variants(grid=SWEEP_GRID):
+    """
+    Expand the parameter grid into variant dicts, dropping duplicate
+    bitrates for the uncompressed reference and using CODEC_BITRATES for
+    codecs with fixed modes.
+    """
+    variants, seen = [], set()
+    for codec in grid["codec"]:
+        bitrates = [None] if codec == "pcm" else CODEC_BITRATES.get(codec, grid["bitrate"])
+        for bitrate, snr_db in itertools.product(bitrates, grid["snr_db"]):
+            key = (codec, bitrate, snr_db)
+            if key not in seen:
+                seen.add(key)
+                variants.append({"codec": codec, "bitrate": bitrate, "snr_db": snr_db})
+    return variants
+
+def codec_roundtrip(signal, sample_rate, codec, bitrate):
+    """
+    Encode and decode a signal through ffmpeg over pipes; no files are written.
+    """
+    pcm = (np.clip(signal, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+    raw_input = ["-f", "s16le", "-ar", str(sample_rate), "-ac", "1", "-i", "pipe:0"]
+
+    encode = ["ffmpeg", "-loglevel", "error"] + raw_input + CODECS[codec] + ["-b:a", bitrate, "pipe:1"]
+    encoded = subprocess.run(encode, input=pcm, capture_output=True, check=True).stdout
+
+    decode = ["ffmpeg", "-loglevel", "error", "-i", "pipe:0",
+              "-f", "s16le", "-ar", str(sample_rate), "-ac", "1", "pipe:1"]
+    decoded = subprocess.run(decode, input=encoded, capture_output=True, check=True).stdout
+    return np.frombuffer(decoded, dtype="<i2").astype(np.float32) / 32768.0
+
+def add_noise(signal, snr_db, seed):
+    """
+    Add white Gaussian noise at the given signal-to-noise ratio.
+    """
+    power = float(np.mean(signal.astype(np.float64) ** 2))
+    if power == 0.0:
+        return signal
+    rng = np.random.default_rng(seed)
+    noise = rng.standard_normal(len(signal)).astype(np.float32)
+    return signal + noise * np.float32(np.sqrt(power / 10.0 ** (snr_db / 10.0)))
+
+def degrade(signal, sample_rate, variant, seed=NOISE_SEED):
+    """
+    Apply one variant: codec round trip first, then additive noise.
+    """
+    if variant["codec"] != "pcm":
+        signal = codec_roundtrip(signal, sample_rate, variant["codec"], variant["bitrate"])
+    if variant["snr_db"] is not None:
+        signal = add_noise(signal, variant["snr_db"], seed)
+    return signal
+
+# ----------------------------------------
+# Worker
+# ----------------------------------------
+_clean_cache = {}  # Per-worker cache of the most recently decoded clean call
+
+def load_clean(audio_path):
+    if audio_path not in _clean_cache:
+        _clean_cache.clear()
+        _clean_cache[audio_path] = read_wav(audio_path)
+    return _clean_cache[audio_path]
+
+def process_variant(task):
+    """
+    Generate one variant of one call in memory and extract its features.
+    """
+    audio_path, variant = task
+    row = {"audio_file": os.path.basename(audio_path), **variant}
+    try:
+        signal, sample_rate = load_clean(audio_path)
+        degraded = degrade(signal, sample_rate, variant)
+        row.update(extract_targeted(degraded, sample_rate, TARGET_FEATURES))
+        return row, True
+    except subprocess.CalledProcessError as e:
+        return row, e.stderr.decode(errors="replace").strip() or str(e)
+    except Exception as e:
+        return row, f"Unexpected error: {str(e)}"
+
+def run_sweep(audio_files, grid=SWEEP_GRID, processes=NUM_PROCESSES):
+    """
+    Sweep every variant of every call across a process pool and return the
+    combined feature table. All variants of one call form a single pool task,
+    so each call is decoded once by one worker; the longest calls are
+    dispatched first.
+    """
+    variants = sweep_variants(grid)
+    tasks = [(path, variant) for path in audio_files for variant in variants]
+    durations = dict(zip(audio_files, file_costs(audio_files)))
+    print(f"Sweeping {len(variants)} variants x {len(audio_files)} calls = {len(tasks)} tasks")
+
+    rows, failed = [], []
+    # Tasks are ordered call by call, so chunks of len(variants) are exactly one call each
+    results = imap_adaptive(process_variant, tasks, max_workers=processes,
+                            memory_per_task_mb=TARGETED_TASK_MEMORY_MB, chunksize=len(variants),
+                            costs=[durations[path] for path, _ in tasks])
+    for row, status in tqdm(results, total=len(tasks)):
+        if status is True:
+            rows.append(row)
+        else:
+            failed.append((row, status))
+
+    print(f"\nSuccess: {len(rows)} | Failed: {len(failed)}")
+    for row, error in failed[:5]:
+        print(f"{row['audio_file']} {row['codec']}/{row['bitrate']}/{row['snr_db']}: {error}")
+
+    # Results arrive in completion order
+    table = pd.DataFrame(rows, columns=["audio_file", "codec", "bitrate", "snr_db"] + TARGET_FEATURES)
+    return table.sort_values(["audio_file", "codec", "bitrate", "snr_db"], na_position="first", ignore_index=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Codec/bitrate/SNR degradation sweep with targeted features")
+    parser.add_argument("--audio-dir", default=CLEAN_AUDIO_DIR)
+    parser.add_argument("--output", default=OUTPUT_PATH)
+    parser.add_argument("--processes", type=int, default=NUM_PROCESSES)
+    args = parser.parse_args(argv)
+
+    audio_files = sorted(os.path.join(args.audio_dir, f) for f in os.listdir(args.audio_dir) if f.endswith(".wav"))
+    print(f"Found {len(audio_files)} clean audio files.")
+
+    combined_df = run_sweep(audio_files, processes=args.processes)
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    combined_df.to_csv(args.output, index=False)
+    print(f"\nCombined features saved to: {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,8 @@
 import os
+import argparse
 import subprocess
+from worker_pool import imap_adaptive
+from call_durations import file_costs
 
 # Base directory of the project (relative to this script)
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
@@ -16,48 +19,82 @@ OPENSMILE_BIN = os.path.join(BASE_DIR, "opensmile", "build", "progsrc", "smilext
 # Path to ComParE_2016.conf configuration file
 CONFIG_PATH = os.path.join(BASE_DIR, "opensmile", "config", "compare16", "ComParE_2016.conf")
 
-# Make sure the output root exists
-os.makedirs(OUTPUT_ROOT, exist_ok=True)
-
-# Loop through each subdirectory (e.g., 4384683) in the input directory
-for file_id in os.listdir(INPUT_ROOT):
-    input_dir = os.path.join(INPUT_ROOT, file_id)
-
-    # Skip non-directory entries
-    if not os.path.isdir(input_dir):
-        continue
-
-    # Create output directory for this file_id
-    output_dir = os.path.join(OUTPUT_ROOT, file_id)
-    os.makedirs(output_dir, exist_ok=True)
-
-    # Process each .wav file in the subdirectory
-    for wav_filename in os.listdir(input_dir):
-        if not wav_filename.endswith(".wav"):
+def extraction_jobs(input_root=INPUT_ROOT, output_root=OUTPUT_ROOT):
+    """
+    List (input wav, output csv) pairs for every speaker file under input_root.
+    """
+    jobs = []
+    # Loop through each subdirectory (e.g., 4384683) in the input directory
+    for file_id in sorted(os.listdir(input_root)):
+        input_dir = os.path.join(input_root, file_id)
+
+        # Skip non-directory entries
+        if not os.path.isdir(input_dir):
             continue
 
-        input_path = os.path.join(input_dir, wav_filename)
-
-        # Use the .wav file base name as the .csv output name
-        base_name = os.path.splitext(wav_filename)[0]
-        output_csv = os.path.join(output_dir, f"{base_name}.csv")
-
-        # Construct openSMILE command
-        cmd = [
-            OPENSMILE_BIN,
-            "-C", CONFIG_PATH,
-            "-I", input_path,
-            "-O", output_csv
-        ]
-
-        # Log processing status
-        print(f"Extracting: {input_path}")
-        print(f"Saving to : {output_csv}")
-
-        # Run the command
-        try:
-            subprocess.run(cmd, check=True)
-        except subprocess.CalledProcessError as e:
-            print(f"Feature extraction failed for {input_path}: {e}")
-
-print("All feature extraction tasks completed.")
\ No newline at end of file
+        # Process each .wav file in the subdirectory
+        for wav_filename in sorted(os.listdir(input_dir)):
+            if not wav_filename.endswith(".wav"):
+                continue
+
+            # Use the .wav file base name as the .csv output name
+            base_name = os.path.splitext(wav_filename)[0]
+            jobs.append((os.path.join(input_dir, wav_filename),
+                         os.path.join(output_root, file_id, f"{base_name}.csv")))
+    return jobs
+
+def extract_file(input_path, output_csv, opensmile_bin=OPENSMILE_BIN, config_path=CONFIG_PATH):
+    """Run openSMILE on one speaker file. Returns True on success."""
+    os.makedirs(os.path.dirname(output_csv), exist_ok=True)
+
+    # Construct openSMILE command
+    cmd = [
+        opensmile_bin,
+        "-C", config_path,
+        "-I", input_path,
+        "-O", output_csv
+    ]
+
+    # Log processing status
+    print(f"Extracting: {input_path}")
+    print(f"Saving to : {output_csv}")
+
+    # Run the command
+    try:
+        subprocess.run(cmd, check=True)
+        return True
+    except subprocess.CalledProcessError as e:
+        print(f"Feature extraction failed for {input_path}: {e}")
+        return False
+
+def extract_job(job):
+    """Worker entry point: extract_file() on one (input wav, output csv, binary, config) tuple."""
+    return extract_file(*job)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ComParE_2016 features for every per-speaker wav")
+    parser.add_argument("--input-root", default=INPUT_ROOT)
+    parser.add_argument("--output-root", default=OUTPUT_ROOT)
+    parser.add_argument("--opensmile-bin", default=OPENSMILE_BIN)
+    parser.add_argument("--config", default=CONFIG_PATH)
+    parser.add_argument("--workers", type=int, default=None, help="Upper bound on parallel SMILExtract runs")
+    parser.add_argument("--dry-run", action="store_true", help="List the files that would be extracted")
+    args = parser.parse_args(argv)
+
+    jobs = extraction_jobs(args.input_root, args.output_root)
+    if args.dry_run:
+        for input_path, output_csv in jobs:
+            print(f"{input_path} -> {output_csv}")
+        print(f"{len(jobs)} files would be extracted")
+        return
+
+    # One SMILExtract per speaker file, longest files dispatched first
+    tasks = [(input_path, output_csv, args.opensmile_bin, args.config) for input_path, output_csv in jobs]
+    for _ in imap_adaptive(extract_job, tasks, max_workers=args.workers,
+                           costs=file_costs([input_path for input_path, _ in jobs])):
+        pass
+
+    print("All feature extraction tasks completed.")
+
+if __name__ == "__main__":
+    main()
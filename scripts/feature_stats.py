@@ -0,0 +1,272 @@
+import os
+import glob
+import json
+import argparse
+import numpy as np
+from lld_cache import load_lld_matrix
+from worker_pool import imap_adaptive
+from call_durations import call_costs
+
+# ----------------------------------------
+# Normalization statistics for acoustic features
+# ----------------------------------------
+# One streaming pass over the speaker LLD (or functional) files listed in the
+# segmentation manifests computes count/mean/variance/min/max per column for
+# every speaker, call and the corpus. Files are read in BLOCK_ROWS slices of
+# the memory-mapped LLD cache; each worker returns only the small per-speaker
+# accumulators of its call, which are merged into call and corpus statistics
+# with the parallel (Chan et al.) form of Welford's update. Statistics are
+# stored in STATS_DIR and applied at load time by Normalizer (see
+# NORMALIZATION in temporal_fusion.py); feature files are never rewritten.
+# Paths are relative to the repository root, as in temporal_fusion.py.
+MANIFEST_DIR = "earnings21/earnings21/media_by_speaker"
+STATS_DIR = "features/normalization"
+BLOCK_ROWS = 65536        # LLD frames read per update
+TASK_MEMORY_MB = 128      # One block in float64 plus temporaries
+STATS_VERSION = 1
+LEVELS = ["speaker", "call", "corpus"]
+KINDS = ["llds", "functionals"]  # Manifest entries of each speaker
+# A functionals file summarises a whole speaker WAV in (typically) a single
+# row, so per-speaker statistics would have count 1 and std 0 and z-scoring
+# would centre every value to 0; functionals are normalized per call or corpus
+KIND_LEVELS = {"llds": LEVELS, "functionals": ["call", "corpus"]}
+
+# ----------------------------------------
+# Mergeable running statistics
+# ----------------------------------------
+class RunningStats:
+    """
+    Per-column count, mean, sum of squared deviations (M2), min and max.
+    Updated block by block and merged across partitions; NaNs are not counted.
+    """
+    def __init__(self, columns):
+        self.columns = list(columns)
+        size = len(self.columns)
+        self.count = np.zeros(size, dtype=np.int64)
+        self.mean = np.zeros(size)
+        self.m2 = np.zeros(size)
+        self.min = np.full(size, np.inf)
+        self.max = np.full(size, -np.inf)
+
+    def update(self, block):
+        """Add the rows of a (n_rows, n_columns) block."""
+        block = np.asarray(block, dtype=np.float64)
+        finite = np.isfinite(block)
+        count = finite.sum(axis=0)
+        if not count.any():
+            return self
+        mean = np.where(finite, block, 0.0).sum(axis=0) / np.maximum(count, 1)
+        m2 = np.square(np.where(finite, block - mean, 0.0)).sum(axis=0)
+        self._combine(count, mean, m2,
+                      np.where(finite, block, np.inf).min(axis=0), np.where(finite, block, -np.inf).max(axis=0))
+        return self
+
+    def merge(self, other):
+        """Fold in statistics computed over other rows with the same columns."""
+        if other.columns != self.columns:
+            raise ValueError("Cannot merge statistics over different columns")
+        self._combine(other.count, other.mean, other.m2, other.min, other.max)
+        return self
+
+    def _combine(self, count, mean, m2, low, high):
+        total = self.count + count
+        delta = mean - self.mean
+        weight = count / np.maximum(total, 1)
+        self.mean = self.mean + delta * weight
+        self.m2 = self.m2 + m2 + np.square(delta) * self.count * weight
+        self.count = total
+        self.min = np.minimum(self.min, low)
+        self.max = np.maximum(self.max, high)
+
+    def variance(self):
+        """Population variance per column (NaN where no values were seen)."""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(self.count > 0, self.m2 / self.count, np.nan)
+
+    def std(self):
+        return np.sqrt(self.variance())
+
+    def to_dict(self):
+        seen = self.count > 0
+        as_list = lambda values: [float(v) if ok else None for v, ok in zip(values, seen)]
+        return {"count": self.count.tolist(), "mean": as_list(self.mean), "std": as_list(self.std()),
+                "m2": as_list(self.m2), "min": as_list(self.min), "max": as_list(self.max)}
+
+    @classmethod
+    def from_dict(cls, columns, data):
+        stats = cls(columns)
+        stats.count = np.asarray(data["count"], dtype=np.int64)
+        for name, empty in (("mean", 0.0), ("m2", 0.0), ("min", np.inf), ("max", -np.inf)):
+            setattr(stats, name, np.array([empty if v is None else v for v in data[name]], dtype=np.float64))
+        return stats
+
+# ----------------------------------------
+# Streaming pass
+# ----------------------------------------
+def speaker_files(file_id, kind="llds"):
+    """{ speaker: feature file } from the call's segmentation manifest."""
+    try:
+        with open(os.path.join(MANIFEST_DIR, file_id, f"{file_id}_manifest.json"), "r") as f:
+            speakers = json.load(f).get("speakers", {})
+    except (OSError, ValueError):
+        return {}
+    return {speaker: entry[kind] for speaker, entry in speakers.items() if os.path.exists(entry.get(kind, ""))}
+
+def file_stats(path, block_rows=BLOCK_ROWS):
+    """RunningStats of one feature file, read block by block from the LLD cache."""
+    _, columns, values = load_lld_matrix(path)
+    stats = RunningStats(columns)
+    for start in range(0, len(values), block_rows):
+        stats.update(values[start:start + block_rows])
+    return stats
+
+def call_stats(task):
+    """Worker entry point: (file_id, { speaker: RunningStats }, errors) for one call."""
+    file_id, kind = task
+    speakers, errors = {}, []
+    for speaker, path in sorted(speaker_files(file_id, kind).items()):
+        try:
+            speakers[speaker] = file_stats(path)
+        except Exception as e:
+            errors.append(f"{path}: {e}")
+    return file_id, speakers, errors
+
+def collect_stats(file_ids, kind="llds", max_workers=None):
+    """
+    Statistics per speaker, call and corpus. Calls are processed in parallel
+    (longest first); partitions are merged in file_id order so the result does
+    not depend on completion order.
+    """
+    results = {}
+    for file_id, speakers, errors in imap_adaptive(call_stats, [(f, kind) for f in file_ids],
+                                                   memory_per_task_mb=TASK_MEMORY_MB, max_workers=max_workers,
+                                                   costs=call_costs(file_ids)):
+        for error in errors:
+            print(f"[ERROR] {error}")
+        results[file_id] = speakers
+
+    columns, corpus, calls, by_speaker = None, None, {}, {}
+    for file_id in sorted(results):
+        for speaker, stats in sorted(results[file_id].items()):
+            if columns is None:
+                columns, corpus = stats.columns, RunningStats(stats.columns)
+            if stats.columns != columns:
+                print(f"[WARN] {file_id} speaker {speaker}: columns differ from the corpus, skipped")
+                continue
+            by_speaker.setdefault(file_id, {})[speaker] = stats
+            calls.setdefault(file_id, RunningStats(columns)).merge(stats)
+            corpus.merge(stats)
+    return columns, corpus, calls, by_speaker
+
+def stats_path(kind="llds", stats_dir=STATS_DIR):
+    return os.path.join(stats_dir, f"{kind}_stats.json")
+
+def save_stats(path, kind, columns, corpus, calls, by_speaker):
+    """Write all levels to one JSON file (replaced atomically)."""
+    data = {
+        "version": STATS_VERSION,
+        "kind": kind,
+        "columns": columns,
+        "corpus": corpus.to_dict(),
+        "calls": {file_id: stats.to_dict() for file_id, stats in calls.items()},
+        "speakers": {file_id: {speaker: stats.to_dict() for speaker, stats in speakers.items()}
+                     for file_id, speakers in by_speaker.items()} if "speaker" in KIND_LEVELS[kind] else {},
+    }
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+# ----------------------------------------
+# Applying the statistics at load time
+# ----------------------------------------
+class Normalizer:
+    """
+    Z-score feature matrices with stored statistics at one level ("speaker",
+    "call" or "corpus"; functionals only "call" or "corpus", see KIND_LEVELS).
+    The stats file is read on first use; a speaker or call without statistics
+    falls back to the corpus.
+    """
+    def __init__(self, level="speaker", kind="llds", path=None):
+        if level not in LEVELS:
+            raise ValueError(f"Unknown normalization level '{level}'")
+        if level not in KIND_LEVELS[kind]:
+            raise ValueError(f"{kind} can only be normalized per {' or '.join(KIND_LEVELS[kind])}, not per {level}")
+        self.level = level
+        self.path = path or stats_path(kind)
+        self._data = None
+        self._cache = {}
+
+    def _stats(self, file_id, speaker):
+        if self._data is None:
+            with open(self.path, "r") as f:
+                self._data = json.load(f)
+            if self._data.get("version") != STATS_VERSION:
+                raise ValueError(f"Unsupported statistics version in {self.path}")
+
+        entry = None
+        if self.level == "speaker":
+            entry = self._data["speakers"].get(file_id, {}).get(speaker)
+        elif self.level == "call":
+            entry = self._data["calls"].get(file_id)
+        if entry is None:
+            if self.level != "corpus":
+                print(f"[WARN] No {self.level} statistics for {file_id}/{speaker}; using corpus statistics")
+            entry = self._data["corpus"]
+        return entry
+
+    def apply(self, values, columns, file_id=None, speaker=None):
+        """
+        Return a float32 copy of values (n_rows, len(columns)) z-scored per
+        column. Columns without statistics, or with zero variance, are only
+        centred or left unchanged.
+        """
+        key = (file_id, speaker, tuple(columns))
+        if key not in self._cache:
+            entry = self._stats(file_id, speaker)
+            index = {name: i for i, name in enumerate(self._data["columns"])}
+            mean = np.zeros(len(columns))
+            scale = np.ones(len(columns))
+            for i, name in enumerate(columns):
+                j = index.get(name)
+                if j is None or entry["mean"][j] is None:
+                    continue
+                mean[i] = entry["mean"][j]
+                if entry["std"][j]:
+                    scale[i] = entry["std"][j]
+            self._cache[key] = (mean, scale)
+        mean, scale = self._cache[key]
+        return ((np.asarray(values, dtype=np.float64) - mean) / scale).astype(np.float32)
+
+# ----------------------------------------
+# Main
+# ----------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-speaker, per-call and corpus statistics of acoustic features")
+    parser.add_argument("file_ids", nargs="*", help="Calls to include (default: every call with a manifest)")
+    parser.add_argument("--kind", choices=KINDS, default="llds", help="Feature files to summarise")
+    parser.add_argument("--output", default=None, help=f"Stats file (default: {STATS_DIR}/<kind>_stats.json)")
+    parser.add_argument("--workers", type=int, default=None, help="Upper bound on worker processes")
+    args = parser.parse_args(argv)
+
+    file_ids = args.file_ids or sorted(os.path.basename(os.path.dirname(p))
+                                       for p in glob.glob(os.path.join(MANIFEST_DIR, "*", "*_manifest.json")))
+    if not file_ids:
+        print(f"No speaker manifests found in {MANIFEST_DIR}. Run segment_audio_by_speaker.py first.")
+        return
+
+    columns, corpus, calls, by_speaker = collect_stats(file_ids, args.kind, args.workers)
+    if columns is None:
+        print(f"No {args.kind} files found for {len(file_ids)} calls.")
+        return
+
+    output = args.output or stats_path(args.kind)
+    save_stats(output, args.kind, columns, corpus, calls, by_speaker)
+    speakers = sum(len(s) for s in by_speaker.values())
+    print(f"[DONE] {args.kind} statistics over {int(corpus.count.max())} rows, {len(calls)} calls, "
+          f"{speakers} speakers, {len(columns)} columns saved to: {output} "
+          f"(levels: {', '.join(KIND_LEVELS[args.kind])})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+# torch and transformers are imported inside the functions that use them so
+# that importing this module (e.g. for BACKENDS) stays cheap.
+MODEL_NAME = "yiyanghkust/finbert-tone"
+# Local offline copy written by --export: safetensors weights (memory-mapped on
+# load) and a fast-tokenizer tokenizer.json. Used instead of the hub when present.
+SNAPSHOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "models", "finbert-tone")
+SNAPSHOT_FILES = ["config.json", "model.safetensors", "tokenizer.json"]
+BACKENDS = ["auto", "gpu", "cpu", "cpu-int8"]
+MAX_LENGTH = 512
+
+# ---------------------------------------------
+# Backend selection
+# ---------------------------------------------
+def resolve_backend(backend):
+    """
+    'auto' picks the GPU when one is visible, otherwise fp32 on CPU, so results
+    match the fp32 baseline unless 'cpu-int8' is requested explicitly.
+    """
+    import torch
+    if backend == "auto":
+        return "gpu" if torch.cuda.is_available() else "cpu"
+    if backend == "gpu" and not torch.cuda.is_available():
+        raise RuntimeError("Backend 'gpu' requested but no CUDA device is available")
+    return backend
+
+def configure_cpu_threads(threads=None):
+    """
+    Set intra-op threads (default: the CPUs this process may use) and a single
+    inter-op thread, which suits batched BERT inference on CPU.
+    """
+    import torch
+    if threads is None:
+        threads = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+    torch.set_num_threads(max(1, threads))
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass  # Already set once parallel work has started
+    return torch.get_num_threads()
+
+def quantize_model(model):
+    """
+    Dynamic int8 quantization of FinBERT's Linear layers (weights int8,
+    activations quantized on the fly).
+    """
+    import torch
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+# ---------------------------------------------
+# Offline snapshot
+# ---------------------------------------------
+def has_snapshot(snapshot_dir=SNAPSHOT_DIR):
+    return all(os.path.exists(os.path.join(snapshot_dir, name)) for name in SNAPSHOT_FILES)
+
+def model_source(snapshot_dir=SNAPSHOT_DIR):
+    """The snapshot directory when it is complete, otherwise the hub model name."""
+    return snapshot_dir if has_snapshot(snapshot_dir) else MODEL_NAME
+
+def export_snapshot(snapshot_dir=SNAPSHOT_DIR):
+    """
+    One-time export of FinBERT from the hub into snapshot_dir: weights as
+    safetensors and the tokenizer converted to a fast tokenizer.json.
+    """
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification
+    tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME, use_fast=True)
+    model = AutoModelForSequenceClassification.from_pretrained(MODEL_NAME)
+
+    os.makedirs(snapshot_dir, exist_ok=True)
+    model.save_pretrained(snapshot_dir, safe_serialization=True)
+    tokenizer.save_pretrained(snapshot_dir)
+    with open(os.path.join(snapshot_dir, "snapshot.json"), "w") as f:
+        json.dump({"source": MODEL_NAME, "exported": time.strftime("%Y-%m-%d %H:%M:%S")}, f, indent=4)
+
+    missing = [name for name in SNAPSHOT_FILES if not os.path.exists(os.path.join(snapshot_dir, name))]
+    if missing:
+        raise RuntimeError(f"Snapshot export incomplete, missing: {missing}")
+    return snapshot_dir
+
+def load_weights(source=None):
+    """
+    Load (tokenizer, fp32 model) from the snapshot (offline, memory-mapped
+    safetensors) or from the hub. Returns (tokenizer, model, seconds).
+    """
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification
+    source = source or model_source()
+    local = source != MODEL_NAME
+    start = time.perf_counter()
+    tokenizer = AutoTokenizer.from_pretrained(source, use_fast=True, local_files_only=local)
+    model = AutoModelForSequenceClassification.from_pretrained(source, local_files_only=local).eval()
+    return tokenizer, model, time.perf_counter() - start
+
+def load_finbert(backend="auto", threads=None):
+    """
+    Load tokenizer and classifier for the requested backend.
+    Returns (tokenizer, model, device, backend).
+    """
+    import torch
+    backend = resolve_backend(backend)
+    source = model_source()
+    tokenizer, model, seconds = load_weights(source)
+    print(f"[INFO] FinBERT loaded from {'snapshot' if source != MODEL_NAME else 'hub cache'} in {seconds:.2f}s")
+
+    if backend == "gpu":
+        device = torch.device("cuda")
+        model = model.to(device)
+    else:
+        device = torch.device("cpu")
+        print(f"[INFO] CPU backend using {configure_cpu_threads(threads)} intra-op threads")
+        if backend == "cpu-int8":
+            model = quantize_model(model)
+    return tokenizer, model, device, backend
+
+# ---------------------------------------------
+# Accuracy check against the fp32 model
+# ---------------------------------------------
+def predict_probabilities(tokenizer, model, texts, device="cpu", batch_size=8):
+    """
+    Class probabilities for a list of texts, in the model's label order.
+    """
+    import torch
+    outputs = []
+    with torch.inference_mode():
+        for i in range(0, len(texts), batch_size):
+            enc = tokenizer(texts[i:i + batch_size], truncation=True, max_length=MAX_LENGTH,
+                            padding=True, return_tensors="pt").to(device)
+            outputs.append(torch.softmax(model(**enc).logits, dim=-1).cpu())
+    return torch.cat(outputs) if outputs else torch.empty(0, model.config.num_labels)
+
+def accuracy_delta(tokenizer, model, texts):
+    """
+    Compare a quantized CPU model against the fp32 reference on sample texts.
+    Returns label agreement, probability differences and per-backend timings.
+    """
+    _, reference, _ = load_weights()
+
+    start = time.perf_counter()
+    ref_probs = predict_probabilities(tokenizer, reference, texts)
+    ref_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    probs = predict_probabilities(tokenizer, model, texts)
+    model_time = time.perf_counter() - start
+
+    diff = (probs - ref_probs).abs()
+    return {
+        "samples": len(texts),
+        "label_agreement": float((probs.argmax(-1) == ref_probs.argmax(-1)).float().mean()) if len(texts) else None,
+        "max_abs_prob_diff": float(diff.max()) if len(texts) else None,
+        "mean_abs_prob_diff": float(diff.mean()) if len(texts) else None,
+        "fp32_seconds": ref_time,
+        "backend_seconds": model_time,
+    }
+
+# ---------------------------------------------
+# Snapshot export and cold-start measurement
+# ---------------------------------------------
+def measure_cold_start(source):
+    """
+    Time a fresh interpreter importing transformers and loading source.
+    Returns {"source", "import_seconds", "load_seconds"}.
+    """
+    cmd = [sys.executable, os.path.abspath(__file__), "--time-load", source]
+    output = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export and benchmark the offline FinBERT snapshot")
+    parser.add_argument("--snapshot-dir", default=SNAPSHOT_DIR)
+    parser.add_argument("--export", action="store_true", help="Export the hub model into --snapshot-dir")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Measure cold-start load time from the hub cache and from the snapshot")
+    parser.add_argument("--time-load", metavar="SOURCE", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.time_load:
+        # Child process of measure_cold_start: report timings as one JSON line
+        start = time.perf_counter()
+        import transformers  # noqa: F401
+        import_seconds = time.perf_counter() - start
+        _, _, load_seconds = load_weights(args.time_load)
+        print(json.dumps({"source": args.time_load, "import_seconds": import_seconds, "load_seconds": load_seconds}))
+        return
+
+    if args.export:
+        print(f"Exporting {MODEL_NAME} to {os.path.abspath(args.snapshot_dir)}...")
+        export_snapshot(args.snapshot_dir)
+        print("[DONE] Snapshot written")
+
+    if args.benchmark:
+        sources = [MODEL_NAME] + ([args.snapshot_dir] if has_snapshot(args.snapshot_dir) else [])
+        report = [measure_cold_start(source) for source in sources]
+        for row in report:
+            print(f"[INFO] {row['source']}: import {row['import_seconds']:.2f}s, load {row['load_seconds']:.2f}s")
+        os.makedirs(args.snapshot_dir, exist_ok=True)
+        with open(os.path.join(args.snapshot_dir, "cold_start.json"), "w") as f:
+            json.dump(report, f, indent=4)
+
+if __name__ == "__main__":
+    main()
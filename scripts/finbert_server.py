@@ -0,0 +1,224 @@
+import json
+import time
+import queue
+import argparse
+import threading
+import urllib.request
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# ---------------------------------------------
+# Local FinBERT inference service
+# ---------------------------------------------
+# One resident model shared by every pipeline worker or notebook on the machine.
+# Concurrent requests are merged into micro-batches: the first waiting request
+# opens a batch, which is run once it holds MAX_BATCH_TEXTS texts or once
+# MAX_LATENCY_MS have passed, whichever comes first.
+#
+#   POST /predict  {"texts": [...]}  ->  {"labels": [...], "probabilities": [[...], ...]}
+#   GET  /health                     ->  backend, labels and batching counters
+#
+# Only the standard library is imported at module level so the client side
+# (predict_remote) can be used without torch installed.
+HOST = "127.0.0.1"
+PORT = 8765
+SERVER_URL = f"http://{HOST}:{PORT}"
+
+MAX_BATCH_TEXTS = 32   # Texts per forward pass
+MAX_LATENCY_MS = 20    # How long the first request of a batch may wait for company
+SUB_BATCH_SIZE = 8     # Length-sorted chunk size inside a micro-batch
+REQUEST_TIMEOUT = 300  # Client-side timeout in seconds
+
+# ---------------------------------------------
+# Micro-batching
+# ---------------------------------------------
+class PendingRequest:
+    def __init__(self, texts):
+        self.texts = texts
+        self.done = threading.Event()
+        self.probabilities = None
+        self.error = None
+
+class MicroBatcher:
+    """
+    Collects requests from handler threads and runs them through the model
+    on a single inference thread.
+    """
+    def __init__(self, tokenizer, model, device, max_batch_texts=MAX_BATCH_TEXTS, max_latency_ms=MAX_LATENCY_MS):
+        self.tokenizer = tokenizer
+        self.model = model
+        self.device = device
+        self.max_batch_texts = max_batch_texts
+        self.max_latency = max_latency_ms / 1000.0
+        self.labels = [model.config.id2label[i] for i in range(model.config.num_labels)]
+        self.requests = queue.Queue()
+        self.stats = {"requests": 0, "texts": 0, "batches": 0, "model_seconds": 0.0}
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def predict(self, texts):
+        """Blocking call used by handler threads. Returns one probability row per text."""
+        request = PendingRequest(texts)
+        self.requests.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.probabilities
+
+    def collect_batch(self):
+        """Wait for one request, then keep adding requests until the batch is full or the deadline passes."""
+        batch = [self.requests.get()]
+        size = len(batch[0].texts)
+        deadline = time.monotonic() + self.max_latency
+        while size < self.max_batch_texts:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self.requests.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(request)
+            size += len(request.texts)
+        return batch
+
+    def run_model(self, texts):
+        import torch
+        encodings = self.tokenizer(texts, truncation=True, max_length=512)["input_ids"]
+        order = sorted(range(len(encodings)), key=lambda i: len(encodings[i]))
+        probabilities = [None] * len(texts)
+        with torch.inference_mode():
+            for i in range(0, len(order), SUB_BATCH_SIZE):
+                chunk = order[i:i + SUB_BATCH_SIZE]
+                padded = self.tokenizer.pad({"input_ids": [encodings[j] for j in chunk]}, return_tensors="pt")
+                padded = {k: v.to(self.device) for k, v in padded.items()}
+                probs = torch.softmax(self.model(**padded).logits, dim=-1).cpu().tolist()
+                for j, row in zip(chunk, probs):
+                    probabilities[j] = row
+        return probabilities
+
+    def run(self):
+        while True:
+            batch = self.collect_batch()
+            texts = [text for request in batch for text in request.texts]
+            start = time.perf_counter()
+            try:
+                probabilities = self.run_model(texts) if texts else []
+            except Exception as e:
+                for request in batch:
+                    request.error = e
+                    request.done.set()
+                continue
+            self.stats["model_seconds"] += time.perf_counter() - start
+            self.stats["requests"] += len(batch)
+            self.stats["texts"] += len(texts)
+            self.stats["batches"] += 1
+
+            offset = 0
+            for request in batch:
+                request.probabilities = probabilities[offset:offset + len(request.texts)]
+                offset += len(request.texts)
+                request.done.set()
+
+# ---------------------------------------------
+# HTTP front end
+# ---------------------------------------------
+class FinbertHandler(BaseHTTPRequestHandler):
+    batcher = None
+    backend = None
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path != "/health":
+            self.send_json(404, {"error": "not found"})
+            return
+        stats = dict(self.batcher.stats)
+        stats["mean_batch_texts"] = stats["texts"] / stats["batches"] if stats["batches"] else 0.0
+        self.send_json(200, {"backend": self.backend, "labels": self.batcher.labels, "stats": stats})
+
+    def do_POST(self):
+        if self.path != "/predict":
+            self.send_json(404, {"error": "not found"})
+            return
+        try:
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            texts = payload["texts"]
+            if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+                raise ValueError("'texts' must be a list of strings")
+        except (ValueError, KeyError, TypeError) as e:
+            self.send_json(400, {"error": str(e)})
+            return
+        try:
+            probabilities = self.batcher.predict(texts)
+        except Exception as e:
+            self.send_json(500, {"error": str(e)})
+            return
+        self.send_json(200, {"labels": self.batcher.labels, "probabilities": probabilities})
+
+    def log_message(self, format, *args):
+        pass  # Per-request access logs would drown the batching summary
+
+class FinbertServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # Default listen backlog of 5 resets bursts from parallel workers
+
+# ---------------------------------------------
+# Client
+# ---------------------------------------------
+def predict_remote(texts, url=SERVER_URL, timeout=REQUEST_TIMEOUT):
+    """
+    Send texts to a running server. Returns (labels, probabilities) with one
+    probability row per text, in the model's label order.
+    """
+    request = urllib.request.Request(
+        f"{url.rstrip('/')}/predict",
+        data=json.dumps({"texts": list(texts)}).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+    )
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        result = json.loads(response.read())
+    return result["labels"], result["probabilities"]
+
+# ---------------------------------------------
+# Main
+# ---------------------------------------------
+def main(argv=None):
+    from finbert_backend import BACKENDS, load_finbert
+
+    parser = argparse.ArgumentParser(description="Serve FinBERT predictions with dynamic micro-batching")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--backend", choices=BACKENDS, default="auto")
+    parser.add_argument("--threads", type=int, default=None, help="Intra-op threads for CPU backends")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH_TEXTS, help="Texts per micro-batch")
+    parser.add_argument("--max-latency-ms", type=float, default=MAX_LATENCY_MS,
+                        help="Longest a request waits for a batch to fill")
+    args = parser.parse_args(argv)
+
+    print("Loading FinBERT model...")
+    tokenizer, model, device, backend = load_finbert(args.backend, args.threads)
+    FinbertHandler.batcher = MicroBatcher(tokenizer, model, device, args.max_batch, args.max_latency_ms)
+    FinbertHandler.backend = backend
+
+    server = FinbertServer((args.host, args.port), FinbertHandler)
+    print(f"[INFO] Serving FinBERT ({backend}) on http://{args.host}:{args.port} "
+          f"(max batch {args.max_batch}, max latency {args.max_latency_ms:g} ms)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        stats = FinbertHandler.batcher.stats
+        if stats["batches"]:
+            print(f"[INFO] Served {stats['requests']} requests / {stats['texts']} texts in "
+                  f"{stats['batches']} batches ({stats['texts'] / stats['batches']:.1f} texts per batch)")
+
+if __name__ == "__main__":
+    main()
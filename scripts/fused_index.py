@@ -0,0 +1,104 @@
+import os
+import glob
+import json
+import pandas as pd
+from fused_store import fused_dir, read_columnar_rows, fused_to_records
+
+# ----------------------------------------
+# Random-access index over fused segment outputs
+# ----------------------------------------
+# <file_id>_fused.index.csv is written next to each call's fused outputs with
+# one row per segment: speaker, start, end, the byte offset/length of its line
+# in <file_id>_fused.jsonl and its row in the columnar <file_id>_fused/ matrix
+# (-1 where that output was not written). Queries filter the small index
+# tables and then read only the matching segments.
+
+INDEX_COLUMNS = ["file_id", "speaker", "start", "end", "offset", "length", "row"]
+
+def index_path(output_dir, file_id):
+    return os.path.join(output_dir, f"{file_id}_fused.index.csv")
+
+def write_index(output_dir, file_id, records, offsets=None, rows=None):
+    """
+    Write the index for one call. offsets is a list of (offset, length) byte
+    spans in the JSONL file and rows the matrix rows in the columnar output,
+    both aligned with records.
+    """
+    index = pd.DataFrame({
+        "file_id": [r["file_id"] for r in records],
+        "speaker": [str(r["speaker"]) for r in records],
+        "start": [r["start"] for r in records],
+        "end": [r["end"] for r in records],
+        "offset": [o for o, _ in offsets] if offsets else -1,
+        "length": [n for _, n in offsets] if offsets else -1,
+        "row": rows if rows is not None else -1,
+    }, columns=INDEX_COLUMNS)
+    path = index_path(output_dir, file_id)
+    tmp_path = f"{path}.tmp"
+    index.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    return path
+
+def index_jsonl(output_dir, file_id):
+    """
+    Build the index of an existing _fused.jsonl (one sequential scan), for
+    outputs written before indexes existed.
+    """
+    jsonl_path = os.path.join(output_dir, f"{file_id}_fused.jsonl")
+    records, offsets = [], []
+    with open(jsonl_path, "rb") as f:
+        offset = 0
+        for line in f:
+            if line.strip():
+                records.append(json.loads(line))
+                offsets.append((offset, len(line)))
+            offset += len(line)
+    rows = list(range(len(records))) if os.path.isdir(fused_dir(output_dir, file_id)) else None
+    return write_index(output_dir, file_id, records, offsets, rows)
+
+def load_index(output_dir, file_ids=None):
+    """
+    Concatenate the per-call indexes of the given calls (default: all calls).
+    """
+    if file_ids is None:
+        paths = sorted(glob.glob(os.path.join(output_dir, "*_fused.index.csv")))
+    else:
+        paths = [index_path(output_dir, file_id) for file_id in file_ids]
+    tables = [pd.read_csv(p, dtype={"file_id": str, "speaker": str}) for p in paths if os.path.exists(p)]
+    if not tables:
+        return pd.DataFrame(columns=INDEX_COLUMNS)
+    return pd.concat(tables, ignore_index=True)
+
+def query_segments(output_dir, file_ids=None, speaker=None, start=None, end=None, source="jsonl"):
+    """
+    Fetch fused segments matching a speaker and/or overlapping [start, end]
+    across many calls, reading only the matching entries.
+    source="jsonl" seeks into the _fused.jsonl files; "columnar" reads the
+    matching side.jsonl lines and rows of the memory-mapped matrices. Returns a list of segment records.
+    """
+    index = load_index(output_dir, file_ids)
+    mask = pd.Series(True, index=index.index)
+    if speaker is not None:
+        mask &= index["speaker"] == str(speaker)
+    if start is not None:
+        mask &= index["end"] >= start
+    if end is not None:
+        mask &= index["start"] <= end
+    matches = index[mask]
+
+    results = []
+    for file_id, hits in matches.groupby("file_id", sort=False):
+        if source == "columnar":
+            rows = hits["row"].tolist()
+            if min(rows, default=0) < 0:
+                raise ValueError(f"No columnar output indexed for {file_id}")
+            side, features, acoustic = read_columnar_rows(fused_dir(output_dir, file_id), rows)
+            results.extend(fused_to_records(side, features, acoustic))
+        else:
+            if hits["offset"].min() < 0:
+                raise ValueError(f"No JSONL output indexed for {file_id}")
+            with open(os.path.join(output_dir, f"{file_id}_fused.jsonl"), "rb") as f:
+                for offset, length in zip(hits["offset"], hits["length"]):
+                    f.seek(offset)
+                    results.append(json.loads(f.read(length)))
+    return results
@@ -0,0 +1,157 @@
+import os
+import json
+import shutil
+import numpy as np
+import pandas as pd
+
+# ----------------------------------------
+# Columnar format for fused segments
+# ----------------------------------------
+# <file_id>_fused/ holds one call:
+#   schema.json   format version, row count, acoustic feature names (stored once)
+#                 and the names of the side columns
+#   acoustic.npy  float32 (n_segments, n_features) matrix, NaN where a segment
+#                 has no value for a feature
+#   side.jsonl    text and metadata side columns, one JSON object per segment
+#   side_offsets.npy  int64 (n_segments + 1,) byte offsets of the side.jsonl lines
+# Loading memory-maps acoustic.npy and read_columnar_rows() seeks to the side
+# lines it needs, so only the rows that are used are read.
+# Word-level tables (temporal_fusion.py --level token) use the same layout
+# with one row per .nlp token.
+
+FORMAT_VERSION = 1
+SIDE_COLUMNS = ["file_id", "speaker", "start", "end", "text", "sentiment",
+                "sentiment_score", "sentiment_probs", "call_sentiment"]
+
+def fused_dir(output_dir, file_id):
+    return os.path.join(output_dir, f"{file_id}_fused")
+
+def write_fused_columnar(out_dir, records):
+    """
+    Write fused segment records (dicts as produced by temporal_fusion.py)
+    in the columnar format (see write_columnar()).
+    """
+    features = []
+    seen = set()
+    for record in records:
+        for name in record["acoustic"]:
+            if name not in seen:
+                seen.add(name)
+                features.append(name)
+
+    position = {name: i for i, name in enumerate(features)}
+    acoustic = np.full((len(records), len(features)), np.nan, dtype=np.float32)
+    for row, record in enumerate(records):
+        for name, value in record["acoustic"].items():
+            acoustic[row, position[name]] = value
+
+    side_columns = [c for c in SIDE_COLUMNS if any(c in r for r in records)] or SIDE_COLUMNS[:4]
+    side = {c: [record.get(c) for record in records] for c in side_columns}
+    return write_columnar(out_dir, side, features, acoustic)
+
+def write_columnar(out_dir, side, features, acoustic):
+    """
+    Write side columns { column: [value per row] }, the feature names and the
+    (rows, features) matrix. The new directory is built next to out_dir and
+    swapped in by renames; the previous version is kept until the swap is done.
+    """
+    acoustic = np.asarray(acoustic, dtype=np.float32)
+    side_columns = list(side)
+    schema = {"version": FORMAT_VERSION, "rows": len(acoustic), "features": list(features),
+              "side_columns": side_columns}
+
+    tmp_dir = f"{out_dir}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    np.save(os.path.join(tmp_dir, "acoustic.npy"), acoustic)
+    offsets, position = [0], 0
+    with open(os.path.join(tmp_dir, "side.jsonl"), "wb") as f:
+        for row in range(len(acoustic)):
+            line = (json.dumps({c: side[c][row] for c in side_columns}) + "\n").encode("utf-8")
+            f.write(line)
+            position += len(line)
+            offsets.append(position)
+    np.save(os.path.join(tmp_dir, "side_offsets.npy"), np.asarray(offsets, dtype=np.int64))
+    with open(os.path.join(tmp_dir, "schema.json"), "w") as f:
+        json.dump(schema, f)
+
+    # Move the previous version aside before swapping the new one in, so a
+    # complete copy exists at every point; load_fused_columnar() falls back to
+    # the aside copy if a crash happens between the two renames
+    old_dir = f"{out_dir}.old"
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.isdir(out_dir):
+        os.replace(out_dir, old_dir)
+    os.replace(tmp_dir, out_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return out_dir
+
+def _open_columnar(out_dir):
+    """Resolve the directory to read and load its schema."""
+    if not os.path.isdir(out_dir) and os.path.isdir(f"{out_dir}.old"):
+        out_dir = f"{out_dir}.old"  # Interrupted write_columnar(): previous version
+    with open(os.path.join(out_dir, "schema.json"), "r") as f:
+        schema = json.load(f)
+    if schema.get("version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported fused format version {schema.get('version')} in {out_dir}")
+    return out_dir, schema
+
+def _read_side(out_dir, schema, rows=None):
+    """Side columns as a DataFrame, for all rows or only the given row indices (in that order)."""
+    columns = schema["side_columns"]
+    path = os.path.join(out_dir, "side.jsonl")
+    if rows is None:
+        with open(path, "rb") as f:
+            return pd.DataFrame([json.loads(line) for line in f], columns=columns)
+
+    offsets = np.load(os.path.join(out_dir, "side_offsets.npy"), mmap_mode="r")
+    lines = {}
+    with open(path, "rb") as f:
+        for row in sorted(set(rows)):  # Seek forward through the file once
+            f.seek(int(offsets[row]))
+            lines[row] = json.loads(f.read(int(offsets[row + 1] - offsets[row])))
+    return pd.DataFrame([lines[row] for row in rows], columns=columns)
+
+def load_fused_columnar(out_dir, mmap=True):
+    """
+    Load a call written by write_fused_columnar() or write_columnar().
+    Returns (side, features, acoustic): a DataFrame of side columns, the list
+    of acoustic feature names and the (memory-mapped) float32 matrix.
+    """
+    out_dir, schema = _open_columnar(out_dir)
+    side = _read_side(out_dir, schema)
+
+    acoustic_path = os.path.join(out_dir, "acoustic.npy")
+    if mmap and schema["rows"] and schema["features"]:
+        acoustic = np.load(acoustic_path, mmap_mode="r")
+    else:
+        acoustic = np.load(acoustic_path)
+    return side, schema["features"], acoustic
+
+def read_columnar_rows(out_dir, rows):
+    """
+    Read only the given rows of a columnar output: the matching side.jsonl
+    lines and matrix rows. Returns (side, features, acoustic) aligned with rows.
+    """
+    out_dir, schema = _open_columnar(out_dir)
+    rows = [int(row) for row in rows]
+    side = _read_side(out_dir, schema, rows)
+    if schema["rows"] and schema["features"]:
+        acoustic = np.asarray(np.load(os.path.join(out_dir, "acoustic.npy"), mmap_mode="r")[rows])
+    else:
+        acoustic = np.empty((len(rows), len(schema["features"])), dtype=np.float32)
+    return side, schema["features"], acoustic
+
+def fused_to_records(side, features, acoustic, rows=None):
+    """
+    Rebuild JSONL-style records (acoustic as a dict, NaN entries dropped)
+    for the given row indices, e.g. to compare with the _fused.jsonl output.
+    """
+    rows = range(len(side)) if rows is None else rows
+    records = []
+    for row in rows:
+        record = side.iloc[row].to_dict()
+        values = acoustic[row]
+        record["acoustic"] = {name: float(v) for name, v in zip(features, values) if not np.isnan(v)}
+        records.append(record)
+    return records
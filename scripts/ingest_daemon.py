@@ -0,0 +1,278 @@
+import os
+import json
+import time
+import signal
+import argparse
+import subprocess
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+# ----------------------------------------
+# Define directory paths (relative to repo)
+# ----------------------------------------
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+MEDIA_DIR = os.path.join(BASE_DIR, "earnings21", "earnings21", "media")
+WAV_DIR = os.path.join(BASE_DIR, "earnings21", "earnings21", "wav")
+RTTM_DIR = os.path.join(BASE_DIR, "earnings21", "earnings21", "rttms")
+NLP_DIR = os.path.join(BASE_DIR, "earnings21", "earnings21", "transcripts", "nlp_references")
+NORM_DIR = os.path.join(BASE_DIR, "earnings21", "earnings21", "transcripts", "normalizations")
+WER_DIR = os.path.join(BASE_DIR, "earnings21", "earnings21", "transcripts", "wer_tags")
+FUSED_DIR = os.path.join(BASE_DIR, "features", "fused_segments")
+STATE_PATH = os.path.join(BASE_DIR, "features", "ingest_state.json")
+
+# openSMILE LLD extraction, as in extract_llds.sh
+SMILE_BIN = os.path.join(BASE_DIR, "opensmile", "build", "progsrc", "smilextract", "SMILExtract")
+LLD_CONFIG = os.path.join(BASE_DIR, "opensmile", "config", "emobase", "emobase_f0only.conf")
+
+POLL_INTERVAL = 10.0    # Seconds between directory scans
+DEBOUNCE_SECONDS = 30.0  # Inputs must keep the same size/mtime this long before a call is ingested
+MAX_WORKERS = 2          # Calls processed concurrently
+FINBERT_BACKEND = "auto"
+MAX_ATTEMPTS = 3         # Failed calls are retried until this many attempts on the same inputs
+RETRY_BACKOFF = 300.0    # Seconds before the first retry, doubled after every further failure
+
+# Inputs every call needs: (kind, directory, suffix); sentiment reads the
+# normalization and WER tag files next to the .nlp transcript
+INPUTS = [
+    ("mp3", MEDIA_DIR, ".mp3"),
+    ("rttm", RTTM_DIR, ".rttm"),
+    ("nlp", NLP_DIR, ".nlp"),
+    ("norm", NORM_DIR, ".norm.json"),
+    ("wer", WER_DIR, ".wer_tag.json"),
+]
+
+STAGES = ["convert", "segment", "extract", "sentiment", "fusion"]
+
+# ----------------------------------------
+# Watching and debouncing
+# ----------------------------------------
+def scan_inputs():
+    """
+    Return { file_id: { kind: stamp } } for the INPUTS files currently
+    present; a stamp is (size, mtime_ns).
+    """
+    calls = {}
+    for kind, directory, suffix in INPUTS:
+        if not os.path.isdir(directory):
+            continue
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.endswith(suffix):
+                    stat = entry.stat()
+                    file_id = entry.name[:-len(suffix)]
+                    calls.setdefault(file_id, {})[kind] = [stat.st_size, stat.st_mtime_ns]
+    return calls
+
+class Debouncer:
+    """
+    Tracks when each call's input stamps last changed; a call is stable once
+    they have been unchanged for DEBOUNCE_SECONDS (partial writes keep changing them).
+    """
+    def __init__(self, delay=DEBOUNCE_SECONDS):
+        self.delay = delay
+        self.seen = {}  # file_id -> (stamps, first time seen with these stamps)
+
+    def stable(self, calls, now):
+        ready = []
+        for file_id, stamps in calls.items():
+            previous = self.seen.get(file_id)
+            if previous is None or previous[0] != stamps:
+                self.seen[file_id] = (stamps, now)
+            elif now - previous[1] >= self.delay:
+                ready.append(file_id)
+        return ready
+
+def load_state():
+    try:
+        with open(STATE_PATH, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def should_ingest(entry, stamps, now, max_attempts=MAX_ATTEMPTS):
+    """
+    Whether a call with these input stamps needs (another) run: it is new or
+    its inputs changed, or it failed and its retry is due.
+    """
+    if entry is None or entry.get("inputs") != stamps:
+        return True
+    if not entry.get("failed_stage"):
+        return False
+    return entry.get("attempts", 1) < max_attempts and now >= entry.get("retry_after", 0.0)
+
+def has_outputs(file_id):
+    """Whether fusion output of the call exists (JSONL or columnar)."""
+    return (os.path.exists(os.path.join(FUSED_DIR, f"{file_id}_fused.jsonl"))
+            or os.path.isdir(os.path.join(FUSED_DIR, f"{file_id}_fused")))
+
+def save_state(state):
+    os.makedirs(os.path.dirname(STATE_PATH), exist_ok=True)
+    tmp_path = f"{STATE_PATH}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, STATE_PATH)
+
+# ----------------------------------------
+# Per-call pipeline (runs in worker processes)
+# ----------------------------------------
+_finbert = None  # (tokenizer, model, device), loaded once per worker on first use
+
+def get_finbert():
+    global _finbert
+    if _finbert is None:
+        from finbert_backend import load_finbert
+        tokenizer, model, device, _ = load_finbert(FINBERT_BACKEND)
+        _finbert = (tokenizer, model, device)
+    return _finbert
+
+def stage_convert(file_id):
+    from convert_mp3_to_wav import convert_file
+    os.makedirs(WAV_DIR, exist_ok=True)
+    convert_file(os.path.join(MEDIA_DIR, f"{file_id}.mp3"), os.path.join(WAV_DIR, f"{file_id}.wav"))
+
+def stage_segment(file_id):
+    from segment_audio_by_speaker import segment_and_concat
+    segment_and_concat(file_id)
+
+def stage_extract(file_id):
+    """Per-speaker LLD/functional extraction, as extract_llds.sh does for the corpus."""
+    from temporal_fusion import MANIFEST_DIR
+    with open(os.path.join(BASE_DIR, MANIFEST_DIR, file_id, f"{file_id}_manifest.json"), "r") as f:
+        speakers = json.load(f)["speakers"]
+    for entry in speakers.values():
+        lld_path = os.path.join(BASE_DIR, entry["llds"])
+        os.makedirs(os.path.dirname(lld_path), exist_ok=True)
+        cmd = [
+            SMILE_BIN, "-C", LLD_CONFIG,
+            "-I", os.path.join(BASE_DIR, entry["wav"]),
+            "-lldoutput", lld_path,
+            "-funcoutput", os.path.join(BASE_DIR, entry["functionals"]),
+            "-nologfile"
+        ]
+        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+def stage_sentiment(file_id):
+    """Call-level and turn-level FinBERT sentiment for one call."""
+    from pathlib import Path
+    import run_finbert_on_normalized_transcript as call_level
+    import run_finbert_on_segments as turn_level
+
+    tokenizer, model, device = get_finbert()
+    nlp_file = Path(NLP_DIR) / f"{file_id}.nlp"
+    call_level.OUTPUT_PATH.mkdir(parents=True, exist_ok=True)
+    call_level.run_pipeline([nlp_file], tokenizer, model, device)
+
+    segments = turn_level.collect_segments({file_id})
+    if not segments.empty:
+        turn_level.score_segments(segments, tokenizer, model, device)
+
+def stage_fusion(file_id):
+    import temporal_fusion
+    os.makedirs(temporal_fusion.OUTPUT_DIR, exist_ok=True)
+    temporal_fusion.fuse_call(os.path.join(temporal_fusion.RTTM_DIR, f"{file_id}.rttm"))
+
+STAGE_FUNCTIONS = {
+    "convert": stage_convert,
+    "segment": stage_segment,
+    "extract": stage_extract,
+    "sentiment": stage_sentiment,
+    "fusion": stage_fusion,
+}
+
+def init_worker():
+    # Fusion and the sentiment scripts resolve repo-relative paths from the working directory
+    os.chdir(BASE_DIR)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # The main process handles shutdown
+
+def process_call(file_id):
+    """
+    Push one call through every stage. Returns (file_id, failed stage or None, message, seconds).
+    """
+    start = time.time()
+    for stage in STAGES:
+        try:
+            STAGE_FUNCTIONS[stage](file_id)
+        except Exception as e:
+            return file_id, stage, str(e), time.time() - start
+    return file_id, None, "ok", time.time() - start
+
+# ----------------------------------------
+# Main loop
+# ----------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Watch the earnings21 input folders and ingest new calls")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS)
+    parser.add_argument("--poll", type=float, default=POLL_INTERVAL, help="Seconds between scans")
+    parser.add_argument("--debounce", type=float, default=DEBOUNCE_SECONDS)
+    parser.add_argument("--once", action="store_true", help="Ingest what is ready now, then exit")
+    parser.add_argument("--max-attempts", type=int, default=MAX_ATTEMPTS, help="Runs per call before giving up")
+    parser.add_argument("--skip-existing", action="store_true",
+                        help="Record calls not yet in the state file that already have fused output as done, "
+                             "instead of ingesting them again (e.g. on the first start over a processed corpus)")
+    args = parser.parse_args(argv)
+
+    state = load_state()
+    debouncer = Debouncer(0.0 if args.once else args.debounce)
+    in_flight = {}
+    stopping = False
+
+    def request_stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        print("[INFO] Stopping after in-flight calls finish...")
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    print(f"[INFO] Watching {', '.join(directory for _, directory, _ in INPUTS)} with {args.workers} workers")
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker) as pool:
+        while True:
+            if not stopping:
+                calls = scan_inputs()
+                now = time.time()
+                if args.once:
+                    debouncer.stable(calls, now)  # First sighting; zero delay makes the second call return them
+                for file_id in debouncer.stable(calls, now):
+                    stamps = calls[file_id]
+                    if any(kind not in stamps for kind, _, _ in INPUTS):
+                        continue  # Wait until the audio, RTTM and transcript files have all landed
+                    if args.skip_existing and file_id not in state and has_outputs(file_id):
+                        state[file_id] = {"inputs": stamps, "failed_stage": None, "message": "existing outputs",
+                                          "finished": time.strftime("%Y-%m-%d %H:%M:%S")}
+                        save_state(state)
+                        continue
+                    if file_id in in_flight or not should_ingest(state.get(file_id), stamps, now, args.max_attempts):
+                        continue  # Running, processed from these exact inputs, or waiting for a retry
+                    print(f"[INFO] Ingesting {file_id}")
+                    in_flight[file_id] = (pool.submit(process_call, file_id), stamps)
+
+            if in_flight:
+                done, _ = wait([future for future, _ in in_flight.values()], timeout=args.poll,
+                               return_when=FIRST_COMPLETED)
+                for future in done:
+                    file_id, failed_stage, message, seconds = future.result()
+                    _, stamps = in_flight.pop(file_id)
+                    previous = state.get(file_id, {})
+                    attempts = 1
+                    if previous.get("inputs") == stamps and previous.get("failed_stage"):
+                        attempts = previous.get("attempts", 1) + 1
+                    state[file_id] = {"inputs": stamps, "failed_stage": failed_stage, "message": message,
+                                      "seconds": round(seconds, 1), "finished": time.strftime("%Y-%m-%d %H:%M:%S")}
+                    if failed_stage:
+                        delay = RETRY_BACKOFF * 2 ** (attempts - 1)
+                        state[file_id].update(attempts=attempts, retry_after=time.time() + delay)
+                        print(f"[ERROR] {file_id} failed at {failed_stage}: {message}")
+                        if attempts < args.max_attempts:
+                            print(f"[INFO] Retrying {file_id} in {delay:.0f}s (attempt {attempts}/{args.max_attempts})")
+                        else:
+                            print(f"[WARN] Giving up on {file_id} after {attempts} attempts; "
+                                  f"it runs again when its inputs change")
+                    else:
+                        print(f"[DONE] {file_id} ingested in {seconds:.0f}s")
+                    save_state(state)
+            elif stopping or args.once:
+                break
+            else:
+                time.sleep(args.poll)
+
+if __name__ == "__main__":
+    main()
@@ -11,8 +11,11 @@
 # Load necessary modules (adjust based on your environment)
 module load Python/3.9.0 CUDA/12.6
 
+# Repository root (defaults to the directory the job was submitted from)
+REPO_DIR=${REPO_DIR:-$SLURM_SUBMIT_DIR}
+
 # Activate your virtual environment
-source /scratch/s6055702/ser_credit_rating/venv39/bin/activate
+source "$REPO_DIR/venv39/bin/activate"
 
 # Run your Python script
-python /scratch/s6055702/ser_credit_rating/scripts/extract_acoustic_features.py
\ No newline at end of file
+python "$REPO_DIR/scripts/extract_acoustic_features.py"
\ No newline at end of file
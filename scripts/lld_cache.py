@@ -0,0 +1,110 @@
+import os
+import json
+import tempfile
+import numpy as np
+import pandas as pd
+
+# ----------------------------------------
+# Binary LLD cache
+# ----------------------------------------
+# Each semicolon-separated openSMILE LLD CSV is converted once into
+#   <name>.values.npy  float32 (n_frames, n_features) feature matrix
+#   <name>.time.npy    float64 (n_frames,) frame times
+#   <name>.header.json column names plus the size/mtime of the source CSV
+# next to the CSV (or under CACHE_DIR). Later loads memory-map the arrays;
+# the cache is rebuilt whenever the source CSV changes.
+
+CACHE_DIR = None  # None: store cache files next to the source CSV
+CACHE_VERSION = 1
+
+def cache_paths(csv_path, cache_dir=CACHE_DIR):
+    """
+    Return the (values, time, header) cache paths for an LLD CSV.
+    """
+    base = os.path.splitext(csv_path)[0]
+    if cache_dir:
+        base = os.path.join(cache_dir, os.path.basename(base))
+    return f"{base}.values.npy", f"{base}.time.npy", f"{base}.header.json"
+
+def _source_stamp(csv_path):
+    stat = os.stat(csv_path)
+    return {"source_size": stat.st_size, "source_mtime_ns": stat.st_mtime_ns}
+
+def _read_header(header_path):
+    try:
+        with open(header_path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def is_cache_valid(csv_path, cache_dir=CACHE_DIR):
+    """
+    True if the cache exists and was built from the current version of the CSV.
+    """
+    values_path, time_path, header_path = cache_paths(csv_path, cache_dir)
+    header = _read_header(header_path)
+    if not header or header.get("version") != CACHE_VERSION:
+        return False
+    if not os.path.exists(values_path) or not os.path.exists(time_path):
+        return False
+    stamp = _source_stamp(csv_path)
+    return all(header.get(k) == v for k, v in stamp.items())
+
+def _replace_atomic(path, write):
+    """
+    Write through a uniquely named temporary file in the same directory and
+    rename it over path, so workers converting the same CSV at once never
+    share a temporary file.
+    """
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(path) or ".", prefix=os.path.basename(path) + ".",
+                                     suffix=".tmp", delete=False) as f:
+        tmp_path = f.name
+        try:
+            write(f)
+        except BaseException:
+            f.close()
+            os.remove(tmp_path)
+            raise
+    os.replace(tmp_path, path)
+
+def convert_lld_csv(csv_path, cache_dir=CACHE_DIR):
+    """
+    Parse an LLD CSV once and write the binary cache. Non-numeric columns
+    (e.g. openSMILE's 'name') are dropped and rows with a malformed
+    frameTime are skipped.
+    """
+    values_path, time_path, header_path = cache_paths(csv_path, cache_dir)
+    os.makedirs(os.path.dirname(values_path) or ".", exist_ok=True)
+    stamp = _source_stamp(csv_path)
+
+    df = pd.read_csv(csv_path, sep=";")
+    if "frameTime" not in df.columns:
+        raise ValueError(f"'frameTime' not found in {csv_path}")
+
+    df = df.apply(pd.to_numeric, errors="coerce")
+    df = df.dropna(subset=["frameTime"])
+    columns = [c for c in df.columns if c != "frameTime" and not df[c].isna().all()]
+
+    timestamps = df["frameTime"].to_numpy(dtype=np.float64)
+    values = np.ascontiguousarray(df[columns].to_numpy(dtype=np.float32))
+
+    # Write arrays first and the header last, each atomically, so a partial
+    # conversion never looks valid
+    for path, array in ((values_path, values), (time_path, timestamps)):
+        _replace_atomic(path, lambda f: np.save(f, array))
+
+    header = {"version": CACHE_VERSION, "source": os.path.abspath(csv_path), "columns": columns, **stamp}
+    _replace_atomic(header_path, lambda f: f.write(json.dumps(header).encode("utf-8")))
+
+def load_lld_matrix(csv_path, cache_dir=CACHE_DIR):
+    """
+    Load an LLD file as (timestamps, columns, values), converting the CSV on
+    first use. The arrays are read-only memory maps of the cache files.
+    """
+    if not is_cache_valid(csv_path, cache_dir):
+        convert_lld_csv(csv_path, cache_dir)
+    values_path, time_path, header_path = cache_paths(csv_path, cache_dir)
+    header = _read_header(header_path)
+    timestamps = np.load(time_path, mmap_mode="r")
+    values = np.load(values_path, mmap_mode="r")
+    return timestamps, header["columns"], values
@@ -0,0 +1,92 @@
+import os
+import json
+
+# ----------------------------------------
+# Persisted index over .norm.json files
+# ----------------------------------------
+# Reconstruction only needs the best verbalization of the few tokens whose
+# WER tags contain 4/5/6, but a .norm.json stores every candidate of every
+# normalizable token. The index keeps just { token_index: best verbalization },
+# is built once per file and rebuilt when the .norm.json changes.
+
+INDEX_DIR = None  # None: store <file_id>.norm.index.json next to the .norm.json
+INDEX_VERSION = 1
+NORMALIZE_TAGS = ("4", "5", "6")  # WER tags whose tokens are replaced by their verbalization
+
+def index_path(norm_path, index_dir=INDEX_DIR):
+    base = str(norm_path)
+    if base.endswith(".norm.json"):
+        base = base[:-len(".json")]
+    if index_dir:
+        base = os.path.join(index_dir, os.path.basename(base))
+    return f"{base}.index.json"
+
+def _source_stamp(norm_path):
+    stat = os.stat(norm_path)
+    return {"source_size": stat.st_size, "source_mtime_ns": stat.st_mtime_ns}
+
+def build_index(norm_path, index_dir=INDEX_DIR):
+    """
+    Parse a .norm.json once and persist the best verbalization per token.
+    """
+    stamp = _source_stamp(norm_path)
+    with open(norm_path, "r", encoding="utf-8") as f:
+        norm_data = json.load(f)
+
+    best = {}
+    for token_index, entry in norm_data.items():
+        candidates = entry.get("candidates", []) if isinstance(entry, dict) else []
+        if candidates:
+            verbalization = max(candidates, key=lambda x: x["probability"]).get("verbalization", [])
+            if verbalization:
+                best[token_index] = verbalization
+
+    path = index_path(norm_path, index_dir)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": INDEX_VERSION, **stamp, "best": best}, f)
+    os.replace(tmp_path, path)
+    return best
+
+def load_index(norm_path, index_dir=INDEX_DIR):
+    """
+    Return { token_index (int): verbalization tokens } for a .norm.json,
+    building or refreshing the persisted index when needed.
+    """
+    try:
+        with open(index_path(norm_path, index_dir), "r", encoding="utf-8") as f:
+            index = json.load(f)
+        stamp = _source_stamp(norm_path)
+        if index.get("version") == INDEX_VERSION and all(index.get(k) == v for k, v in stamp.items()):
+            best = index["best"]
+        else:
+            best = build_index(norm_path, index_dir)
+    except (OSError, ValueError, KeyError):
+        best = build_index(norm_path, index_dir)
+    return {int(k): v for k, v in best.items()}
+
+def reconstruct_tokens(nlp_lines, wer_data, norm_index):
+    """
+    Rebuild the normalized token sequence of a call: tokens whose WER tags
+    contain 4/5/6 are replaced by their best verbalization when one exists,
+    all others keep the original .nlp token. nlp_lines excludes the header.
+    """
+    replacements = {}
+    for token_index, tags in wer_data.items():
+        if any(tag in tags for tag in NORMALIZE_TAGS):
+            verbalization = norm_index.get(int(token_index))
+            if verbalization:
+                replacements[int(token_index)] = verbalization
+
+    reconstructed = []
+    for idx, line in enumerate(nlp_lines):
+        line = line.strip()
+        if not line:
+            continue
+        verbalization = replacements.get(idx)
+        if verbalization:
+            reconstructed.extend(verbalization)
+        else:
+            reconstructed.append(line.split("|")[0])
+    return reconstructed
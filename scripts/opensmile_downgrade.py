@@ -1,16 +1,25 @@
 import os
+import argparse
 import subprocess
-import pandas as pd
-from multiprocessing import Pool
-from tqdm import tqdm
-
-# Configuration
-AUDIO_DIR = "/scratch/s6055702/ser_credit_rating/earnings21/downgraded_audio"
-OUTPUT_DIR = "/scratch/s6055702/ser_credit_rating/earnings21/downgraded_audio"
-OPENSMILE_BIN = "/scratch/s6055702/ser_credit_rating/opensmile/build/progsrc/smilextract/SMILExtract"
-OPENSMILE_CONFIG = "/scratch/s6055702/ser_credit_rating/opensmile/config/compare16/ComParE_2016.conf"
-NUM_PROCESSES = 8
-os.makedirs(OUTPUT_DIR, exist_ok=True)
+from functools import partial
+from targeted_features import extract_targeted_file
+from worker_pool import imap_adaptive
+from call_durations import file_costs
+
+# Configuration (paths relative to the repository)
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+AUDIO_DIR = os.path.join(BASE_DIR, "earnings21", "downgraded_audio")
+OUTPUT_DIR = os.path.join(BASE_DIR, "earnings21", "downgraded_audio")
+OPENSMILE_BIN = os.path.join(BASE_DIR, "opensmile", "build", "progsrc", "smilextract", "SMILExtract")
+OPENSMILE_CONFIG = os.path.join(BASE_DIR, "opensmile", "config", "compare16", "ComParE_2016.conf")
+NUM_PROCESSES = None  # Upper bound on workers; None sizes the pool from CPUs and memory (worker_pool.py)
+SMILE_TASK_MEMORY_MB = 512      # Peak RSS of one SMILExtract run with ComParE_2016
+TARGETED_TASK_MEMORY_MB = 1024  # Whole call as float32 plus frame blocks in targeted mode
+# "full" runs SMILExtract with the complete ComParE_2016 config and keeps TARGET_FEATURES;
+# "targeted" computes only the LLDs/functionals behind TARGET_FEATURES in NumPy (no ARFF files).
+# The targeted values are approximations, so each mode writes its own table.
+EXTRACTION_MODE = "full"  # Default of --mode
+OUTPUT_NAMES = {"full": "all_features_combined.csv", "targeted": "all_features_targeted.csv"}
 
 # Features we want to extract (from the attribute list)
 TARGET_FEATURES = [
@@ -22,10 +31,10 @@ TARGET_FEATURES = [
     'speechFramesVoiced'               # Speech rate related
 ]
 
-def extract_features(audio_path):
+def extract_features(audio_path, output_dir=OUTPUT_DIR):
     """Run openSMILE to extract features."""
     base_name = os.path.basename(audio_path).replace(".wav", "")
-    output_csv = os.path.join(OUTPUT_DIR, f"{base_name}_features.arff")
+    output_csv = os.path.join(output_dir, f"{base_name}_features.arff")
     
     cmd = [
         OPENSMILE_BIN,
@@ -53,8 +62,18 @@ def extract_features(audio_path):
     except Exception as e:
         return (audio_path, None, f"Unexpected error: {str(e)}")
 
+def extract_targeted_features(audio_path):
+    """Compute only TARGET_FEATURES directly from the waveform."""
+    try:
+        features = extract_targeted_file(audio_path, TARGET_FEATURES)
+        return (audio_path, features, True)
+    except Exception as e:
+        return (audio_path, None, f"Unexpected error: {str(e)}")
+
 def parse_arff_file(arff_path):
     """Parse ARFF format files generated by OpenSMILE."""
+    import pandas as pd
+
     try:
         with open(arff_path, 'r') as f:
             content = f.readlines()
@@ -103,7 +122,42 @@ def parse_arff_file(arff_path):
         print(f"Error parsing {arff_path}: {str(e)}")
         return None
 
-def main():
+def run_targeted(audio_files, output_dir=OUTPUT_DIR, max_workers=NUM_PROCESSES):
+    """Targeted mode: extract TARGET_FEATURES in parallel and write the combined table."""
+    import pandas as pd
+    from tqdm import tqdm
+
+    tasks = imap_adaptive(extract_targeted_features, audio_files, max_workers=max_workers,
+                          memory_per_task_mb=TARGETED_TASK_MEMORY_MB, costs=file_costs(audio_files))
+    results = sorted(tqdm(tasks, total=len(audio_files)), key=lambda r: r[0])
+
+    successful = [r for r in results if r[2] is True]
+    failed = [(r[0], r[2]) for r in results if r[2] is not True]
+
+    print(f"\nSuccess: {len(successful)} | Failed: {len(failed)}")
+    if failed:
+        print("\nFailure details:")
+        for f in failed[:5]:
+            print(f"{os.path.basename(f[0])}: {f[1]}")
+
+    if not successful:
+        print("No valid data was extracted from any files.")
+        return
+
+    combined_df = pd.DataFrame(
+        [{"audio_file": os.path.basename(path), **features} for path, features, _ in successful],
+        columns=["audio_file"] + TARGET_FEATURES
+    )
+    output_path = os.path.join(output_dir, OUTPUT_NAMES["targeted"])
+    combined_df.to_csv(output_path, index=False)
+    print(f"\nCombined features saved to: {output_path}")
+    print(f"Extracted features: {', '.join(TARGET_FEATURES)}")
+
+def run_full(audio_files, output_dir=OUTPUT_DIR, max_workers=NUM_PROCESSES):
+    """Full mode: SMILExtract with ComParE_2016 per file, then keep TARGET_FEATURES from the ARFF files."""
+    import pandas as pd
+    from tqdm import tqdm
+
     # Verify OpenSMILE binary exists
     if not os.path.exists(OPENSMILE_BIN):
         print(f"Error: OpenSMILE binary not found at {OPENSMILE_BIN}")
@@ -114,15 +168,10 @@ def main():
         print(f"Error: Config file not found at {OPENSMILE_CONFIG}")
         return
     
-    # Get audio files
-    audio_files = sorted([os.path.join(AUDIO_DIR, f) for f in os.listdir(AUDIO_DIR) if f.endswith(".wav")])
-    print(f"Found {len(audio_files)} audio files.")
-    
-    # Process files in parallel
-    with Pool(processes=NUM_PROCESSES) as pool:
-        results = []
-        for result in tqdm(pool.imap(extract_features, audio_files), total=len(audio_files)):
-            results.append(result)
+    # Process files in parallel (SMILExtract is single-threaded: one thread per task)
+    tasks = imap_adaptive(partial(extract_features, output_dir=output_dir), audio_files, max_workers=max_workers,
+                          memory_per_task_mb=SMILE_TASK_MEMORY_MB, costs=file_costs(audio_files))
+    results = sorted(tqdm(tasks, total=len(audio_files)), key=lambda r: r[0])
     
     # Process results
     successful = [r[1] for r in results if r[2] is True]
@@ -155,7 +204,7 @@ def main():
             combined_df = combined_df[['audio_file'] + available_features]
             
             # Save final output
-            output_path = os.path.join(OUTPUT_DIR, "all_features_combined.csv")
+            output_path = os.path.join(output_dir, OUTPUT_NAMES["full"])
             combined_df.to_csv(output_path, index=False)
             print(f"\nCombined features saved to: {output_path}")
             print(f"Extracted features: {', '.join(available_features)}")
@@ -167,5 +216,24 @@ def main():
         else:
             print("No valid data was extracted from any files.")
 
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="TARGET_FEATURES for every WAV in the downgraded audio folder")
+    parser.add_argument("--mode", choices=sorted(OUTPUT_NAMES), default=EXTRACTION_MODE,
+                        help="full: SMILExtract with ComParE_2016; targeted: NumPy approximations of TARGET_FEATURES "
+                             f"(written to {OUTPUT_NAMES['targeted']})")
+    parser.add_argument("--audio-dir", default=AUDIO_DIR)
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--workers", type=int, default=NUM_PROCESSES, help="Upper bound on worker processes")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    audio_files = sorted(os.path.join(args.audio_dir, f) for f in os.listdir(args.audio_dir) if f.endswith(".wav"))
+    print(f"Found {len(audio_files)} audio files.")
+
+    if args.mode == "targeted":
+        run_targeted(audio_files, args.output_dir, args.workers)
+    else:
+        run_full(audio_files, args.output_dir, args.workers)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
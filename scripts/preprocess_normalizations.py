@@ -1,33 +1,28 @@
 import os
 import json
-
-# Get the directory of the current script
-script_dir = os.path.dirname(os.path.abspath(__file__))
-
-# Define relative paths
-norm_dir = os.path.join(script_dir, "../../earnings21/earnings21/transcripts/normalizations")
-nlp_dir = os.path.join(script_dir, "../../earnings21/earnings21/transcripts/nlp_references")
-wer_dir = os.path.join(script_dir, "../../earnings21/earnings21/transcripts/wer_tags")
-output_dir = os.path.join(script_dir, "processed_transcripts")
-
-os.makedirs(output_dir, exist_ok=True)
-
-for file in os.listdir(norm_dir):
-    if not file.endswith(".norm.json"):
-        continue
-
-    file_id = file.replace(".norm.json", "")
-    norm_path = os.path.join(norm_dir, file)
+import argparse
+from normalization_index import load_index, reconstruct_tokens
+
+# Define paths relative to the repository
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+NORM_DIR = os.path.join(BASE_DIR, "earnings21", "earnings21", "transcripts", "normalizations")
+NLP_DIR = os.path.join(BASE_DIR, "earnings21", "earnings21", "transcripts", "nlp_references")
+WER_DIR = os.path.join(BASE_DIR, "earnings21", "earnings21", "transcripts", "wer_tags")
+OUTPUT_DIR = os.path.join(BASE_DIR, "features", "semantic", "processed_transcripts")  # TRANSCRIPT_DIR in temporal_fusion.py
+
+def process_call(file_id, norm_dir=NORM_DIR, nlp_dir=NLP_DIR, wer_dir=WER_DIR, output_dir=OUTPUT_DIR):
+    """
+    Reconstruct the normalized transcript of one call and save it as <file_id>.txt.
+    Returns False if the NLP or WER file is missing.
+    """
+    norm_path = os.path.join(norm_dir, f"{file_id}.norm.json")
     nlp_path = os.path.join(nlp_dir, f"{file_id}.nlp")
     wer_path = os.path.join(wer_dir, f"{file_id}.wer_tag.json")
     output_path = os.path.join(output_dir, f"{file_id}.txt")
 
     if not os.path.exists(nlp_path) or not os.path.exists(wer_path):
         print(f"[WARNING] Missing NLP or WER file for {file_id}")
-        continue
-
-    with open(norm_path, "r", encoding="utf-8") as f:
-        norm_data = json.load(f)
+        return False
 
     with open(nlp_path, "r", encoding="utf-8") as f:
         nlp_lines = f.readlines()[1:]  # Skip header
@@ -35,33 +30,30 @@ for file in os.listdir(norm_dir):
     with open(wer_path, "r", encoding="utf-8") as f:
         wer_data = json.load(f)
 
-    reconstructed = []
-    for idx, line in enumerate(nlp_lines):
-        line = line.strip()
-        if not line:
-            continue
-
-        token_index = str(idx)
-        parts = line.split("|")
-        original_token = parts[0] if parts else ""
-
-        # Use normalized token only if WER tag doesn't indicate deletion and it's available
-        wer_tags = wer_data.get(token_index, [])
-        if "4" in wer_tags or "5" in wer_tags or "6" in wer_tags:
-            # Use normalization if available
-            candidates = norm_data.get(token_index, {}).get("candidates", [])
-            if candidates:
-                best = max(candidates, key=lambda x: x["probability"])
-                verbalization = best.get("verbalization", [])
-                if verbalization:
-                    reconstructed.extend(verbalization)
-                    continue  # Skip to next token
-
-        # Else use original token
-        reconstructed.append(original_token)
+    # Best verbalizations come from the persisted index, not the full .norm.json
+    norm_index = load_index(norm_path)
+    reconstructed = reconstruct_tokens(nlp_lines, wer_data, norm_index)
 
     # Save result
     with open(output_path, "w", encoding="utf-8") as out_f:
         out_f.write(" ".join(reconstructed))
-
-    print(f"[INFO] Processed {file_id} ✓")
+    return True
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reconstruct normalized transcripts from the .norm.json files")
+    parser.add_argument("file_ids", nargs="*", help="Calls to process (default: every .norm.json)")
+    parser.add_argument("--norm-dir", default=NORM_DIR)
+    parser.add_argument("--nlp-dir", default=NLP_DIR)
+    parser.add_argument("--wer-dir", default=WER_DIR)
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    args = parser.parse_args(argv)
+
+    file_ids = args.file_ids or sorted(f[:-len(".norm.json")] for f in os.listdir(args.norm_dir)
+                                       if f.endswith(".norm.json"))
+    os.makedirs(args.output_dir, exist_ok=True)
+    for file_id in file_ids:
+        if process_call(file_id, args.norm_dir, args.nlp_dir, args.wer_dir, args.output_dir):
+            print(f"[INFO] Processed {file_id} ✓")
+
+if __name__ == "__main__":
+    main()
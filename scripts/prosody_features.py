@@ -0,0 +1,292 @@
+import os
+import argparse
+import numpy as np
+from worker_pool import imap_adaptive
+from call_durations import file_costs
+
+# ----------------------------------------
+# Pause / speech-rate features straight from PCM
+# ----------------------------------------
+# Frame-energy voice activity detection, pause statistics and speaking rate per
+# RTTM segment and per speaker, without SMILExtract (prosodyShs.conf) or the
+# full ComParE run behind speechFrames/speechFramesVoiced. The call audio is
+# memory-mapped and reduced to one energy value per 10 ms hop in bounded chunks.
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+WAV_DIR = os.path.join(BASE_DIR, "earnings21", "earnings21", "wav")
+RTTM_DIR = os.path.join(BASE_DIR, "earnings21", "earnings21", "rttms")
+NLP_DIR = os.path.join(BASE_DIR, "earnings21", "earnings21", "transcripts", "nlp_references")
+OUTPUT_DIR = os.path.join(BASE_DIR, "features", "prosody")
+
+HOP = 0.010               # Seconds per VAD frame hop
+FRAME_HOPS = 2            # Frame length in hops (20 ms frames, as the energy LLDs in targeted_features.py)
+CHUNK_SECONDS = 60.0      # Audio converted to float per chunk
+NOISE_PERCENTILE = 10     # Frame-energy percentile taken as the call's noise floor
+VAD_MARGIN_DB = 10.0      # Speech: frame energy this far above the noise floor ...
+SPEECH_RMS_FLOOR_DB = -40.0  # ... and within 40 dB of the loudest frame
+MIN_PAUSE = 0.20          # Silences shorter than this are bridged (stop closures, not pauses)
+MIN_SPEECH = 0.05         # Speech bursts shorter than this are dropped (clicks)
+
+SEGMENT_COLUMNS = [
+    "duration", "speech_seconds", "speech_ratio", "speech_frames",
+    "pause_count", "pause_seconds", "pause_mean", "pause_max", "pauses_per_minute",
+    "words", "speech_rate_wpm", "articulation_rate_wpm",
+]
+
+# ----------------------------------------
+# Memory-mapped PCM
+# ----------------------------------------
+def read_pcm_memmap(path):
+    """
+    Memory-map the sample data of a PCM WAV file without reading it.
+    Returns (samples, sample_rate) with samples shaped (n_frames, channels).
+    """
+    with open(path, "rb") as f:
+        header = f.read(12)
+        if header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+            raise ValueError(f"{path} is not a RIFF/WAVE file")
+        fmt = None
+        while True:
+            chunk = f.read(8)
+            if len(chunk) < 8:
+                raise ValueError(f"No data chunk in {path}")
+            chunk_id, size = chunk[:4], int.from_bytes(chunk[4:], "little")
+            if chunk_id == b"fmt ":
+                body = f.read(size)
+                fmt = {
+                    "format": int.from_bytes(body[0:2], "little"),
+                    "channels": int.from_bytes(body[2:4], "little"),
+                    "sample_rate": int.from_bytes(body[4:8], "little"),
+                    "bits": int.from_bytes(body[14:16], "little"),
+                }
+            elif chunk_id == b"data":
+                offset = f.tell()
+                break
+            else:
+                f.seek(size + (size & 1), os.SEEK_CUR)  # Chunks are word-aligned
+
+    if fmt is None or fmt["format"] not in (1, 0xFFFE) or fmt["bits"] not in (16, 32):
+        raise ValueError(f"Unsupported WAV format in {path}: {fmt}")
+    dtype = "<i2" if fmt["bits"] == 16 else "<i4"
+    n_frames = size // (fmt["channels"] * fmt["bits"] // 8)
+    samples = np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=(n_frames, fmt["channels"]))
+    return samples, fmt["sample_rate"]
+
+def hop_energy(samples, sample_rate):
+    """
+    Mean square of each HOP-long block of the (mono-mixed) signal, scaled to [-1, 1] full scale.
+    """
+    hop = int(round(HOP * sample_rate))
+    scale = float(np.iinfo(samples.dtype).max + 1)
+    chunk = max(hop, int(CHUNK_SECONDS * sample_rate) // hop * hop)
+    n_hops = len(samples) // hop
+
+    energy = np.empty(n_hops, dtype=np.float64)
+    for start in range(0, n_hops * hop, chunk):
+        block = np.asarray(samples[start:min(start + chunk, n_hops * hop)], dtype=np.float32) / scale
+        block = block.mean(axis=1)
+        energy[start // hop:start // hop + len(block) // hop] = (block.reshape(-1, hop) ** 2).mean(axis=1)
+    return energy
+
+def frame_energy_db(samples, sample_rate):
+    """
+    RMS energy in dB of FRAME_HOPS-long frames, one per hop (frame i starts at i * HOP).
+    """
+    energy = hop_energy(samples, sample_rate)
+    if len(energy) >= FRAME_HOPS:
+        window = np.lib.stride_tricks.sliding_window_view(energy, FRAME_HOPS).mean(axis=1)
+        energy = np.concatenate([window, energy[len(window):]])  # Last frames run past the end
+    return 10.0 * np.log10(energy + 1e-12)
+
+# ----------------------------------------
+# Voice activity
+# ----------------------------------------
+def runs(mask):
+    """
+    Start and end (exclusive) indices of the runs of True in a boolean array.
+    """
+    edges = np.diff(np.concatenate([[False], mask, [False]]).astype(np.int8))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+def fill_short_runs(mask, value, min_frames):
+    """
+    Flip runs equal to value that are shorter than min_frames (interior runs only).
+    """
+    starts, ends = runs(mask == value)
+    short = (ends - starts < min_frames) & (starts > 0) & (ends < len(mask))
+    if not short.any():
+        return mask
+    # Mark flipped ranges with +1/-1 at their edges and integrate
+    delta = np.zeros(len(mask) + 1, dtype=np.int32)
+    np.add.at(delta, starts[short], 1)
+    np.add.at(delta, ends[short], -1)
+    flip = np.cumsum(delta[:-1]) > 0
+    return np.where(flip, not value, mask)
+
+def voice_activity(energy_db):
+    """
+    Boolean speech mask per frame: above the noise floor by VAD_MARGIN_DB and
+    within SPEECH_RMS_FLOOR_DB of the peak, with short pauses bridged and
+    short bursts removed.
+    """
+    if len(energy_db) == 0:
+        return np.zeros(0, dtype=bool)
+    threshold = max(np.percentile(energy_db, NOISE_PERCENTILE) + VAD_MARGIN_DB,
+                    energy_db.max() + SPEECH_RMS_FLOOR_DB)
+    speech = energy_db > threshold
+    speech = fill_short_runs(speech, False, int(round(MIN_PAUSE / HOP)))
+    speech = fill_short_runs(speech, True, int(round(MIN_SPEECH / HOP)))
+    return speech
+
+# ----------------------------------------
+# Per-segment statistics
+# ----------------------------------------
+def segment_prosody(speech, starts, ends, token_times=None):
+    """
+    Pause and rate statistics for many (start, end) windows in seconds, using
+    prefix sums over the speech mask and sorted searches over the pause list.
+    token_times (sorted token midpoints in seconds) enables the word-based rates.
+    Returns { column: array over windows }.
+    """
+    starts = np.asarray(starts, dtype=np.float64)
+    ends = np.asarray(ends, dtype=np.float64)
+    n = len(speech)
+    first = np.clip(np.round(starts / HOP).astype(np.int64), 0, n)
+    last = np.clip(np.round(ends / HOP).astype(np.int64), 0, n)
+    last = np.maximum(last, first)
+
+    prefix = np.concatenate([[0], np.cumsum(speech, dtype=np.int64)])
+    speech_frames = prefix[last] - prefix[first]
+    duration = ends - starts
+    speech_seconds = speech_frames * HOP
+
+    # Pauses: silent runs lying strictly inside a window (leading/trailing silence is not a pause)
+    pause_starts, pause_ends = runs(~speech)
+    lo = np.searchsorted(pause_starts, first, side="right")  # Starts after the window's first frame
+    hi = np.searchsorted(pause_ends, last, side="left")      # Ends before the window's last frame
+    hi = np.maximum(hi, lo)
+    lengths = (pause_ends - pause_starts) * HOP
+    pause_prefix = np.concatenate([[0.0], np.cumsum(lengths)])
+    pause_count = hi - lo
+    pause_seconds = pause_prefix[hi] - pause_prefix[lo]
+    pause_max = np.zeros(len(starts))
+    has_pause = pause_count > 0
+    if has_pause.any():
+        # Interleaved (lo, hi) bounds: every even reduceat slot is the max over lengths[lo:hi]
+        bounds = np.column_stack([lo, hi])[has_pause].ravel()
+        pause_max[has_pause] = np.maximum.reduceat(np.append(lengths, 0.0), bounds)[::2]
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        features = {
+            "duration": duration,
+            "speech_seconds": speech_seconds,
+            "speech_ratio": np.where(duration > 0, speech_seconds / duration, np.nan),
+            "speech_frames": speech_frames,
+            "pause_count": pause_count,
+            "pause_seconds": pause_seconds,
+            "pause_mean": np.where(has_pause, pause_seconds / np.maximum(pause_count, 1), 0.0),
+            "pause_max": pause_max,
+            "pauses_per_minute": np.where(duration > 0, pause_count / duration * 60.0, np.nan),
+        }
+        if token_times is not None:
+            words = (np.searchsorted(token_times, ends, side="left")
+                     - np.searchsorted(token_times, starts, side="left"))
+            features["words"] = words
+            features["speech_rate_wpm"] = np.where(duration > 0, words / duration * 60.0, np.nan)
+            features["articulation_rate_wpm"] = np.where(speech_seconds > 0, words / speech_seconds * 60.0, np.nan)
+        else:
+            features["words"] = np.full(len(starts), np.nan)
+            features["speech_rate_wpm"] = np.full(len(starts), np.nan)
+            features["articulation_rate_wpm"] = np.full(len(starts), np.nan)
+    return features
+
+# ----------------------------------------
+# Per call: segments and speakers
+# ----------------------------------------
+def call_prosody(wav_path, segments, tokens=None, audio=None):
+    """
+    Segment-level prosody for one call. segments are RTTM dicts (start, end,
+    speaker); tokens are .nlp dicts with start/end (optional). audio is an
+    already loaded (samples, sample_rate) pair, e.g. a shared-memory view
+    (shared_audio.py); otherwise wav_path is memory-mapped.
+    Returns a DataFrame with one row per segment.
+    """
+    import pandas as pd
+
+    samples, sample_rate = audio if audio is not None else read_pcm_memmap(wav_path)
+    speech = voice_activity(frame_energy_db(samples, sample_rate))
+
+    token_times = None
+    if tokens:
+        token_times = np.sort([(t["start"] + t["end"]) / 2.0 for t in tokens])
+
+    table = pd.DataFrame(segments, columns=["file_id", "speaker", "start", "end"])
+    features = segment_prosody(speech, table["start"], table["end"], token_times)
+    for column in SEGMENT_COLUMNS:
+        table[column] = features[column]
+    return table
+
+def speaker_prosody(segment_table):
+    """
+    Aggregate segment rows per speaker; rates are recomputed from the summed
+    durations and counts rather than averaged.
+    """
+    grouped = segment_table.groupby("speaker", sort=True)
+    table = grouped[["duration", "speech_seconds", "speech_frames", "pause_count", "pause_seconds"]].sum()
+    table["segments"] = grouped.size()
+    table["words"] = grouped["words"].sum(min_count=1)
+    table["pause_max"] = grouped["pause_max"].max()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        table["speech_ratio"] = table["speech_seconds"] / table["duration"]
+        table["pause_mean"] = np.where(table["pause_count"] > 0, table["pause_seconds"] / table["pause_count"], 0.0)
+        table["pauses_per_minute"] = table["pause_count"] / table["duration"] * 60.0
+        table["speech_rate_wpm"] = table["words"] / table["duration"] * 60.0
+        table["articulation_rate_wpm"] = table["words"] / table["speech_seconds"] * 60.0
+    table = table.reset_index()
+    table.insert(0, "file_id", segment_table["file_id"].iloc[0] if len(segment_table) else None)
+    return table
+
+# ----------------------------------------
+# Main
+# ----------------------------------------
+def process_call(task):
+    """Worker entry point: write the segment and speaker tables of one call."""
+    from temporal_fusion import load_turns, load_nlp_tokens
+
+    file_id, wav_path, rttm_path, output_dir = task
+    tokens = load_nlp_tokens(os.path.join(NLP_DIR, f"{file_id}.nlp"))
+    if not tokens:
+        print(f"[WARN] No .nlp token timings for {file_id}; word rates left empty")
+
+    segments = call_prosody(wav_path, load_turns(rttm_path), tokens)
+    speakers = speaker_prosody(segments)
+    segments.to_csv(os.path.join(output_dir, f"{file_id}_prosody_segments.csv"), index=False)
+    speakers.to_csv(os.path.join(output_dir, f"{file_id}_prosody_speakers.csv"), index=False)
+    print(f"[DONE] {file_id}: {len(segments)} segments, {len(speakers)} speakers")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="VAD, pause and speech-rate features per RTTM segment and speaker")
+    parser.add_argument("file_ids", nargs="*", help="Calls to process (default: every RTTM with a wav)")
+    parser.add_argument("--wav-dir", default=WAV_DIR)
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--workers", type=int, default=None, help="Upper bound on calls processed in parallel")
+    args = parser.parse_args(argv)
+
+    file_ids = args.file_ids or sorted(os.path.splitext(f)[0] for f in os.listdir(RTTM_DIR) if f.endswith(".rttm"))
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    tasks = []
+    for file_id in file_ids:
+        wav_path = os.path.join(args.wav_dir, f"{file_id}.wav")
+        rttm_path = os.path.join(RTTM_DIR, f"{file_id}.rttm")
+        if not os.path.exists(wav_path) or not os.path.exists(rttm_path):
+            print(f"[WARN] Missing wav or RTTM for {file_id}, skipping")
+            continue
+        tasks.append((file_id, wav_path, rttm_path, args.output_dir))
+
+    # Calls are independent; the longest are dispatched first
+    for _ in imap_adaptive(process_call, tasks, max_workers=args.workers,
+                           costs=file_costs([wav_path for _, wav_path, _, _ in tasks])):
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+from bisect import bisect_right
+from collections import defaultdict
+
+# ----------------------------------------
+# RTTM turn preprocessing
+# ----------------------------------------
+# Diarization output contains back-to-back turns of the same speaker and
+# sub-second fragments; each one otherwise becomes its own ffmpeg job, speaker
+# WAV piece and fused segment. Turns are cleaned per speaker:
+#   1. turns separated by less than MERGE_GAP seconds, or overlapping, are merged
+#   2. turns still shorter than MIN_TURN_DURATION are absorbed into the closest
+#      turn of the same speaker within ABSORB_GAP ("absorb") or dropped ("drop")
+# A gap is only bridged when no other speaker has a turn inside it, otherwise
+# that speaker's audio would end up in this speaker's WAV and segments.
+# With MERGE_GAP and MIN_TURN_DURATION at 0 (the defaults) every turn is kept
+# as-is; e.g. --merge-gap 0.5 --min-turn 1.0 cut the number of turns
+# considerably. Segment keys only join across stages when segmentation,
+# segment sentiment and fusion all run with the same values.
+MERGE_GAP = 0.0
+MIN_TURN_DURATION = 0.0
+ABSORB_GAP = 2.0
+SHORT_TURNS = "absorb"  # "absorb" or "drop"
+
+def _union(spans):
+    """Sorted, non-overlapping [start, end] intervals covering spans."""
+    union = []
+    for start, end in sorted(spans):
+        if union and start <= union[-1][1]:
+            union[-1][1] = max(union[-1][1], end)
+        else:
+            union.append([start, end])
+    return union
+
+def _overlap_seconds(start, end, union):
+    """Seconds of (start, end) covered by a _union() list."""
+    index = bisect_right([u[1] for u in union], start)
+    total = 0.0
+    for u_start, u_end in union[index:]:
+        if u_start >= end:
+            break
+        total += min(end, u_end) - max(start, u_start)
+    return total
+
+def coalesce_spans(spans, merge_gap=MERGE_GAP, min_duration=MIN_TURN_DURATION,
+                   short_turns=SHORT_TURNS, absorb_gap=ABSORB_GAP, others=()):
+    """
+    Clean one speaker's [(start, end), ...] turns. others are the turns of
+    the other speakers in the call; gaps they speak in are never bridged.
+    Returns (spans sorted by start, stats dict).
+    """
+    spans = sorted(spans)
+    others = _union(others)
+    stats = {"turns_in": len(spans), "merged": 0, "absorbed": 0, "dropped": 0, "blocked": 0,
+             "dropped_seconds": 0.0, "bridged_seconds": 0.0}
+
+    def can_bridge(gap_start, gap_end):
+        return gap_end <= gap_start or _overlap_seconds(gap_start, gap_end, others) == 0.0
+
+    # 1. Merge turns whose gap is below merge_gap (with a positive merge_gap,
+    #    overlapping turns always merge)
+    merged = []
+    for start, end in spans:
+        if merged and merge_gap > 0 and start - merged[-1][1] < merge_gap:
+            if can_bridge(merged[-1][1], start):
+                stats["merged"] += 1
+                stats["bridged_seconds"] += max(0.0, start - merged[-1][1])
+                merged[-1][1] = max(merged[-1][1], end)
+                continue
+            stats["blocked"] += 1
+        merged.append([start, end])
+
+    # 2. Absorb or drop turns that are still too short
+    kept = [turn for turn in merged if turn[1] - turn[0] >= min_duration]
+    for start, end in (turn for turn in merged if turn[1] - turn[0] < min_duration):
+        target = None
+        if short_turns == "absorb" and kept:
+            # Closest kept turn by gap (0 if they touch) that no other speaker talks in
+            candidates = []
+            for k in kept:
+                gap = max(0.0, start - k[1], k[0] - end)
+                if gap <= absorb_gap:
+                    if can_bridge(min(end, k[1]), max(start, k[0])):
+                        candidates.append((gap, k))
+                    else:
+                        stats["blocked"] += 1
+            if candidates:
+                target = min(candidates, key=lambda c: c[0])[1]
+        if target is None:
+            stats["dropped"] += 1
+            stats["dropped_seconds"] += end - start
+            continue
+        stats["absorbed"] += 1
+        stats["bridged_seconds"] += max(0.0, start - target[1], target[0] - end)
+        target[0], target[1] = min(target[0], start), max(target[1], end)
+
+    # Absorbing can bring kept turns within merge_gap of each other
+    result = []
+    for start, end in sorted(kept):
+        if result and merge_gap > 0 and start - result[-1][1] < merge_gap and can_bridge(result[-1][1], start):
+            stats["merged"] += 1
+            stats["bridged_seconds"] += max(0.0, start - result[-1][1])
+            result[-1] = (result[-1][0], max(result[-1][1], end))
+        else:
+            result.append((start, end))
+    stats["turns_out"] = len(result)
+
+    # Other speakers' speech that now falls inside this speaker's turns but
+    # was not inside them before (0 unless others is incomplete)
+    moved, before = 0.0, _union(spans)
+    for start, end in result:
+        moved += _overlap_seconds(start, end, others)
+        for b_start, b_end in before:
+            if b_start < end and b_end > start:
+                moved -= _overlap_seconds(max(start, b_start), min(end, b_end), others)
+    stats["moved_seconds"] = max(0.0, moved)
+    return result, stats
+
+def add_turn_arguments(parser):
+    """Coalescing options shared by the stages that read RTTM turns."""
+    group = parser.add_argument_group("RTTM turn coalescing",
+                                      "Use the same values for segment, segment-sentiment and fuse")
+    group.add_argument("--merge-gap", type=float, default=MERGE_GAP,
+                       help="Merge same-speaker turns closer than this many seconds (0 keeps them)")
+    group.add_argument("--min-turn", type=float, default=MIN_TURN_DURATION,
+                       help="Absorb or drop turns shorter than this many seconds (0 keeps them)")
+    group.add_argument("--short-turns", choices=["absorb", "drop"], default=SHORT_TURNS,
+                       help="What happens to turns shorter than --min-turn")
+
+def turn_options(args):
+    """coalesce_spans() keyword arguments from add_turn_arguments() options."""
+    return {"merge_gap": args.merge_gap, "min_duration": args.min_turn, "short_turns": args.short_turns}
+
+def resolved_turn_options(options=None):
+    """options with the defaults filled in, so recorded settings compare equal."""
+    return {"merge_gap": MERGE_GAP, "min_duration": MIN_TURN_DURATION, "short_turns": SHORT_TURNS,
+            "absorb_gap": ABSORB_GAP, **(options or {})}
+
+def merge_stats(parts):
+    total = {}
+    for stats in parts:
+        for key, value in stats.items():
+            total[key] = total.get(key, 0) + value
+    return total
+
+def coalesce_speaker_spans(speaker_spans, **kwargs):
+    """
+    Apply coalesce_spans to { speaker: [(start, end), ...] } (parse_rttm()
+    in segment_audio_by_speaker.py), checking each speaker's gaps against
+    the turns of all other speakers. Speakers left without turns are removed.
+    Returns (cleaned dict, combined stats).
+    """
+    cleaned, parts = {}, []
+    for speaker, spans in speaker_spans.items():
+        others = [span for other, other_spans in speaker_spans.items() if other != speaker for span in other_spans]
+        result, stats = coalesce_spans(spans, others=others, **kwargs)
+        parts.append(stats)
+        if result:
+            cleaned[speaker] = result
+    return cleaned, merge_stats(parts)
+
+def coalesce_turns(segments, **kwargs):
+    """
+    Apply coalesce_spans to a list of RTTM segment dicts (load_rttm() in
+    temporal_fusion.py). Returns (segments sorted by start, combined stats).
+    """
+    by_speaker = defaultdict(list)
+    file_ids = {}
+    for segment in segments:
+        by_speaker[segment["speaker"]].append((segment["start"], segment["end"]))
+        file_ids.setdefault(segment["speaker"], segment["file_id"])
+
+    cleaned, stats = coalesce_speaker_spans(by_speaker, **kwargs)
+    result = [
+        {"file_id": file_ids[speaker], "start": start, "end": end, "speaker": speaker}
+        for speaker, spans in cleaned.items()
+        for start, end in spans
+    ]
+    result.sort(key=lambda s: (s["start"], s["speaker"]))
+    return result, stats
+
+def format_stats(stats):
+    """One-line summary of what coalescing removed."""
+    return (f"{stats.get('turns_in', 0)} -> {stats.get('turns_out', 0)} turns "
+            f"({stats.get('merged', 0)} merged, {stats.get('absorbed', 0)} absorbed, "
+            f"{stats.get('dropped', 0)} dropped = {stats.get('dropped_seconds', 0.0):.1f}s audio removed, "
+            f"{stats.get('bridged_seconds', 0.0):.1f}s of gaps bridged, "
+            f"{stats.get('blocked', 0)} gaps kept for other speakers, "
+            f"{stats.get('moved_seconds', 0.0):.1f}s moved from other speakers)")
@@ -1,9 +1,13 @@
 import os
+import sys
 import json
+import time
+import queue
+import argparse
+import threading
 from pathlib import Path
-from transformers import pipeline, AutoTokenizer, AutoModelForSequenceClassification
-from datasets import Dataset
-from tqdm import tqdm
+from normalization_index import load_index, reconstruct_tokens
+from finbert_backend import BACKENDS, MAX_LENGTH, load_finbert, accuracy_delta
 
 # ---------------------------------------------
 # Define base paths using relative structure
@@ -14,25 +18,43 @@ NLP_PATH = script_dir / "../earnings21/earnings21/transcripts/nlp_references"
 NORM_PATH = script_dir / "../earnings21/earnings21/transcripts/normalizations"
 WER_TAG_PATH = script_dir / "../earnings21/earnings21/transcripts/wer_tags"
 OUTPUT_PATH = script_dir / "../features/semantic"
-
-OUTPUT_PATH.mkdir(parents=True, exist_ok=True)
+PROGRESS_FILE = "finbert_progress.json"  # Checkpoint in OUTPUT_PATH, rewritten after every batch
 
 # ---------------------------------------------
-# Load FinBERT model
+# Streaming pipeline settings
 # ---------------------------------------------
-print("Loading FinBERT model...")
-tokenizer = AutoTokenizer.from_pretrained("yiyanghkust/finbert-tone")
-model = AutoModelForSequenceClassification.from_pretrained("yiyanghkust/finbert-tone")
-classifier = pipeline("text-classification", model=model, tokenizer=tokenizer, device=0, batch_size=8)
+READER_THREADS = 4   # Threads reading and reconstructing transcripts
+BATCH_SIZE = 8       # Transcripts per forward pass
+RECORD_QUEUE_SIZE = 32  # Reconstructed transcripts waiting for tokenization
+BATCH_QUEUE_SIZE = 4    # Tokenized batches waiting for the model
+
+_DONE = object()  # End-of-stream marker passed between stages
+PUT_TIMEOUT = 0.1  # Seconds between stop checks while a stage waits on a full queue
+
+class StageError:
+    """Carries an exception from a pipeline thread to the model thread."""
+    def __init__(self, stage, error):
+        self.stage = stage
+        self.error = error
+
+def put_unless_stopped(target_queue, item, stop):
+    """Put item, giving up if stop is set while the queue is full. Returns True if it was put."""
+    while not stop.is_set():
+        try:
+            target_queue.put(item, timeout=PUT_TIMEOUT)
+            return True
+        except queue.Full:
+            continue
+    return False
 
 # ---------------------------------------------
 # Reconstruct normalized transcripts with alignment
 # ---------------------------------------------
-records = []
-
-print(f"Processing transcripts and reconstructing normalized text from: {NLP_PATH.resolve()}")
-
-for nlp_file in tqdm(sorted(NLP_PATH.glob("*.nlp"))):
+def reconstruct_transcript(nlp_file):
+    """
+    Rebuild the normalized text of one call. Returns a record
+    { "file_id", "text" } or None if the call cannot be reconstructed.
+    """
     file_id = nlp_file.stem
 
     norm_file = NORM_PATH / f"{file_id}.norm.json"
@@ -40,81 +62,265 @@ for nlp_file in tqdm(sorted(NLP_PATH.glob("*.nlp"))):
 
     if not norm_file.exists() or not wer_file.exists():
         print(f"[WARNING] Missing norm or WER file for {file_id}")
-        continue
+        return None
 
     try:
         with open(nlp_file, "r", encoding="utf-8") as f:
             nlp_lines = f.readlines()[1:]  # Skip header
 
-        with open(norm_file, "r", encoding="utf-8") as f:
-            norm_data = json.load(f)
-
         with open(wer_file, "r", encoding="utf-8") as f:
             wer_data = json.load(f)
 
-        reconstructed_tokens = []
-
-        for idx, line in enumerate(nlp_lines):
-            line = line.strip()
-            if not line:
-                continue
-
-            token_index = str(idx)
-            parts = line.split("|")
-            original_token = parts[0] if parts else ""
-
-            # Default to original token
-            token_to_add = [original_token]
-
-            wer_tags = wer_data.get(token_index, [])
-            if "4" in wer_tags or "5" in wer_tags or "6" in wer_tags:
-                candidates = norm_data.get(token_index, {}).get("candidates", [])
-                if candidates:
-                    best = max(candidates, key=lambda x: x["probability"])
-                    verbalization = best.get("verbalization", [])
-                    if verbalization:
-                        token_to_add = verbalization
-
-            reconstructed_tokens.extend(token_to_add)
+        norm_index = load_index(norm_file)
+        reconstructed_tokens = reconstruct_tokens(nlp_lines, wer_data, norm_index)
 
         if not reconstructed_tokens:
             print(f"[WARNING] No tokens reconstructed for {file_id}")
-            continue
+            return None
 
         normalized_text = " ".join(reconstructed_tokens)
         normalized_text = normalized_text[:512]  # Truncate to max input size for BERT
 
-        records.append({
+        return {
             "file_id": file_id,
             "text": normalized_text
-        })
+        }
 
     except Exception as e:
         print(f"[ERROR] Failed processing {file_id}: {e}")
-        continue
+        return None
 
 # ---------------------------------------------
-# Run FinBERT classification in batch
+# Pipeline stages
 # ---------------------------------------------
-if not records:
-    print("No valid transcripts processed. Exiting.")
-    exit()
+def reader_stage(path_queue, record_queue, stop):
+    """
+    Reader thread: reconstruct transcripts until the path queue is empty or
+    the pipeline is stopped.
+    """
+    try:
+        while not stop.is_set():
+            try:
+                nlp_file = path_queue.get_nowait()
+            except queue.Empty:
+                break
+            record = reconstruct_transcript(nlp_file)
+            if record is not None:
+                put_unless_stopped(record_queue, record, stop)
+    finally:
+        put_unless_stopped(record_queue, _DONE, stop)
+
+def tokenizer_stage(tokenizer, record_queue, batch_queue, num_readers, stop):
+    """
+    Tokenizer thread: group reconstructed transcripts into padded batches.
+    A failure is passed on to the model thread as a StageError.
+    """
+    def flush(batch):
+        encodings = tokenizer([r["text"] for r in batch], truncation=True, max_length=MAX_LENGTH,
+                              padding=True, return_tensors="pt")
+        put_unless_stopped(batch_queue, (batch, encodings), stop)
+
+    try:
+        batch, finished = [], 0
+        while finished < num_readers and not stop.is_set():
+            try:
+                record = record_queue.get(timeout=PUT_TIMEOUT)
+            except queue.Empty:
+                continue
+            if record is _DONE:
+                finished += 1
+                continue
+            batch.append(record)
+            if len(batch) == BATCH_SIZE:
+                flush(batch)
+                batch = []
+        if batch:
+            flush(batch)
+    except Exception as e:
+        put_unless_stopped(batch_queue, StageError("tokenizer", e), stop)
+    finally:
+        put_unless_stopped(batch_queue, _DONE, stop)
 
-print("Running FinBERT sentiment classification...")
+# ---------------------------------------------
+# Results and resume checkpoint
+# ---------------------------------------------
+def result_path(file_id):
+    return OUTPUT_PATH / f"{file_id}_finbert_sentiment.json"
 
-dataset = Dataset.from_list(records)
-predictions = classifier(dataset["text"])
+def write_json_atomic(path, data):
+    """Write to a temporary file and rename it over path, so readers never see a partial file."""
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=4)
+    os.replace(tmp_path, path)
 
-# Save results
-for record, pred in zip(records, predictions):
+def has_result(file_id):
+    """True if a complete result exists for file_id (files cut short by an older crash are redone)."""
+    try:
+        with open(result_path(file_id), "r", encoding="utf-8") as f:
+            return "sentiment" in json.load(f)
+    except (OSError, ValueError):
+        return False
+
+def write_result(record, label, score):
     result = {
         "file_id": record["file_id"],
-        "sentiment": pred["label"],
-        "score": pred["score"]
+        "sentiment": label,
+        "score": score
     }
+    write_json_atomic(result_path(record["file_id"]), result)
+
+def save_progress(progress):
+    progress["updated"] = time.strftime("%Y-%m-%d %H:%M:%S")
+    write_json_atomic(OUTPUT_PATH / PROGRESS_FILE, progress)
+
+def run_pipeline(nlp_files, tokenizer, model, device, keep_texts=0, progress_state=None):
+    """
+    Stream transcripts through reader threads, a tokenizer thread and the
+    model (this thread) over bounded queues, writing each result as its
+    batch finishes. With progress_state, the checkpoint is updated after every
+    batch. Returns (records written, first keep_texts texts, model seconds).
+    If any stage fails, the other threads are stopped and the error is raised.
+    """
+    import torch
+    from tqdm import tqdm
+
+    path_queue = queue.Queue()
+    for nlp_file in nlp_files:
+        path_queue.put(nlp_file)
+    record_queue = queue.Queue(maxsize=RECORD_QUEUE_SIZE)
+    batch_queue = queue.Queue(maxsize=BATCH_QUEUE_SIZE)
+    stop = threading.Event()
+
+    num_readers = max(1, min(READER_THREADS, len(nlp_files)))
+    threads = [
+        threading.Thread(target=reader_stage, args=(path_queue, record_queue, stop), daemon=True)
+        for _ in range(num_readers)
+    ]
+    threads.append(threading.Thread(target=tokenizer_stage,
+                                    args=(tokenizer, record_queue, batch_queue, num_readers, stop), daemon=True))
+    for thread in threads:
+        thread.start()
+
+    labels = model.config.id2label
+    written, sample_texts, model_seconds = 0, [], 0.0
+    try:
+        with tqdm(total=len(nlp_files), desc="Transcripts") as progress:
+            while True:
+                item = batch_queue.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, StageError):
+                    raise RuntimeError(f"{item.stage} stage failed: {item.error}") from item.error
+                batch, encodings = item
+
+                start = time.perf_counter()
+                with torch.inference_mode():
+                    logits = model(**encodings.to(device)).logits
+                    scores, predicted = torch.softmax(logits, dim=-1).max(dim=-1)
+                model_seconds += time.perf_counter() - start
+
+                for record, score, label_id in zip(batch, scores.tolist(), predicted.tolist()):
+                    write_result(record, labels[label_id], score)
+                    if len(sample_texts) < keep_texts:
+                        sample_texts.append(record["text"])
+                written += len(batch)
+                progress.update(len(batch))
+
+                if progress_state is not None:
+                    progress_state["completed"] += len(batch)
+                    progress_state["last_file_id"] = batch[-1]["file_id"]
+                    save_progress(progress_state)
+    finally:
+        # Stop the other stages and empty the queues they may be blocked on,
+        # so they exit whether the run finished or failed
+        stop.set()
+        for pending in (record_queue, batch_queue):
+            while True:
+                try:
+                    pending.get_nowait()
+                except queue.Empty:
+                    break
+        for thread in threads:
+            thread.join()
+    return written, sample_texts, model_seconds
+
+# ---------------------------------------------
+# Main
+# ---------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run FinBERT on reconstructed normalized transcripts")
+    parser.add_argument("--backend", choices=BACKENDS, default="auto",
+                        help="gpu, fp32 cpu, or int8-quantized cpu (opt-in; auto: gpu if available, else fp32 cpu)")
+    parser.add_argument("--threads", type=int, default=None, help="Intra-op threads for CPU backends")
+    parser.add_argument("--eval-samples", type=int, default=32,
+                        help="Transcripts used to measure the cpu-int8 accuracy delta against fp32 (0 to skip)")
+    parser.add_argument("--overwrite", action="store_true",
+                        help="Reclassify every transcript instead of resuming after existing results")
+    parser.add_argument("--dry-run", action="store_true", help="List the transcripts that would be classified")
+    args = parser.parse_args(argv)
+
+    # Check for work before paying for the model load
+    nlp_files = sorted(NLP_PATH.glob("*.nlp"))
+    if not nlp_files:
+        print(f"No .nlp references found in {NLP_PATH.resolve()}. Exiting.")
+        return
+    total = len(nlp_files)
+    if not args.overwrite:
+        nlp_files = [nlp_file for nlp_file in nlp_files if not has_result(nlp_file.stem)]
+        if total > len(nlp_files):
+            print(f"[INFO] Resuming: {total - len(nlp_files)}/{total} transcripts already have results")
+        if not nlp_files:
+            print("All transcripts already classified. Use --overwrite to redo them.")
+            return
+    if args.dry_run:
+        for nlp_file in nlp_files:
+            print(nlp_file.stem)
+        print(f"{len(nlp_files)} transcripts would be classified")
+        return
+
+    OUTPUT_PATH.mkdir(parents=True, exist_ok=True)
+
+    print("Loading FinBERT model...")
+    tokenizer, model, device, backend = load_finbert(args.backend, args.threads)
+    print(f"[INFO] Using backend: {backend}")
+
+    print(f"Processing transcripts and reconstructing normalized text from: {NLP_PATH.resolve()}")
+
+    keep_texts = args.eval_samples if backend == "cpu-int8" else 0
+    progress_state = {"backend": backend, "total": total, "pending_at_start": len(nlp_files),
+                      "completed": total - len(nlp_files), "last_file_id": None}
+    save_progress(progress_state)
+    start = time.perf_counter()
+    try:
+        written, sample_texts, model_seconds = run_pipeline(nlp_files, tokenizer, model, device,
+                                                            keep_texts, progress_state)
+    except KeyboardInterrupt:
+        print(f"\n[INFO] Interrupted after {progress_state['completed']}/{total} transcripts; rerun to resume")
+        return
+    except Exception as e:
+        print(f"[ERROR] {e}; {progress_state['completed']}/{total} transcripts done, rerun to resume")
+        sys.exit(1)
+    wall_seconds = time.perf_counter() - start
+
+    if not written:
+        print("No valid transcripts processed. Exiting.")
+        return
+    print(f"[INFO] {written} transcripts in {wall_seconds:.1f}s wall, {model_seconds:.1f}s model compute")
+
+    # ---------------------------------------------
+    # Report the quantization accuracy delta
+    # ---------------------------------------------
+    if sample_texts:
+        report = {"backend": backend, **accuracy_delta(tokenizer, model, sample_texts)}
+        print(f"[INFO] int8 vs fp32 on {report['samples']} transcripts: "
+              f"label agreement {report['label_agreement']:.3f}, "
+              f"max |dp| {report['max_abs_prob_diff']:.4f}, "
+              f"time {report['backend_seconds']:.1f}s vs {report['fp32_seconds']:.1f}s")
+        with open(OUTPUT_PATH / "finbert_backend_report.json", "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4)
 
-    output_file = OUTPUT_PATH / f"{record['file_id']}_finbert_sentiment.json"
-    with open(output_file, "w", encoding="utf-8") as f:
-        json.dump(result, f, indent=4)
+    print("Sentiment classification completed. Results saved to:", OUTPUT_PATH.resolve())
 
-print("Sentiment classification completed. Results saved to:", OUTPUT_PATH.resolve())
\ No newline at end of file
+if __name__ == "__main__":
+    main()
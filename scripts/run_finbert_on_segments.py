@@ -0,0 +1,151 @@
+import os
+import glob
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+
+from finbert_backend import BACKENDS, load_finbert
+from finbert_server import predict_remote
+from temporal_fusion import load_turns, load_nlp_tokens, segment_texts
+from rttm_turns import add_turn_arguments, turn_options
+
+# ---------------------------------------------
+# Define base paths using relative structure
+# ---------------------------------------------
+script_dir = Path(__file__).resolve().parent
+
+RTTM_PATH = script_dir / "../earnings21/earnings21/rttms"
+NLP_PATH = script_dir / "../earnings21/earnings21/transcripts/nlp_references"
+OUTPUT_PATH = script_dir / "../features/semantic/segments"
+
+BATCH_SIZE = 64     # Segments per forward pass
+MAX_LENGTH = 512    # FinBERT input limit in tokens
+
+# ---------------------------------------------
+# Collect segment texts for all calls
+# ---------------------------------------------
+def collect_segments(file_ids=None, options=None):
+    """
+    Align RTTM turns with .nlp token timings for every call (or only file_ids);
+    options are the turn coalescing options (load_turns()).
+    Returns a DataFrame with one row per segment that has text.
+    """
+    rows = []
+    for rttm_path in sorted(glob.glob(str(RTTM_PATH / "*.rttm"))):
+        file_id = os.path.splitext(os.path.basename(rttm_path))[0]
+        if file_ids is not None and file_id not in file_ids:
+            continue
+        nlp_file = NLP_PATH / f"{file_id}.nlp"
+        if not nlp_file.exists():
+            print(f"[WARNING] Missing NLP reference for {file_id}")
+            continue
+
+        segments = load_turns(rttm_path, **(options or {}))
+        texts = segment_texts(load_nlp_tokens(nlp_file), segments)
+        for segment, text in zip(segments, texts):
+            if text:
+                rows.append({
+                    "file_id": file_id,
+                    "speaker": segment["speaker"],
+                    "start": segment["start"],
+                    "end": segment["end"],
+                    "text": text
+                })
+    return pd.DataFrame(rows, columns=["file_id", "speaker", "start", "end", "text"])
+
+# ---------------------------------------------
+# Length-bucketed batch classification
+# ---------------------------------------------
+def length_buckets(lengths, batch_size=BATCH_SIZE):
+    """
+    Group indices into batches of similar token length so padding stays minimal.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    return [order[i:i + batch_size] for i in range(0, len(order), batch_size)]
+
+def classify_texts(texts, tokenizer, model, device, batch_size=BATCH_SIZE):
+    """
+    Classify texts with FinBERT. Returns an (n_texts, n_labels) array of
+    class probabilities in the model's label order.
+    """
+    import torch
+
+    encodings = tokenizer(list(texts), truncation=True, max_length=MAX_LENGTH)["input_ids"]
+    probabilities = [None] * len(encodings)
+
+    with torch.inference_mode():
+        for batch in tqdm(length_buckets([len(ids) for ids in encodings], batch_size), desc="Batches"):
+            padded = tokenizer.pad({"input_ids": [encodings[i] for i in batch]}, return_tensors="pt")
+            padded = {k: v.to(device) for k, v in padded.items()}
+            probs = torch.softmax(model(**padded).logits, dim=-1).cpu().numpy()
+            for i, row in zip(batch, probs):
+                probabilities[i] = row
+    return probabilities
+
+def score_segments(segments, tokenizer, model, device):
+    """
+    Classify collected segments and write one table per call,
+    keyed by (file_id, speaker, start).
+    """
+    labels = [model.config.id2label[i] for i in range(model.config.num_labels)]
+    probabilities = classify_texts(segments["text"], tokenizer, model, device)
+    write_segment_sentiment(segments, labels, probabilities)
+
+def score_segments_remote(segments, server_url, chunk_size=256):
+    """
+    Same as score_segments, but classified by a running finbert_server.
+    """
+    texts = segments["text"].tolist()
+    labels, probabilities = None, []
+    for i in tqdm(range(0, len(texts), chunk_size), desc="Requests"):
+        labels, probs = predict_remote(texts[i:i + chunk_size], server_url)
+        probabilities.extend(np.asarray(row) for row in probs)
+    write_segment_sentiment(segments, labels, probabilities)
+
+def write_segment_sentiment(segments, labels, probabilities):
+    """Attach labels and probabilities to the segments and write one CSV per call."""
+    probs = pd.DataFrame(probabilities, columns=[f"prob_{label}" for label in labels], index=segments.index)
+    segments = segments.copy()
+    segments["sentiment"] = [labels[row.argmax()] for row in probabilities]
+    segments["score"] = probs.max(axis=1)
+    segments = pd.concat([segments, probs], axis=1)
+
+    OUTPUT_PATH.mkdir(parents=True, exist_ok=True)
+    for file_id, table in segments.groupby("file_id"):
+        output_file = OUTPUT_PATH / f"{file_id}_segment_sentiment.csv"
+        table.drop(columns=["text"]).to_csv(output_file, index=False)
+
+# ---------------------------------------------
+# Main
+# ---------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Turn-level FinBERT sentiment for RTTM segments")
+    parser.add_argument("--backend", choices=BACKENDS, default="auto")
+    parser.add_argument("--threads", type=int, default=None, help="Intra-op threads for CPU backends")
+    parser.add_argument("--server", default=None,
+                        help="URL of a running finbert_server.py; skips loading the model locally")
+    add_turn_arguments(parser)
+    args = parser.parse_args(argv)
+
+    segments = collect_segments(options=turn_options(args))
+    if segments.empty:
+        print("No segment texts found. Exiting.")
+        return
+    print(f"Collected {len(segments)} segments from {segments['file_id'].nunique()} calls")
+
+    if args.server:
+        print(f"[INFO] Using FinBERT server at {args.server}")
+        score_segments_remote(segments, args.server)
+    else:
+        print("Loading FinBERT model...")
+        tokenizer, model, device, backend = load_finbert(args.backend, args.threads)
+        print(f"[INFO] Using backend: {backend}")
+        score_segments(segments, tokenizer, model, device)
+
+    print("Segment sentiment completed. Results saved to:", OUTPUT_PATH.resolve())
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,13 @@
 import os
+import argparse
 import subprocess
 import csv
+import json
+from functools import partial
 from collections import defaultdict
+from rttm_turns import coalesce_speaker_spans, format_stats, add_turn_arguments, turn_options, resolved_turn_options
+from worker_pool import imap_adaptive, task_threads
+from call_durations import call_costs
 
 # ----------------------------------------
 # Define directory paths (relative to repo)
@@ -11,6 +17,14 @@ AUDIO_DIR = os.path.join(BASE_DIR, "earnings21", "earnings21", "wav")
 RTTM_DIR = os.path.join(BASE_DIR, "earnings21", "earnings21", "rttms")
 OUTPUT_DIR = os.path.join(BASE_DIR, "earnings21", "earnings21", "media_by_speaker")
 SPEAKER_META_PATH = os.path.join(BASE_DIR, "earnings21", "earnings21", "speaker-metadata.csv")
+LLD_DIR = os.path.join(BASE_DIR, "features", "llds_by_speaker")  # Written by extract_llds.sh
+
+# ----------------------------------------
+# Concurrency (see worker_pool.py)
+# ----------------------------------------
+MAX_WORKERS = None           # None: size from available CPUs and memory
+FFMPEG_THREADS = 1           # Threads per ffmpeg child (-threads)
+SEGMENT_TASK_MEMORY_MB = 256  # Peak memory of one call's ffmpeg jobs
 
 # ----------------------------------------
 # Parse RTTM file and return speaker segments
@@ -38,6 +52,16 @@ def parse_rttm(file_path):
 
     return segments
 
+def load_speaker_turns(file_path, **options):
+    """
+    parse_rttm() followed by turn coalescing (rttm_turns.py, options as in
+    coalesce_spans()), so short and back-to-back turns don't each become an
+    ffmpeg job.
+    """
+    segments, stats = coalesce_speaker_spans(parse_rttm(file_path), **options)
+    print(f"[INFO] RTTM {os.path.basename(file_path)}: {format_stats(stats)}")
+    return segments
+
 # ----------------------------------------
 # Load speaker_id → speaker_name mapping
 # ----------------------------------------
@@ -54,13 +78,52 @@ def load_speaker_names(csv_path, file_id):
                 mapping[row["speaker_id"]] = row["speaker_name"].replace(" ", "_")
     return mapping
 
+# ----------------------------------------
+# Per-call speaker manifest
+# ----------------------------------------
+def manifest_path(file_id):
+    return os.path.join(OUTPUT_DIR, file_id, f"{file_id}_manifest.json")
+
+def write_manifest(file_id, speaker_segments, speaker_names, options=None):
+    """
+    Write the per-call manifest mapping each RTTM speaker id to its speaker WAV
+    and the LLD/functional CSVs extract_llds.sh derives from it.
+    "turns" lists [start, end, offset] per concatenated turn: the turn's call
+    time and where it begins in the speaker WAV, so call times can be mapped
+    onto the speaker's LLD frames. options are the turn coalescing options
+    the turns were made with. Paths are relative to the repository root.
+    """
+    speakers = {}
+    for speaker in sorted(speaker_segments):
+        speaker_name = speaker_names.get(speaker, f"Speaker_{speaker}").replace(" ", "_")
+        stem = f"{file_id}_{speaker_name}"
+        turns, offset = [], 0.0
+        for start, end in speaker_segments[speaker]:
+            turns.append([start, end, round(offset, 6)])
+            offset += end - start
+        speakers[speaker] = {
+            "speaker_name": speaker_name,
+            "wav": os.path.relpath(os.path.join(OUTPUT_DIR, file_id, f"{stem}.wav"), BASE_DIR),
+            "llds": os.path.relpath(os.path.join(LLD_DIR, file_id, f"{stem}_llds.csv"), BASE_DIR),
+            "functionals": os.path.relpath(os.path.join(LLD_DIR, file_id, f"{stem}_functionals.csv"), BASE_DIR),
+            "turns": turns,
+        }
+
+    path = manifest_path(file_id)
+    with open(path, "w", encoding="utf-8") as f:
+        manifest = {"file_id": file_id, "turn_options": resolved_turn_options(options), "speakers": speakers}
+        json.dump(manifest, f, indent=4)
+    return path
+
 # ----------------------------------------
 # Main segmentation and concatenation logic
 # ----------------------------------------
-def segment_and_concat(file_id):
+def segment_and_concat(file_id, options=None):
     """
     Segments and concatenates speaker-specific audio from RTTM diarization.
+    options are passed to load_speaker_turns().
     """
+    options = options or {}
     audio_path = os.path.join(AUDIO_DIR, f"{file_id}.wav")
     rttm_path = os.path.join(RTTM_DIR, f"{file_id}.rttm")
     output_path = os.path.join(OUTPUT_DIR, file_id)
@@ -78,7 +141,7 @@ def segment_and_concat(file_id):
 
     # Load speaker metadata and RTTM speaker segments
     speaker_names = load_speaker_names(SPEAKER_META_PATH, file_id)
-    speaker_segments = parse_rttm(rttm_path)
+    speaker_segments = load_speaker_turns(rttm_path, **options)
 
     # Step 1: Extract segments using ffmpeg
     for speaker, segments in speaker_segments.items():
@@ -87,6 +150,7 @@ def segment_and_concat(file_id):
             segment_path = os.path.join(output_path, f"{file_id}_spk{speaker}_seg{idx}.wav")
             cmd = [
                 "ffmpeg", "-y",
+                "-threads", str(task_threads()),
                 "-i", audio_path,
                 "-ss", str(start),
                 "-t", str(duration),
@@ -119,6 +183,7 @@ def segment_and_concat(file_id):
         # Run ffmpeg to concatenate segments
         concat_cmd = [
             "ffmpeg", "-y",
+            "-threads", str(task_threads()),
             "-f", "concat",
             "-safe", "0",
             "-i", list_file,
@@ -133,21 +198,52 @@ def segment_and_concat(file_id):
             os.remove(seg_path)
         os.remove(list_file)
 
+    write_manifest(file_id, speaker_segments, speaker_names, options)
+
     print(f"Done: {file_id} processed and cleaned.\n")
 
 # ----------------------------------------
 # Entry point
 # ----------------------------------------
-if __name__ == "__main__":
-    import multiprocessing
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Split call audio into one concatenated wav per speaker")
+    parser.add_argument("file_ids", nargs="*", help="Calls to segment (default: every wav in AUDIO_DIR)")
+    parser.add_argument("--manifest-only", action="store_true",
+                        help="Only (re)write manifests of calls that are already segmented")
+    parser.add_argument("--dry-run", action="store_true", help="List the calls that would be segmented")
+    add_turn_arguments(parser)
+    args = parser.parse_args(argv)
+    options = turn_options(args)
+
+    if args.manifest_only:
+        for rttm_file in sorted(os.listdir(RTTM_DIR)):
+            if not rttm_file.endswith(".rttm"):
+                continue
+            file_id = os.path.splitext(rttm_file)[0]
+            if not os.path.isdir(os.path.join(OUTPUT_DIR, file_id)):
+                continue
+            speakers = load_speaker_turns(os.path.join(RTTM_DIR, rttm_file), **options)
+            names = load_speaker_names(SPEAKER_META_PATH, file_id)
+            print(f"Manifest: {write_manifest(file_id, speakers, names, options)}")
+        return
 
     wav_files = [
         f for f in os.listdir(AUDIO_DIR)
         if f.endswith(".wav")
     ]
 
-    file_ids = sorted([os.path.splitext(f)[0] for f in wav_files])
+    file_ids = args.file_ids or sorted([os.path.splitext(f)[0] for f in wav_files])
+    if args.dry_run:
+        print("\n".join(file_ids))
+        print(f"{len(file_ids)} calls would be segmented")
+        return
+
+    # Concurrency adapts to the machine and its load; longest calls are dispatched first
+    segment = partial(segment_and_concat, options=options)
+    for _ in imap_adaptive(segment, file_ids, threads_per_task=FFMPEG_THREADS,
+                           memory_per_task_mb=SEGMENT_TASK_MEMORY_MB, max_workers=MAX_WORKERS,
+                           costs=call_costs(file_ids, AUDIO_DIR, RTTM_DIR)):
+        pass
 
-    # Run with 4 parallel workers (adjust as needed)
-    with multiprocessing.Pool(processes=4) as pool:
-        pool.map(segment_and_concat, file_ids)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
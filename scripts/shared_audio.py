@@ -0,0 +1,215 @@
+import os
+import time
+import argparse
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from multiprocessing import shared_memory
+import numpy as np
+from prosody_features import read_pcm_memmap
+from worker_pool import pool_size, init_worker
+from call_durations import call_costs
+
+# ----------------------------------------
+# Shared-memory execution mode
+# ----------------------------------------
+# The file-based stages read each call several times: ffmpeg cuts the call WAV
+# into temporary segments and concatenates them into speaker WAVs, and the
+# feature stages decode those again. Here the driver reads each call WAV once
+# into a shared-memory block, and the consumers run in worker processes on
+# zero-copy NumPy views of it:
+#   - "prosody": VAD, pauses and speech rate over the whole call (prosody_features.py)
+#   - "speaker": TARGET_FEATURES on one speaker's RTTM turns, sliced from the view
+# A block is unlinked as soon as the last consumer of its call has finished.
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+WAV_DIR = os.path.join(BASE_DIR, "earnings21", "earnings21", "wav")
+RTTM_DIR = os.path.join(BASE_DIR, "earnings21", "earnings21", "rttms")
+NLP_DIR = os.path.join(BASE_DIR, "earnings21", "earnings21", "transcripts", "nlp_references")
+SPEAKER_META_PATH = os.path.join(BASE_DIR, "earnings21", "earnings21", "speaker-metadata.csv")
+PROSODY_DIR = os.path.join(BASE_DIR, "features", "prosody")
+SPEAKER_DIR = os.path.join(BASE_DIR, "features", "targeted_by_speaker")
+
+MAX_RESIDENT_CALLS = 2   # Calls held in shared memory at once (the next call is read while one is processed)
+COPY_SECONDS = 60.0      # Audio copied into the block per step
+TASK_MEMORY_MB = 512     # One speaker's turns as float32 plus LLD frame blocks
+
+# ----------------------------------------
+# Driver side: one block per call
+# ----------------------------------------
+class SharedCall:
+    """
+    Samples of one call WAV in a shared-memory block, in the layout
+    read_pcm_memmap() returns: (n_frames, channels) in the file's integer dtype.
+    """
+    def __init__(self, file_id, wav_path):
+        samples, sample_rate = read_pcm_memmap(wav_path)
+        self.file_id = file_id
+        self.block = shared_memory.SharedMemory(create=True, size=max(1, samples.nbytes))
+        self.descriptor = {"name": self.block.name, "shape": samples.shape,
+                           "dtype": samples.dtype.str, "sample_rate": sample_rate}
+        self.nbytes = samples.nbytes
+        self.pending = 0
+        self.rows = []
+
+        target = np.ndarray(samples.shape, dtype=samples.dtype, buffer=self.block.buf)
+        step = max(1, int(COPY_SECONDS * sample_rate))
+        for start in range(0, len(samples), step):
+            target[start:start + step] = samples[start:start + step]
+        del target, samples
+
+    def release(self):
+        self.block.close()
+        self.block.unlink()
+
+# ----------------------------------------
+# Worker side: consumers on views
+# ----------------------------------------
+def speaker_signal(samples, sample_rate, spans):
+    """
+    Mono float32 signal of one speaker's (start, end) turns, concatenated as
+    segment_and_concat() does on disk. Only this worker's copy is made.
+    """
+    scale = float(np.iinfo(samples.dtype).max + 1)
+    bounds = [(int(start * sample_rate), min(len(samples), int(end * sample_rate))) for start, end in spans]
+    signal = np.empty(sum(max(0, b - a) for a, b in bounds), dtype=np.float32)
+    offset = 0
+    for a, b in bounds:
+        if b > a:
+            signal[offset:offset + b - a] = samples[a:b].mean(axis=1, dtype=np.float32) / scale
+            offset += b - a
+    return signal
+
+def consume_prosody(samples, sample_rate, file_id, segments, output_dir):
+    from prosody_features import call_prosody, speaker_prosody
+    from temporal_fusion import load_nlp_tokens
+
+    tokens = load_nlp_tokens(os.path.join(NLP_DIR, f"{file_id}.nlp"))
+    table = call_prosody(None, segments, tokens, audio=(samples, sample_rate))
+    table.to_csv(os.path.join(output_dir, f"{file_id}_prosody_segments.csv"), index=False)
+    speaker_prosody(table).to_csv(os.path.join(output_dir, f"{file_id}_prosody_speakers.csv"), index=False)
+    return len(table)
+
+def consume_speaker(samples, sample_rate, file_id, speaker, spans):
+    from targeted_features import extract_targeted
+    from opensmile_downgrade import TARGET_FEATURES
+
+    signal = speaker_signal(samples, sample_rate, spans)
+    row = {"file_id": file_id, "speaker": speaker, "turns": len(spans), "seconds": len(signal) / sample_rate}
+    row.update(extract_targeted(signal, sample_rate, TARGET_FEATURES))
+    return row
+
+CONSUMERS = {"prosody": consume_prosody, "speaker": consume_speaker}
+
+def run_consumer(task):
+    """
+    Worker entry point: attach to the call's block, run one consumer on a view
+    of it and detach. Returns (result, True) or (None, error message).
+    """
+    kind, descriptor, args = task
+    block = shared_memory.SharedMemory(name=descriptor["name"])
+    samples = np.ndarray(descriptor["shape"], dtype=descriptor["dtype"], buffer=block.buf)
+    try:
+        outcome = CONSUMERS[kind](samples, descriptor["sample_rate"], *args), True
+    except Exception as e:
+        outcome = None, f"{type(e).__name__}: {e}"
+    del samples  # The block cannot be closed while a view exists
+    block.close()
+    return outcome
+
+# ----------------------------------------
+# Driver
+# ----------------------------------------
+def call_tasks(call, rttm_dir, prosody_dir):
+    """Consumer tasks of one call: prosody over the whole call first, then one per speaker."""
+    from temporal_fusion import load_turns
+
+    segments = load_turns(os.path.join(rttm_dir, f"{call.file_id}.rttm"))
+    spans = defaultdict(list)
+    for segment in segments:
+        spans[segment["speaker"]].append((segment["start"], segment["end"]))
+
+    tasks = [("prosody", call.descriptor, (call.file_id, segments, prosody_dir))]
+    tasks += [("speaker", call.descriptor, (call.file_id, speaker, spans[speaker])) for speaker in sorted(spans)]
+    return tasks
+
+def write_speaker_rows(call, speaker_dir):
+    import pandas as pd
+    from segment_audio_by_speaker import load_speaker_names
+
+    table = pd.DataFrame(sorted(call.rows, key=lambda r: r["speaker"]))
+    if table.empty:
+        return
+    names = load_speaker_names(SPEAKER_META_PATH, call.file_id) if os.path.exists(SPEAKER_META_PATH) else {}
+    table.insert(2, "speaker_name", [names.get(s, f"Speaker_{s}") for s in table["speaker"]])
+    table.to_csv(os.path.join(speaker_dir, f"{call.file_id}_targeted_speakers.csv"), index=False)
+
+def run_shared(file_ids, wav_dir=WAV_DIR, rttm_dir=RTTM_DIR, prosody_dir=PROSODY_DIR, speaker_dir=SPEAKER_DIR,
+               max_workers=None):
+    """
+    Read each call into shared memory once and run its consumers across a
+    process pool, longest calls first. At most MAX_RESIDENT_CALLS blocks exist
+    at a time; each is unlinked when its last consumer returns.
+    """
+    os.makedirs(prosody_dir, exist_ok=True)
+    os.makedirs(speaker_dir, exist_ok=True)
+    costs = dict(zip(file_ids, call_costs(file_ids, wav_dir, rttm_dir)))
+    queue = sorted(file_ids, key=lambda f: -costs[f])
+
+    limit = pool_size(1, TASK_MEMORY_MB, max_workers)
+    print(f"[INFO] Shared-memory mode: {limit} workers, up to {MAX_RESIDENT_CALLS} calls resident")
+    resident, futures, failed = {}, {}, 0
+    start = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=limit, initializer=init_worker, initargs=(1,)) as pool:
+            while queue or futures:
+                while queue and len(resident) < MAX_RESIDENT_CALLS:
+                    file_id = queue.pop(0)
+                    wav_path = os.path.join(wav_dir, f"{file_id}.wav")
+                    if not os.path.exists(wav_path) or not os.path.exists(os.path.join(rttm_dir, f"{file_id}.rttm")):
+                        print(f"[WARN] Missing wav or RTTM for {file_id}, skipping")
+                        continue
+                    call = SharedCall(file_id, wav_path)
+                    resident[file_id] = call
+                    for task in call_tasks(call, rttm_dir, prosody_dir):
+                        futures[pool.submit(run_consumer, task)] = (file_id, task[0])
+                        call.pending += 1
+                    print(f"[INFO] {file_id}: {call.nbytes / 2 ** 20:.1f} MB in shared memory, "
+                          f"{call.pending} consumers")
+
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    file_id, kind = futures.pop(future)
+                    call = resident[file_id]
+                    result, status = future.result()
+                    if status is not True:
+                        failed += 1
+                        print(f"[ERROR] {file_id} {kind}: {status}")
+                    elif kind == "speaker":
+                        call.rows.append(result)
+
+                    call.pending -= 1
+                    if call.pending == 0:
+                        call.release()
+                        del resident[file_id]
+                        write_speaker_rows(call, speaker_dir)
+                        print(f"[DONE] {file_id}: {len(call.rows)} speakers")
+    finally:
+        for call in resident.values():  # Interrupted or failed: don't leave blocks in /dev/shm
+            call.release()
+
+    print(f"[INFO] {len(file_ids)} calls in {time.perf_counter() - start:.1f}s, {failed} consumers failed")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prosody and per-speaker features from calls decoded once into shared memory")
+    parser.add_argument("file_ids", nargs="*", help="Calls to process (default: every RTTM with a wav)")
+    parser.add_argument("--wav-dir", default=WAV_DIR)
+    parser.add_argument("--rttm-dir", default=RTTM_DIR)
+    parser.add_argument("--prosody-dir", default=PROSODY_DIR)
+    parser.add_argument("--speaker-dir", default=SPEAKER_DIR)
+    parser.add_argument("--workers", type=int, default=None, help="Upper bound on worker processes")
+    args = parser.parse_args(argv)
+
+    file_ids = args.file_ids or sorted(os.path.splitext(f)[0] for f in os.listdir(args.rttm_dir) if f.endswith(".rttm"))
+    run_shared(file_ids, args.wav_dir, args.rttm_dir, args.prosody_dir, args.speaker_dir, args.workers)
+
+if __name__ == "__main__":
+    main()
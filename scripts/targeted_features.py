@@ -0,0 +1,300 @@
+import sys
+import wave
+import argparse
+import numpy as np
+
+# ----------------------------------------
+# Framing parameters (mirroring ComParE_2016)
+# ----------------------------------------
+FRAME_STEP = 0.010        # 10 ms hop for every LLD
+ENERGY_FRAME_SIZE = 0.020  # Hamming-windowed frames for energy/spectral LLDs
+PITCH_FRAME_SIZE = 0.060   # Gaussian-windowed frames for voicing-related LLDs
+SMA_WIDTH = 3              # Moving-average smoothing applied to every LLD (the "_sma" suffix)
+FRAME_BLOCK = 4096         # Frames processed per vectorised block (bounds memory on long calls)
+
+F0_MIN = 55.0
+F0_MAX = 620.0
+F0_SEMITONE_BASE = 27.5
+VOICING_THRESHOLD = 0.55
+PITCH_PEAK_TOLERANCE = 0.9  # Shortest-lag ACF peak within this fraction of the highest one is the period
+SPEECH_RMS_FLOOR_DB = -40.0  # Frames within 40 dB of the loudest frame count as speech
+AUDSPEC_BANDS = 26
+AUDSPEC_FMIN = 20.0
+AUDSPEC_FMAX = 8000.0
+AUDSPEC_COMPRESSION = 0.33
+
+# ----------------------------------------
+# Wave input
+# ----------------------------------------
+def read_wav(path):
+    """
+    Read a PCM WAV file into a mono float32 signal scaled to [-1, 1].
+    Returns (signal, sample_rate).
+    """
+    with wave.open(path, "rb") as wf:
+        sample_rate = wf.getframerate()
+        channels = wf.getnchannels()
+        sample_width = wf.getsampwidth()
+        raw = wf.readframes(wf.getnframes())
+
+    if sample_width == 1:
+        signal = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif sample_width == 2:
+        signal = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768.0
+    elif sample_width == 4:
+        signal = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2147483648.0
+    else:
+        raise ValueError(f"Unsupported sample width ({sample_width} bytes) in {path}")
+
+    if channels > 1:
+        signal = signal.reshape(-1, channels).mean(axis=1)  # Mono mixdown
+    return signal, sample_rate
+
+# ----------------------------------------
+# Frame helpers
+# ----------------------------------------
+def frame_signal(signal, frame_len, hop):
+    """
+    Return a (n_frames, frame_len) strided view of the signal; no data is copied.
+    """
+    if len(signal) < frame_len:
+        signal = np.pad(signal, (0, frame_len - len(signal)))
+    return np.lib.stride_tricks.sliding_window_view(signal, frame_len)[::hop]
+
+def iter_frame_blocks(frames):
+    """
+    Yield consecutive blocks of frames so per-frame transforms never hold the whole call.
+    """
+    for start in range(0, len(frames), FRAME_BLOCK):
+        yield frames[start:start + FRAME_BLOCK]
+
+def smooth(contour):
+    """
+    Centered moving average over SMA_WIDTH frames; edges average the frames available.
+    """
+    if len(contour) == 0:
+        return contour
+    kernel = np.ones(SMA_WIDTH)
+    total = np.convolve(contour, kernel, mode="same")
+    count = np.convolve(np.ones(len(contour)), kernel, mode="same")
+    return (total / count).astype(np.float32)
+
+def gaussian_window(length, sigma=0.4):
+    n = np.arange(length)
+    half = (length - 1) / 2.0
+    return np.exp(-0.5 * ((n - half) / (sigma * half)) ** 2).astype(np.float32)
+
+def mel_filterbank(n_fft, sample_rate, n_bands=AUDSPEC_BANDS, fmin=AUDSPEC_FMIN, fmax=AUDSPEC_FMAX):
+    """
+    Triangular Mel filterbank of shape (n_fft // 2 + 1, n_bands).
+    """
+    fmax = min(fmax, sample_rate / 2.0)
+    mel = lambda f: 1127.0 * np.log1p(f / 700.0)
+    inv_mel = lambda m: 700.0 * np.expm1(m / 1127.0)
+
+    edges = inv_mel(np.linspace(mel(fmin), mel(fmax), n_bands + 2))
+    freqs = np.fft.rfftfreq(n_fft, 1.0 / sample_rate)
+    lower, center, upper = edges[:-2, None], edges[1:-1, None], edges[2:, None]
+    rising = (freqs - lower) / (center - lower)
+    falling = (upper - freqs) / (upper - center)
+    return np.clip(np.minimum(rising, falling), 0.0, None).T.astype(np.float32)
+
+# ----------------------------------------
+# LLD groups (each computed at most once per file)
+# ----------------------------------------
+def energy_llds(signal, sample_rate):
+    """
+    RMS energy and auditory-spectrum L1 norm on 20 ms Hamming frames.
+    """
+    frame_len = int(round(ENERGY_FRAME_SIZE * sample_rate))
+    hop = int(round(FRAME_STEP * sample_rate))
+    frames = frame_signal(signal, frame_len, hop)
+    window = np.hamming(frame_len).astype(np.float32)
+    n_fft = 1 << (frame_len - 1).bit_length()
+    filterbank = mel_filterbank(n_fft, sample_rate)
+
+    rms, audspec = [], []
+    for block in iter_frame_blocks(frames):
+        rms.append(np.sqrt(np.mean(block ** 2, axis=1)))
+        power = np.abs(np.fft.rfft(block * window, n=n_fft, axis=1)) ** 2
+        bands = (power @ filterbank) ** AUDSPEC_COMPRESSION
+        audspec.append(bands.sum(axis=1))
+
+    return {
+        "pcm_RMSenergy": np.concatenate(rms).astype(np.float32),
+        "audspec_lengthL1norm": np.concatenate(audspec).astype(np.float32),
+    }
+
+def pitch_llds(signal, sample_rate):
+    """
+    Autocorrelation pitch and voicing probability on 60 ms Gaussian frames.
+    Unvoiced frames get F0 = 0, as in openSMILE's F0final contours.
+    """
+    frame_len = int(round(PITCH_FRAME_SIZE * sample_rate))
+    hop = int(round(FRAME_STEP * sample_rate))
+    frames = frame_signal(signal, frame_len, hop)
+    window = gaussian_window(frame_len)
+    n_fft = 1 << (2 * frame_len - 1).bit_length()
+    min_lag = max(1, int(sample_rate / F0_MAX))
+    max_lag = min(frame_len - 1, int(sample_rate / F0_MIN))
+
+    # Normalise by the window's own autocorrelation so voicing is not biased towards short lags
+    window_acf = np.fft.irfft(np.abs(np.fft.rfft(window, n=n_fft)) ** 2, n=n_fft)[:max_lag + 2]
+    window_acf = window_acf / window_acf[0]
+
+    f0, voicing = [], []
+    for block in iter_frame_blocks(frames):
+        spectrum = np.fft.rfft(block * window, n=n_fft, axis=1)
+        acf = np.fft.irfft(np.abs(spectrum) ** 2, n=n_fft, axis=1)[:, :max_lag + 2]
+        energy = acf[:, :1]
+        acf = np.divide(acf, energy, out=np.zeros_like(acf), where=energy > 0) / window_acf
+        acf = np.minimum(acf, 1.0)  # The normalisation inflates long lags past 1
+
+        # Multiples of the period peak about as high as the period itself, so
+        # take the shortest-lag local maximum close to the highest peak
+        search = acf[:, min_lag:max_lag + 1]
+        local_max = (search >= acf[:, min_lag - 1:max_lag]) & (search >= acf[:, min_lag + 1:max_lag + 2])
+        close = search >= PITCH_PEAK_TOLERANCE * search.max(axis=1, keepdims=True)
+        candidates = local_max & close
+        first = np.argmax(candidates, axis=1)
+        peak = np.where(candidates.any(axis=1), first, np.argmax(search, axis=1)) + min_lag
+        rows = np.arange(len(block))
+        peak_value = acf[rows, peak]
+
+        # Parabolic interpolation around the peak for sub-sample lag resolution
+        left, right = acf[rows, peak - 1], acf[rows, peak + 1]
+        denom = left - 2.0 * peak_value + right
+        offset = np.divide(0.5 * (left - right), denom, out=np.zeros_like(denom), where=denom != 0)
+        lag = peak + np.clip(offset, -0.5, 0.5)
+
+        voiced = peak_value > VOICING_THRESHOLD
+        semitone = 12.0 * np.log2((sample_rate / lag) / F0_SEMITONE_BASE)
+        f0.append(np.where(voiced, semitone, 0.0))
+        voicing.append(peak_value)
+
+    return {
+        "F0semitoneFrom27.5Hz": np.concatenate(f0).astype(np.float32),
+        "voicingFinalUnclipped": np.concatenate(voicing).astype(np.float32),
+    }
+
+LLD_GROUPS = {
+    "pcm_RMSenergy": energy_llds,
+    "audspec_lengthL1norm": energy_llds,
+    "F0semitoneFrom27.5Hz": pitch_llds,
+    "voicingFinalUnclipped": pitch_llds,
+}
+
+# ----------------------------------------
+# Functionals
+# ----------------------------------------
+FUNCTIONALS = {
+    "range": lambda x: float(np.max(x) - np.min(x)),
+    "max": lambda x: float(np.max(x)),
+    "min": lambda x: float(np.min(x)),
+    "amean": lambda x: float(np.mean(x)),
+    "stddev": lambda x: float(np.std(x)),
+}
+
+def speech_frames(llds):
+    rms = llds["pcm_RMSenergy"]
+    peak = np.max(rms) if len(rms) else 0.0
+    if peak <= 0:
+        return 0.0
+    floor = peak * 10.0 ** (SPEECH_RMS_FLOOR_DB / 20.0)
+    return float(np.count_nonzero(rms > floor))
+
+def speech_frames_voiced(llds):
+    return float(np.count_nonzero(llds["voicingFinalUnclipped"] > VOICING_THRESHOLD))
+
+# Counts that are not "<lld>_sma_<functional>" features, with the LLDs they need
+FRAME_COUNTS = {
+    "speechFrames": (speech_frames, ["pcm_RMSenergy"]),
+    "speechFramesVoiced": (speech_frames_voiced, ["voicingFinalUnclipped"]),
+}
+
+def parse_feature_name(name):
+    """
+    Split a ComParE-style name such as 'pcm_RMSenergy_sma_range' into (lld, functional).
+    """
+    if name in FRAME_COUNTS:
+        return name, None
+    lld, sep, functional = name.rpartition("_sma_")
+    if not sep or lld not in LLD_GROUPS or functional not in FUNCTIONALS:
+        raise ValueError(f"Feature '{name}' is not supported by targeted extraction")
+    return lld, functional
+
+# ----------------------------------------
+# Targeted extraction
+# ----------------------------------------
+def extract_targeted(signal, sample_rate, feature_names):
+    """
+    Compute only the LLDs and functionals needed for the requested feature names.
+    Returns a dictionary { feature_name: value }.
+    """
+    parsed = {name: parse_feature_name(name) for name in feature_names}
+
+    needed = set()
+    for name, (lld, functional) in parsed.items():
+        needed.update(FRAME_COUNTS[name][1] if functional is None else [lld])
+
+    llds = {}
+    for lld in sorted(needed):
+        if lld not in llds:
+            llds.update(LLD_GROUPS[lld](signal, sample_rate))
+
+    features = {}
+    for name, (lld, functional) in parsed.items():
+        if functional is None:
+            features[name] = FRAME_COUNTS[name][0](llds)
+        else:
+            features[name] = FUNCTIONALS[functional](smooth(llds[lld]))
+    return features
+
+def extract_targeted_file(audio_path, feature_names):
+    """
+    Read a WAV file and run targeted extraction on it.
+    """
+    signal, sample_rate = read_wav(audio_path)
+    return extract_targeted(signal, sample_rate, feature_names)
+
+# ----------------------------------------
+# Checks
+# ----------------------------------------
+def check_pitch_tracking(sample_rate=16000, frequencies=(100, 150, 200, 250, 300, 400), harmonics=14,
+                         tolerance=1.0):
+    """
+    Run pitch_llds() on one-second pure and harmonic tones and check the median
+    F0 of each is within tolerance semitones. Returns a list of failures.
+    """
+    t = np.arange(sample_rate) / sample_rate
+    failures = []
+    for frequency in frequencies:
+        partials = [k for k in range(1, harmonics + 1) if k * frequency < sample_rate / 2.0]
+        tones = {
+            "pure": np.sin(2 * np.pi * frequency * t),
+            "harmonic": sum(np.sin(2 * np.pi * k * frequency * t) / k for k in partials),
+        }
+        for kind, tone in tones.items():
+            tone = (0.5 * tone / np.max(np.abs(tone))).astype(np.float32)
+            f0 = pitch_llds(tone, sample_rate)["F0semitoneFrom27.5Hz"]
+            voiced = f0[f0 > 0]
+            expected = 12.0 * np.log2(frequency / F0_SEMITONE_BASE)
+            error = abs(np.median(voiced) - expected) if len(voiced) else np.inf
+            if error > tolerance:
+                failures.append(f"{kind} {frequency} Hz tone: F0 off by {error:.1f} semitones")
+    return failures
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Checks of the targeted feature extractor")
+    parser.add_argument("--sample-rate", type=int, default=16000)
+    args = parser.parse_args(argv)
+
+    failures = check_pitch_tracking(args.sample_rate)
+    for failure in failures:
+        print(f"[ERROR] {failure}")
+    if failures:
+        sys.exit(1)
+    print("[DONE] Pure and harmonic tones from 100 to 400 Hz tracked within a semitone")
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,44 @@
 import os
+import argparse
 import glob
 import json
-import csv
+import time
+import numpy as np
+import pandas as pd
 from collections import defaultdict
+from lld_cache import load_lld_matrix
+from window_functionals import window_functionals, feature_dicts, feature_matrix
+from fused_store import fused_dir, write_fused_columnar, write_columnar
+from fused_index import write_index
+from rttm_turns import coalesce_turns, format_stats, add_turn_arguments, turn_options, resolved_turn_options
 
 # --- Directory Paths ---
 
 RTTM_DIR = "earnings21/earnings21/rttms"
-LLD_DIR = "features/llds_by_speaker"
+MANIFEST_DIR = "earnings21/earnings21/media_by_speaker"  # <file_id>/<file_id>_manifest.json from segmentation
 SENTIMENT_DIR = "features/semantic"
+SEGMENT_SENTIMENT_DIR = "features/semantic/segments"  # Turn-level labels from run_finbert_on_segments.py
 TRANSCRIPT_DIR = "features/semantic/processed_transcripts"
 NLP_REF_DIR = "earnings21/earnings21/transcripts/nlp_references"
 OUTPUT_DIR = "features/fused_segments"
+TOKEN_OUTPUT_DIR = "features/fused_tokens"  # Word-level tables (--level token), <id>_tokens/ in the fused_store.py layout
 
-os.makedirs(OUTPUT_DIR, exist_ok=True)
+# Functionals computed per segment from the LLD frames (see window_functionals.py);
+# "amean" keeps the bare LLD column names, others are suffixed (e.g. F0final_sma_stddev)
+ACOUSTIC_FUNCTIONALS = ["amean"]
+
+# Fused output formats: "jsonl" (<id>_fused.jsonl, one JSON object per segment) and/or
+# "columnar" (<id>_fused/ with the feature schema stored once and a float32 matrix, see fused_store.py)
+OUTPUT_FORMATS = ["jsonl"]
+
+# Functionals per .nlp token (a word spans ~20-60 LLD frames); moments come from
+# prefix sums, order statistics (range, percentiles) need a sort and cost more
+TOKEN_FUNCTIONALS = ["amean", "stddev"]
+
+# Z-score LLDs at load time with the statistics from feature_stats.py:
+# None (raw values), "speaker", "call" or "corpus"
+NORMALIZATION = None
+_normalizer = None
 
 # --- Utility Functions ---
 
@@ -37,26 +62,34 @@ def load_rttm(rttm_path):
             })
     return segments
 
-def load_llds(csv_path):
-    """
-    Load acoustic LLD CSV with proper delimiter and extract timestamps.
-    """
-    data = []
-    with open(csv_path, "r") as f:
-        reader = csv.DictReader(f, delimiter=';')
-        if "frameTime" not in reader.fieldnames:
-            raise ValueError(f"'frameTime' not found in {csv_path}")
-        for row in reader:
-            try:
-                row["timestamp"] = float(row["frameTime"])
-                data.append(row)
-            except ValueError:
-                continue  # skip malformed rows
-    if data:
-        print(f"[DEBUG] LLD timestamp range: {data[0]['timestamp']} - {data[-1]['timestamp']} for {os.path.basename(csv_path)}")
+def load_turns(rttm_path, **options):
+    """
+    RTTM segments after turn coalescing (see rttm_turns.py, options as in
+    coalesce_spans()); segmentation, segment sentiment and fusion must use the
+    same options so their keys line up.
+    """
+    segments, stats = coalesce_turns(load_rttm(rttm_path), **options)
+    print(f"[INFO] RTTM {os.path.basename(rttm_path)}: {format_stats(stats)}")
+    return segments
+
+def load_llds(csv_path, file_id=None, speaker=None):
+    """
+    Load acoustic LLDs as (timestamps, columns, values) through the binary
+    LLD cache; the CSV is parsed only the first time or after it changes.
+    With NORMALIZATION set, values are z-scored for the given call/speaker.
+    """
+    global _normalizer
+    timestamps, columns, values = load_lld_matrix(csv_path)
+    if NORMALIZATION:
+        if _normalizer is None or _normalizer.level != NORMALIZATION:
+            from feature_stats import Normalizer
+            _normalizer = Normalizer(NORMALIZATION)
+        values = _normalizer.apply(values, columns, file_id, speaker)
+    if len(timestamps):
+        print(f"[DEBUG] LLD timestamp range: {timestamps[0]} - {timestamps[-1]} for {os.path.basename(csv_path)}")
     else:
         print(f"[DEBUG] No LLD data found in {os.path.basename(csv_path)}")
-    return data
+    return timestamps, columns, values
 
 def load_sentiment(json_path):
     """
@@ -81,41 +114,53 @@ def load_transcript(txt_path):
 def load_nlp_tokens(nlp_path):
     """
     Load token-level timestamped words from .nlp file.
+    Supports the earnings21 pipe format (token|speaker|ts|endTs|...) with a
+    header line, as well as whitespace "start end word" lines.
+    Tokens without timings are skipped.
     """
     tokens = []
     try:
         with open(nlp_path, "r") as f:
             for line in f:
-                parts = line.strip().split()
-                if len(parts) < 3:
-                    continue
-                start, end, word = parts[0], parts[1], " ".join(parts[2:])
-                tokens.append({
-                    "start": float(start),
-                    "end": float(end),
-                    "word": word
-                })
+                line = line.strip()
+                if "|" in line:
+                    parts = line.split("|")
+                    if len(parts) < 4:
+                        continue
+                    word, start, end = parts[0], parts[2], parts[3]
+                else:
+                    parts = line.split()
+                    if len(parts) < 3:
+                        continue
+                    start, end, word = parts[0], parts[1], " ".join(parts[2:])
+                try:
+                    tokens.append({
+                        "start": float(start),
+                        "end": float(end),
+                        "word": word
+                    })
+                except ValueError:
+                    continue  # header or token without timings
     except:
         pass
     return tokens
 
+def segment_acoustic_features(lld_data, segments, functionals=ACOUSTIC_FUNCTIONALS):
+    """
+    Compute acoustic functionals for many segments of one LLD file in a single
+    vectorized pass. Returns one feature dictionary per segment ({} if no frames).
+    """
+    timestamps, columns, values = lld_data
+    starts = [s["start"] for s in segments]
+    ends = [s["end"] for s in segments]
+    counts, results = window_functionals(timestamps, values, starts, ends, functionals)
+    return feature_dicts(columns, counts, results)
+
 def average_acoustic_features(lld_data, start, end):
     """
     Compute average of each acoustic feature in the time window.
     """
-    relevant = [row for row in lld_data if start <= row["timestamp"] <= end]
-    if not relevant:
-        return {}
-    features = defaultdict(list)
-    for row in relevant:
-        for k, v in row.items():
-            if k in ["frameTime", "timestamp"]:
-                continue
-            try:
-                features[k].append(float(v))
-            except:
-                pass
-    return {k: sum(vs)/len(vs) for k, vs in features.items()}
+    return segment_acoustic_features(lld_data, [{"start": start, "end": end}], ["amean"])[0]
 
 def extract_segment_tokens(tokens, start, end):
     """
@@ -124,32 +169,120 @@ def extract_segment_tokens(tokens, start, end):
     words = [t["word"] for t in tokens if start <= t["start"] and t["end"] <= end]
     return " ".join(words)
 
-def find_lld_file(file_id, speaker_label):
+def load_speaker_manifest(file_id, options=None):
     """
-    Map numeric speaker label to the corresponding LLD file by index order.
+    Load the per-call speaker manifest written by segment_audio_by_speaker.py.
+    Returns { speaker_id: { "wav": ..., "llds": ..., "functionals": ..., "turns": ... } }.
+    Warns when the speaker WAVs were cut with other turn coalescing options.
     """
-    lld_dir = os.path.join(LLD_DIR, file_id)
-    if not os.path.exists(lld_dir):
+    manifest_path = os.path.join(MANIFEST_DIR, file_id, f"{file_id}_manifest.json")
+    try:
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
         return None
+    recorded = manifest.get("turn_options")
+    if recorded and options is not None and recorded != resolved_turn_options(options):
+        print(f"[WARN] {file_id} was segmented with turn options {recorded}, "
+              f"fusing with {resolved_turn_options(options)}")
+    return manifest.get("speakers", {})
 
-    candidates = sorted(glob.glob(os.path.join(lld_dir, f"{file_id}_*_llds.csv")))
+def segment_texts(tokens, segments):
+    """
+    Text of every segment, with the same rule as extract_segment_tokens()
+    (tokens fully inside the segment), located with one sorted search per call.
+    """
+    tokens = sorted(tokens, key=lambda t: t["start"])
+    token_starts = np.array([t["start"] for t in tokens], dtype=np.float64)
+    token_ends = np.array([t["end"] for t in tokens], dtype=np.float64)
+    seg_starts = np.array([s["start"] for s in segments], dtype=np.float64)
+    seg_ends = np.array([s["end"] for s in segments], dtype=np.float64)
 
-    try:
-        index = int(speaker_label)
-        if 0 <= index < len(candidates):
-            return candidates[index]
-    except ValueError:
+    lo = np.searchsorted(token_starts, seg_starts, side="left")
+    hi = np.searchsorted(token_starts, seg_ends, side="right")
+    texts = []
+    for first, last, end in zip(lo, hi, seg_ends):
+        inside = np.flatnonzero(token_ends[first:last] <= end) + first
+        texts.append(" ".join(tokens[i]["word"] for i in inside))
+    return texts
+
+def segment_key(speaker, start):
+    """
+    Join key for segment-level tables: speaker id plus start rounded to milliseconds.
+    """
+    return f"{speaker}@{round(float(start), 3):.3f}"
+
+def load_segment_sentiment(file_id):
+    """
+    Load turn-level sentiment for one call, indexed by segment_key().
+    Returns an empty DataFrame if the call has not been scored.
+    """
+    path = os.path.join(SEGMENT_SENTIMENT_DIR, f"{file_id}_segment_sentiment.csv")
+    if not os.path.exists(path):
+        return pd.DataFrame()
+    df = pd.read_csv(path, dtype={"speaker": str})
+    df["key"] = [segment_key(spk, start) for spk, start in zip(df["speaker"], df["start"])]
+    return df.drop_duplicates("key").set_index("key")
+
+def join_segment_sentiment(segments, sentiment_table, call_sentiment):
+    """
+    Attach turn-level sentiment to every segment in one vectorized reindex;
+    segments without a turn-level result fall back to the call-level label.
+    Returns a list of (label, score, probabilities) tuples.
+    """
+    if sentiment_table.empty:
+        return [(call_sentiment, None, {}) for _ in segments]
+
+    keys = [segment_key(s["speaker"], s["start"]) for s in segments]
+    joined = sentiment_table.reindex(keys)
+    prob_columns = [c for c in sentiment_table.columns if c.startswith("prob_")]
+    labels = joined["sentiment"].where(joined["sentiment"].notna(), call_sentiment).tolist()
+    scores = joined["score"].astype(object).where(joined["score"].notna(), None).tolist()
+    probs = [
+        {c[len("prob_"):]: float(v) for c, v in zip(prob_columns, row) if pd.notna(v)}
+        for row in joined[prob_columns].itertuples(index=False)
+    ]
+    return list(zip(labels, scores, probs))
+
+def find_lld_file(manifest, speaker_label):
+    """
+    Resolve the LLD CSV of an RTTM speaker id from the call manifest.
+    """
+    entry = manifest.get(speaker_label)
+    if not entry or not os.path.exists(entry["llds"]):
         return None
+    return entry["llds"]
 
-    return None
+def speaker_wav_times(manifest, speaker_label, times):
+    """
+    Map call times onto the time base of the speaker's concatenated WAV, which
+    is what the frameTime of its LLD CSV counts, using the manifest's
+    [start, end, offset] turns. Times between turns are clamped to the end of
+    the previous turn. Returns None for manifests written without turns.
+    """
+    turns = manifest.get(speaker_label, {}).get("turns")
+    if turns is None:
+        return None
+    times = np.asarray(times, dtype=np.float64)
+    if not turns:
+        return np.zeros_like(times)
+    turns = np.asarray(turns, dtype=np.float64)
+    index = np.maximum(np.searchsorted(turns[:, 0], times, side="right") - 1, 0)
+    start, end, offset = turns[index].T
+    return offset + np.clip(times - start, 0.0, end - start)
 
 # --- Main Processing Loop ---
 
-for rttm_path in glob.glob(f"{RTTM_DIR}/*.rttm"):
+def fuse_call(rttm_path, options=None):
+    """
+    Fuse acoustic, textual and sentiment information for every RTTM segment of
+    one call. options are the turn coalescing options (load_turns()).
+    """
+    options = options or {}
     file_id = os.path.splitext(os.path.basename(rttm_path))[0]
     print(f"\n[INFO] Processing {file_id}")
 
-    segments = load_rttm(rttm_path)
+    segments = load_turns(rttm_path, **options)
 
     if segments:
         seg_start = min(s["start"] for s in segments)
@@ -164,51 +297,238 @@ for rttm_path in glob.glob(f"{RTTM_DIR}/*.rttm"):
     transcript = load_transcript(transcript_path)
     nlp_tokens = load_nlp_tokens(nlp_path)
 
-    output = []
-    warned_speakers = set()
+    manifest = load_speaker_manifest(file_id, options)
+    if manifest is None:
+        print(f"[WARN] No speaker manifest for {file_id}; run segment_audio_by_speaker.py first")
+        return
+
+    call_sentiment = sentiment_data.get("sentiment", "Neutral")
+    texts = segment_texts(nlp_tokens, segments)
+    sentiments = join_segment_sentiment(segments, load_segment_sentiment(file_id), call_sentiment)
 
-    for segment in segments:
+    # Group segments by LLD file so each file is loaded once and all of its
+    # segment windows are summarised in one vectorized call
+    by_lld = defaultdict(list)
+    warned_speakers = set()
+    for order, segment in enumerate(segments):
         speaker_label = segment["speaker"]
-        lld_csv_path = find_lld_file(file_id, speaker_label)
+        lld_csv_path = find_lld_file(manifest, speaker_label)
 
         if not lld_csv_path:
             if (file_id, speaker_label) not in warned_speakers:
                 print(f"[WARN] No LLD match for speaker '{speaker_label}' in {file_id}")
                 warned_speakers.add((file_id, speaker_label))
             continue
+        by_lld[lld_csv_path].append((order, segment))
 
+    output = []
+    for lld_csv_path, lld_segments in by_lld.items():
         try:
-            llds = load_llds(lld_csv_path)
+            llds = load_llds(lld_csv_path, file_id, lld_segments[0][1]["speaker"])
         except Exception as e:
             print(f"[ERROR] Failed to load LLD from {lld_csv_path}: {e}")
             continue
 
-        acoustic = average_acoustic_features(llds, segment["start"], segment["end"])
-        text = extract_segment_tokens(nlp_tokens, segment["start"], segment["end"])
-        sentiment = sentiment_data.get("sentiment", "Neutral")
+        speaker_label = lld_segments[0][1]["speaker"]
+        starts = speaker_wav_times(manifest, speaker_label, [segment["start"] for _, segment in lld_segments])
+        ends = speaker_wav_times(manifest, speaker_label, [segment["end"] for _, segment in lld_segments])
+        if starts is None:
+            print(f"[WARN] Manifest of {file_id} has no turn offsets for speaker '{speaker_label}'; "
+                  f"rerun segment_audio_by_speaker.py --manifest-only")
+            continue
+        acoustics = segment_acoustic_features(llds, [{"start": a, "end": b} for a, b in zip(starts, ends)])
+
+        for (order, segment), acoustic in zip(lld_segments, acoustics):
+            text = texts[order]
+            sentiment, sentiment_score, sentiment_probs = sentiments[order]
+
+            # Skip segments with no features and no text
+            if not acoustic and not text:
+                print(f"[SKIP] Segment ({segment['start']}–{segment['end']}) in {file_id} has no features or text")
+                continue
+
+            segment_data = {
+                "file_id": file_id,
+                "speaker": segment["speaker"],
+                "start": segment["start"],
+                "end": segment["end"],
+                "text": text,
+                "sentiment": sentiment,
+                "sentiment_score": sentiment_score,
+                "sentiment_probs": sentiment_probs,
+                "call_sentiment": call_sentiment,
+                "acoustic": acoustic
+            }
+
+            output.append((order, segment_data))
+
+    # Restore RTTM order
+    output = [entry for _, entry in sorted(output, key=lambda item: item[0])]
 
-        # Skip segments with no features and no text
-        if not acoustic and not text:
-            print(f"[SKIP] Segment ({segment['start']}–{segment['end']}) in {file_id} has no features or text")
+    offsets, rows = None, None
+    if "jsonl" in OUTPUT_FORMATS:
+        out_path = os.path.join(OUTPUT_DIR, f"{file_id}_fused.jsonl")
+        offsets, position = [], 0
+        with open(out_path, "wb") as f:
+            for entry in output:
+                line = (json.dumps(entry) + "\n").encode("utf-8")
+                f.write(line)
+                offsets.append((position, len(line)))
+                position += len(line)
+        print(f"[DONE] Saved: {out_path}")
+
+    if "columnar" in OUTPUT_FORMATS:
+        out_path = write_fused_columnar(fused_dir(OUTPUT_DIR, file_id), output)
+        rows = list(range(len(output)))
+        print(f"[DONE] Saved: {out_path}")
+
+    # Byte offsets / rows per (speaker, start, end) for fused_index.query_segments()
+    write_index(OUTPUT_DIR, file_id, output, offsets, rows)
+
+    print(f"[SUMMARY] {len(output)} valid segments written for {file_id}")
+
+# --- Word-Level Fusion ---
+
+def assign_tokens(starts, ends, segments):
+    """
+    Index of the RTTM segment holding each token's midpoint, or -1 outside every
+    turn. segments are sorted by start (load_turns()); where turns overlap the
+    latest-starting one that holds the midpoint wins.
+    """
+    if not segments:
+        return np.full(len(starts), -1, dtype=np.int64)
+    seg_starts = np.array([s["start"] for s in segments], dtype=np.float64)
+    seg_ends = np.array([s["end"] for s in segments], dtype=np.float64)
+    mids = (starts + ends) / 2.0
+    index = np.searchsorted(seg_starts, mids, side="right") - 1
+    safe = np.maximum(index, 0)
+    inside = (index >= 0) & (mids <= seg_ends[safe])
+
+    # The latest-starting turn may end before the midpoint while an earlier,
+    # longer turn still covers it; the running maximum of the ends finds those
+    covered = (index >= 0) & (mids <= np.maximum.accumulate(seg_ends)[safe])
+    for k in np.flatnonzero(covered & ~inside):
+        j = index[k] - 1
+        while seg_ends[j] < mids[k]:
+            j -= 1
+        index[k] = j
+    return np.where(covered, index, -1)
+
+def fuse_tokens(rttm_path, functionals=TOKEN_FUNCTIONALS, options=None):
+    """
+    Attach LLD functionals over every .nlp token's [ts, end_ts] span of one
+    call. Tokens are assigned to RTTM turns (and so speaker LLD files) by
+    midpoint, and each speaker's tokens are summarised in one
+    window_functionals() pass. Writes one row per token. options are the
+    turn coalescing options (load_turns()).
+    """
+    options = options or {}
+    file_id = os.path.splitext(os.path.basename(rttm_path))[0]
+    print(f"\n[INFO] Processing tokens of {file_id}")
+
+    tokens = load_nlp_tokens(os.path.join(NLP_REF_DIR, f"{file_id}.nlp"))
+    if not tokens:
+        print(f"[WARN] No timed .nlp tokens for {file_id}")
+        return
+    manifest = load_speaker_manifest(file_id, options)
+    if manifest is None:
+        print(f"[WARN] No speaker manifest for {file_id}; run segment_audio_by_speaker.py first")
+        return
+
+    began = time.perf_counter()
+    segments = load_turns(rttm_path, **options)
+    starts = np.array([t["start"] for t in tokens], dtype=np.float64)
+    ends = np.array([t["end"] for t in tokens], dtype=np.float64)
+    segment_ids = assign_tokens(starts, ends, segments)
+    speakers = np.array([segments[i]["speaker"] if i >= 0 else "" for i in segment_ids], dtype=object)
+
+    # One pass per speaker LLD file; columns are aligned by name afterwards
+    features, position, blocks = [], {}, []
+    frames = np.zeros(len(tokens), dtype=np.int64)
+    for speaker in sorted(set(speakers) - {""}):
+        lld_csv_path = find_lld_file(manifest, speaker)
+        if not lld_csv_path:
+            print(f"[WARN] No LLD match for speaker '{speaker}' in {file_id}")
+            continue
+        try:
+            timestamps, columns, values = load_llds(lld_csv_path, file_id, speaker)
+        except Exception as e:
+            print(f"[ERROR] Failed to load LLD from {lld_csv_path}: {e}")
             continue
 
-        segment_data = {
-            "file_id": file_id,
-            "speaker": speaker_label,
-            "start": segment["start"],
-            "end": segment["end"],
-            "text": text,
-            "sentiment": sentiment,
-            "acoustic": acoustic
-        }
-
-        output.append(segment_data)
-
-    out_path = os.path.join(OUTPUT_DIR, f"{file_id}_fused.jsonl")
-    with open(out_path, "w") as f:
-        for entry in output:
-            json.dump(entry, f)
-            f.write("\n")
-
-    print(f"[DONE] Saved: {out_path}")
-    print(f"[SUMMARY] {len(output)} valid segments written to {file_id}_fused.jsonl")
\ No newline at end of file
+        # LLD frameTime counts speaker-WAV time, tokens are timed in call time
+        rows = np.flatnonzero(speakers == speaker)
+        wav_starts = speaker_wav_times(manifest, speaker, starts[rows])
+        wav_ends = speaker_wav_times(manifest, speaker, ends[rows])
+        if wav_starts is None:
+            print(f"[WARN] Manifest of {file_id} has no turn offsets for speaker '{speaker}'; "
+                  f"rerun segment_audio_by_speaker.py --manifest-only")
+            continue
+        counts, results = window_functionals(timestamps, values, wav_starts, wav_ends, functionals)
+        names, table = feature_matrix(columns, counts, results)
+        for name in names:
+            position.setdefault(name, len(features))
+            if position[name] == len(features):
+                features.append(name)
+        frames[rows] = counts
+        blocks.append((rows, [position[name] for name in names], table))
+
+    acoustic = np.full((len(tokens), len(features)), np.nan, dtype=np.float32)
+    for rows, cols, table in blocks:
+        acoustic[np.ix_(rows, cols)] = table
+
+    pause_before = np.empty(len(tokens))
+    pause_before[0] = np.nan
+    pause_before[1:] = np.maximum(starts[1:] - ends[:-1], 0.0)
+    side = {
+        "file_id": [file_id] * len(tokens),
+        "speaker": [s or None for s in speakers],
+        "segment": segment_ids.tolist(),
+        "word": [t["word"] for t in tokens],
+        "start": starts.tolist(),
+        "end": ends.tolist(),
+        "duration": (ends - starts).tolist(),
+        "pause_before": [None if np.isnan(p) else p for p in pause_before.tolist()],
+        "frames": frames.tolist(),
+    }
+    out_path = write_columnar(os.path.join(TOKEN_OUTPUT_DIR, f"{file_id}_tokens"), side, features, acoustic)
+    print(f"[DONE] Saved: {out_path} ({len(tokens)} tokens, {int((segment_ids < 0).sum())} outside RTTM turns, "
+          f"{time.perf_counter() - began:.2f}s)")
+
+def main(argv=None):
+    global NORMALIZATION
+
+    parser = argparse.ArgumentParser(description="Fuse acoustic, sentiment and transcript features per RTTM segment")
+    parser.add_argument("file_ids", nargs="*", help="Calls to fuse (default: every RTTM)")
+    parser.add_argument("--level", choices=["segment", "token"], default="segment",
+                        help="segment: one fused record per RTTM turn; token: LLD functionals per .nlp word")
+    parser.add_argument("--normalize", choices=["speaker", "call", "corpus"], default=NORMALIZATION,
+                        help="Z-score LLDs with feature_stats.py statistics before fusing")
+    parser.add_argument("--dry-run", action="store_true", help="List the calls that would be fused")
+    add_turn_arguments(parser)
+    args = parser.parse_args(argv)
+    NORMALIZATION = args.normalize
+    options = turn_options(args)
+
+    rttm_paths = sorted(glob.glob(f"{RTTM_DIR}/*.rttm"))
+    if args.file_ids:
+        wanted = set(args.file_ids)
+        rttm_paths = [p for p in rttm_paths if os.path.splitext(os.path.basename(p))[0] in wanted]
+    if args.dry_run:
+        for rttm_path in rttm_paths:
+            print(os.path.splitext(os.path.basename(rttm_path))[0])
+        print(f"{len(rttm_paths)} calls would be fused")
+        return
+
+    if args.level == "token":
+        os.makedirs(TOKEN_OUTPUT_DIR, exist_ok=True)
+        for rttm_path in rttm_paths:
+            fuse_tokens(rttm_path, options=options)
+        return
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    for rttm_path in rttm_paths:
+        fuse_call(rttm_path, options)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+import numpy as np
+
+# ----------------------------------------
+# ComParE-style functionals over stored LLD frames
+# ----------------------------------------
+# Every functional is evaluated for all windows of a call at once: window
+# boundaries are located with searchsorted, moments come from prefix sums and
+# order statistics from one grouped sort, so no Python loop runs per window.
+
+DEFAULT_FUNCTIONALS = ["amean", "stddev", "range", "percentile1.0", "percentile50.0", "percentile99.0", "linregc1"]
+
+def window_bounds(timestamps, starts, ends):
+    """
+    Return frame index bounds [lo, hi) of every window, with frames at
+    start <= t <= end included (same convention as average_acoustic_features).
+    """
+    lo = np.searchsorted(timestamps, starts, side="left")
+    hi = np.searchsorted(timestamps, ends, side="right")
+    return lo, np.maximum(hi, lo)
+
+def _prefix(values):
+    out = np.zeros((len(values) + 1,) + values.shape[1:], dtype=np.float64)
+    np.cumsum(values, axis=0, dtype=np.float64, out=out[1:])
+    return out
+
+def _moments(values, lo, hi, counts, wanted):
+    results = {}
+    safe = np.maximum(counts, 1)[:, None]
+    total = _prefix(values)
+    sums = total[hi] - total[lo]
+    mean = sums / safe
+
+    if "amean" in wanted:
+        results["amean"] = mean
+    if "stddev" in wanted:
+        squares = _prefix(np.square(values, dtype=np.float64))
+        var = (squares[hi] - squares[lo]) / safe - mean ** 2
+        results["stddev"] = np.sqrt(np.clip(var, 0.0, None))
+    if "linregc1" in wanted:
+        # Least-squares slope per second; frame times are uniformly spaced, so the
+        # sums over the local frame index k = 0..n-1 have closed forms.
+        n = counts.astype(np.float64)[:, None]
+        index = np.arange(len(values), dtype=np.float64)[:, None]
+        weighted = _prefix(values * index)
+        sum_kx = (weighted[hi] - weighted[lo]) - lo[:, None] * sums
+        sum_k = n * (n - 1) / 2.0
+        sum_kk = (n - 1) * n * (2 * n - 1) / 6.0
+        denom = n * sum_kk - sum_k ** 2
+        slope = np.divide(n * sum_kx - sum_k * sums, denom, out=np.zeros_like(sums), where=denom > 0)
+        results["linregc1"] = slope
+    return results
+
+def _order_statistics(values, lo, hi, counts, wanted):
+    results = {}
+    occupied = counts > 0
+    if not occupied.any():
+        return {name: np.full((len(lo), values.shape[1]), np.nan) for name in wanted}
+
+    # Gather the frames of every window into one grouped array (windows may overlap)
+    group_lengths = counts[occupied]
+    group_starts = np.concatenate([[0], np.cumsum(group_lengths)[:-1]])
+    group_ids = np.repeat(np.arange(len(group_lengths)), group_lengths)
+    frame_index = np.repeat(lo[occupied] - group_starts, group_lengths) + np.arange(group_lengths.sum())
+    gathered = values[frame_index]
+
+    # Sort values within each window, column by column
+    ordered = np.empty_like(gathered)
+    for col in range(gathered.shape[1]):
+        ordered[:, col] = gathered[np.lexsort((gathered[:, col], group_ids)), col]
+
+    first = ordered[group_starts]
+    last = ordered[group_starts + group_lengths - 1]
+
+    for name in wanted:
+        if name == "range":
+            stat = last - first
+        elif name == "min":
+            stat = first
+        elif name == "max":
+            stat = last
+        else:
+            q = float(name[len("percentile"):]) / 100.0
+            position = q * (group_lengths - 1)
+            below = np.floor(position).astype(np.int64)
+            above = np.minimum(below + 1, group_lengths - 1)
+            frac = (position - below)[:, None]
+            stat = ordered[group_starts + below] * (1.0 - frac) + ordered[group_starts + above] * frac
+        full = np.full((len(lo), values.shape[1]), np.nan)
+        full[occupied] = stat
+        results[name] = full
+    return results
+
+def window_functionals(timestamps, values, starts, ends, functionals=DEFAULT_FUNCTIONALS):
+    """
+    Compute functionals of LLD frames over many time windows at once.
+
+    timestamps: (n_frames,) sorted frame times in seconds
+    values:     (n_frames, n_features) LLD matrix
+    starts/ends: (n_windows,) window boundaries in seconds
+    Returns (counts, { functional: (n_windows, n_features) array }); windows
+    without frames get NaN for every functional.
+    """
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    values = np.asarray(values)  # float32 memory maps are read in place; sums accumulate in float64
+    if not np.issubdtype(values.dtype, np.floating):
+        values = values.astype(np.float64)
+    lo, hi = window_bounds(timestamps, np.asarray(starts, dtype=np.float64), np.asarray(ends, dtype=np.float64))
+    counts = hi - lo
+
+    for name in functionals:
+        if name not in ("amean", "stddev", "linregc1", "range", "min", "max") and not name.startswith("percentile"):
+            raise ValueError(f"Unknown functional '{name}'")
+
+    results = _moments(values, lo, hi, counts, functionals)
+    if "linregc1" in results and len(timestamps) > 1:
+        results["linregc1"] /= np.median(np.diff(timestamps))
+    order_wanted = [name for name in functionals if name not in results]
+    if order_wanted:
+        results.update(_order_statistics(values, lo, hi, counts, order_wanted))
+
+    empty = counts == 0
+    for name in results:
+        results[name][empty] = np.nan
+    return counts, {name: results[name] for name in functionals}
+
+def feature_matrix(columns, counts, results):
+    """
+    Flatten window_functionals() output into (feature names, (n_windows, n_names) matrix).
+    The arithmetic mean keeps the bare LLD column name; other functionals are
+    suffixed, e.g. 'F0final_sma_stddev'.
+    """
+    names, blocks = [], []
+    for functional, matrix in results.items():
+        suffix = "" if functional == "amean" else f"_{functional}"
+        names.extend(f"{col}{suffix}" for col in columns)
+        blocks.append(matrix)
+    return names, np.hstack(blocks) if blocks else np.empty((len(counts), 0))
+
+def feature_dicts(columns, counts, results):
+    """
+    Turn window_functionals() output into one { feature_name: value } dict per
+    window (names as in feature_matrix()). Empty windows map to {}.
+    """
+    names, table = feature_matrix(columns, counts, results)
+    return [dict(zip(names, row.tolist())) if count else {} for count, row in zip(counts, table)]
@@ -0,0 +1,194 @@
+import os
+import time
+import heapq
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+# ----------------------------------------
+# Adaptive worker pool for subprocess-heavy stages
+# ----------------------------------------
+# The pool is sized from the CPUs this process may use (affinity and cgroup
+# quota) divided by the threads each task uses, and from available memory
+# divided by a per-task estimate. While running, the number of tasks in flight
+# steps down when the machine is overloaded (load average per CPU, CPU
+# pressure) or short on memory, and back up once it recovers. Threads inside
+# each task (BLAS/OpenMP, ffmpeg -threads) are capped to threads_per_task.
+CHECK_INTERVAL = 2.0     # Seconds between load checks
+LOAD_HIGH = 1.25         # 1-min load average per CPU above which concurrency is reduced
+LOAD_LOW = 0.85          # ... and below which it may grow again
+CPU_PRESSURE_HIGH = 40.0  # /proc/pressure/cpu "some avg10" (% of time stalled), when available
+MEMORY_LOW = 0.10        # Fraction of memory available below which concurrency is reduced
+MEMORY_RESERVE = 0.20    # Fraction of available memory kept out of the sizing
+
+THREAD_ENV_VARS = ["OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "NUMEXPR_NUM_THREADS"]
+
+# ----------------------------------------
+# Machine resources
+# ----------------------------------------
+def read_first_line(path):
+    try:
+        with open(path, "r") as f:
+            return f.readline().strip()
+    except OSError:
+        return None
+
+def available_cpus():
+    """CPUs usable by this process: affinity mask, further limited by a cgroup v2 quota."""
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    quota = read_first_line("/sys/fs/cgroup/cpu.max")
+    if quota and not quota.startswith("max"):
+        limit, period = (int(v) for v in quota.split()[:2])
+        cpus = min(cpus, max(1, -(-limit // period)))
+    return cpus
+
+def memory_status():
+    """
+    (total, available) bytes from /proc/meminfo, limited by a cgroup v2 memory
+    limit when one is set. Returns (None, None) where neither is readable.
+    """
+    total = available = None
+    try:
+        with open("/proc/meminfo", "r") as f:
+            info = {line.split(":")[0]: int(line.split()[1]) * 1024 for line in f}
+        total, available = info.get("MemTotal"), info.get("MemAvailable")
+    except (OSError, ValueError, IndexError):
+        pass
+
+    limit, current = read_first_line("/sys/fs/cgroup/memory.max"), read_first_line("/sys/fs/cgroup/memory.current")
+    if limit and limit != "max" and current:
+        cgroup_total, cgroup_available = int(limit), int(limit) - int(current)
+        total = cgroup_total if total is None else min(total, cgroup_total)
+        available = cgroup_available if available is None else min(available, cgroup_available)
+    return total, available
+
+def cpu_pressure():
+    """Share of the last 10 s some task waited for CPU (PSI), or None if unsupported."""
+    line = read_first_line("/proc/pressure/cpu")
+    if not line:
+        return None
+    fields = dict(item.split("=") for item in line.split()[1:])
+    return float(fields.get("avg10", 0.0))
+
+def pool_size(threads_per_task=1, memory_per_task_mb=256, max_workers=None):
+    """Number of concurrent tasks the machine can hold."""
+    size = max(1, available_cpus() // max(1, threads_per_task))
+    _, available = memory_status()
+    if available is not None and memory_per_task_mb:
+        size = min(size, max(1, int(available * (1.0 - MEMORY_RESERVE) / (memory_per_task_mb * 2 ** 20))))
+    if max_workers:
+        size = min(size, max_workers)
+    return size
+
+def adjust_target(target, limit, cpus):
+    """
+    New number of tasks in flight from the current load.
+    Returns (target, reason or None when unchanged).
+    """
+    load = os.getloadavg()[0] / cpus if hasattr(os, "getloadavg") else 0.0
+    pressure = cpu_pressure()
+    total, available = memory_status()
+    memory_free = available / total if total and available is not None else 1.0
+
+    if memory_free < MEMORY_LOW and target > 1:
+        return target - 1, f"{memory_free:.0%} memory available"
+    if (load > LOAD_HIGH or (pressure is not None and pressure > CPU_PRESSURE_HIGH)) and target > 1:
+        return target - 1, f"load {load:.2f}/CPU" + (f", CPU pressure {pressure:.0f}%" if pressure is not None else "")
+    if load < LOAD_LOW and memory_free >= 2 * MEMORY_LOW and target < limit:
+        return target + 1, f"load {load:.2f}/CPU"
+    return target, None
+
+# ----------------------------------------
+# Worker side
+# ----------------------------------------
+_task_threads = 1
+
+def task_threads():
+    """Thread budget of the current task (e.g. for ffmpeg -threads)."""
+    return _task_threads
+
+def init_worker(threads, initializer=None, initargs=()):
+    global _task_threads
+    _task_threads = threads
+    for var in THREAD_ENV_VARS:
+        os.environ[var] = str(threads)  # Inherited by ffmpeg/SMILExtract and any BLAS loaded later
+    if initializer is not None:
+        initializer(*initargs)
+
+def run_chunk(func, chunk):
+    start = time.perf_counter()
+    results = [func(item) for item in chunk]
+    return results, time.perf_counter() - start
+
+# ----------------------------------------
+# Longest-first scheduling
+# ----------------------------------------
+def simulate_makespan(costs, workers):
+    """
+    Finish time of the last worker when costs are handed out in the given
+    order to whichever worker frees up first (what the driver does).
+    """
+    finish = [0.0] * max(1, workers)
+    for cost in costs:
+        heapq.heapreplace(finish, finish[0] + cost)
+    return max(finish)
+
+# ----------------------------------------
+# Driver
+# ----------------------------------------
+def imap_adaptive(func, items, threads_per_task=1, memory_per_task_mb=256, max_workers=None,
+                  chunksize=1, initializer=None, initargs=(), costs=None):
+    """
+    Run func over items in worker processes, yielding results in completion
+    order. Consecutive items are sent together in chunks of chunksize (one
+    worker handles the whole chunk, e.g. to reuse a decoded call).
+
+    With costs (one per item, e.g. audio seconds from call_durations.py),
+    chunks are dispatched longest-first to whichever worker frees up, and
+    the predicted makespan is reported against the actual one at the end.
+    """
+    items = list(items)
+    chunks = [items[i:i + chunksize] for i in range(0, len(items), chunksize)]
+    if not chunks:
+        return
+    chunk_costs = None
+    if costs is not None:
+        costs = list(costs)
+        chunk_costs = [sum(costs[i:i + chunksize]) for i in range(0, len(costs), chunksize)]
+        order = sorted(range(len(chunks)), key=lambda i: -chunk_costs[i])  # Stable: ties keep input order
+        given_costs = chunk_costs
+        chunks = [chunks[i] for i in order]
+        chunk_costs = [chunk_costs[i] for i in order]
+
+    cpus = available_cpus()
+    limit = min(pool_size(threads_per_task, memory_per_task_mb, max_workers), len(chunks))
+    target = limit
+    print(f"[INFO] Worker pool: {limit} workers x {threads_per_task} threads ({cpus} CPUs available)")
+
+    pending, next_chunk, last_check = set(), 0, time.monotonic()
+    started, busy_seconds = time.perf_counter(), 0.0
+    with ProcessPoolExecutor(max_workers=limit, initializer=init_worker,
+                             initargs=(threads_per_task, initializer, initargs)) as pool:
+        while next_chunk < len(chunks) or pending:
+            if time.monotonic() - last_check >= CHECK_INTERVAL:
+                last_check = time.monotonic()
+                new_target, reason = adjust_target(target, limit, cpus)
+                if reason:
+                    print(f"[INFO] Worker pool: {target} -> {new_target} tasks in flight ({reason})")
+                target = new_target
+
+            while next_chunk < len(chunks) and len(pending) < target:
+                pending.add(pool.submit(run_chunk, func, chunks[next_chunk]))
+                next_chunk += 1
+
+            done, pending = wait(pending, timeout=CHECK_INTERVAL, return_when=FIRST_COMPLETED)
+            for future in done:
+                results, seconds = future.result()
+                busy_seconds += seconds
+                yield from results
+
+    if chunk_costs is not None and sum(chunk_costs) > 0:
+        # Convert cost units to seconds with the throughput measured on this run
+        rate = busy_seconds / sum(chunk_costs)
+        print(f"[INFO] Makespan: actual {time.perf_counter() - started:.1f}s, predicted "
+              f"{simulate_makespan(chunk_costs, limit) * rate:.1f}s longest-first vs "
+              f"{simulate_makespan(given_costs, limit) * rate:.1f}s in input order "
+              f"(lower bound {busy_seconds / limit:.1f}s, longest job {max(chunk_costs) * rate:.1f}s)")